@@ -0,0 +1,155 @@
+"""
+Time the bulk upserts used by `backfill --bulk` against the per-item path
+
+Generates a synthetic organization with benchmarks.fake_github and writes
+its pull requests, reviews and review comments through
+bulk_upsert_pull_requests/_reviews/_comments, CHUNK PRs at a time, the
+way the backfill does. One extra repository is written item by item
+through the webhook's process_* functions for comparison. Reports rows
+per second for both and checks the rollups with verify_rollups().
+
+By default it runs against a fresh SQLite database in a temporary
+directory. --backend sqlserver uses the SQL Server settings from .env;
+point it at a throwaway database, since the synthetic github_ids are fixed.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bulk_benchmark --prs 20000 --chunk 2000
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from benchmarks.fake_github import FakeOrganization
+
+def chunk_items(org, r, prs):
+    """(pull_requests, reviews, comments) rows for the bulk upserts, as import_chunk builds them"""
+    # Imported here so the settings from main() are in place first
+    from prequel_app.github_handler import review_body_comment
+
+    repo = org.repository(r)
+    reviews, comments = [], []
+    for pr in prs:
+        for review in org.reviews(r, pr['number']):
+            reviews.append((pr['id'], review))
+            body_comment = review_body_comment(review)
+            if body_comment:
+                comments.append((pr['id'], body_comment, review['id']))
+        for comment in org.comments(r, pr['number']):
+            comments.append((pr['id'], comment, None))
+    return [(repo, pr) for pr in prs], reviews, comments
+
+def run_bulk(org, repositories, chunk):
+    """Write the given repositories through the bulk upserts; returns (rows, seconds)"""
+    from prequel_db.db_handler import DatabaseHandler
+
+    rows = 0
+    seconds = 0.0
+    for r in range(repositories):
+        prs = org.pull_requests(r, 'all')
+        for start in range(0, len(prs), chunk):
+            pull_requests, reviews, comments = chunk_items(org, r, prs[start:start + chunk])
+            started = time.perf_counter()
+            db = DatabaseHandler()
+            try:
+                for upsert, items in ((db.bulk_upsert_pull_requests, pull_requests),
+                                      (db.bulk_upsert_reviews, reviews),
+                                      (db.bulk_upsert_comments, comments)):
+                    if items and upsert(items) is None:
+                        raise RuntimeError(f"{upsert.__name__} failed")
+            finally:
+                db.close()
+            seconds += time.perf_counter() - started
+            rows += len(pull_requests) + len(reviews) + len(comments)
+    return rows, seconds
+
+def run_per_item(org, r, limit):
+    """Write the first limit PRs of a repository through the webhook's process_* functions; returns (rows, seconds)"""
+    from prequel_app.github_handler import process_pull_request, process_review, process_review_comment
+
+    repo = org.repository(r)
+    rows = 0
+    started = time.perf_counter()
+    for pr in org.pull_requests(r, 'all')[:limit]:
+        for review in org.reviews(r, pr['number']):
+            if process_review({'action': 'submitted', 'repository': repo, 'pull_request': pr, 'review': review}) is None:
+                raise RuntimeError(f"process_review failed for review {review['id']}")
+            # A review with a body is also stored as a comment
+            rows += 2 if review['body'] else 1
+        for comment in org.comments(r, pr['number']):
+            data = {'action': 'created', 'repository': repo, 'pull_request': pr, 'comment': comment}
+            if process_review_comment(data) is None:
+                raise RuntimeError(f"process_review_comment failed for comment {comment['id']}")
+            rows += 1
+        if process_pull_request({'action': 'opened', 'repository': repo, 'pull_request': pr}) is None:
+            raise RuntimeError(f"process_pull_request failed for PR {pr['id']}")
+        rows += 1
+    return rows, time.perf_counter() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the bulk upserts against the per-item write path")
+    parser.add_argument('--prs', type=int, default=20000, help="PRs written through the bulk upserts")
+    parser.add_argument('--prs-per-repo', type=int, default=1000)
+    parser.add_argument('--per-item-prs', type=int, default=500, help="PRs written item by item for comparison")
+    parser.add_argument('--chunk', type=int, default=2000, help="PRs per bulk write")
+    parser.add_argument('--reviews', type=int, default=2, help="Reviews per PR")
+    parser.add_argument('--comments', type=int, default=3, help="Review comments per PR")
+    parser.add_argument('--backend', choices=['sqlite', 'sqlserver'], default='sqlite')
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    repositories = max(1, args.prs // args.prs_per_repo)
+    with tempfile.TemporaryDirectory(prefix='prequel-bulk-bench-') as workdir:
+        os.environ['DB_BACKEND'] = args.backend
+        if args.backend == 'sqlite':
+            os.environ['SQLITE_PATH'] = os.path.join(workdir, 'prequel.db')
+        os.environ['SLACK_WEBHOOK_URL'] = ''
+        # Every write logs at DEBUG/INFO, which would dominate the timings
+        logging.disable(logging.INFO)
+
+        from prequel_db.db_handler import DatabaseHandler
+        from prequel_db.db_migrations import apply_migrations
+        if not apply_migrations():
+            print("Applying migrations failed")
+            return 1
+
+        org = FakeOrganization(repos=repositories + 1, prs=args.prs_per_repo, users=max(50, args.prs // 20),
+                               reviews=args.reviews, comments=args.comments)
+        print(f"Bulk: {repositories * args.prs_per_repo:,} PRs in chunks of {args.chunk}")
+        bulk_rows, bulk_seconds = run_bulk(org, repositories, args.chunk)
+        print(f"  {bulk_rows:,} rows in {bulk_seconds:.2f}s, {bulk_rows / bulk_seconds:,.0f} rows/s")
+
+        # The comparison repository comes after the bulk ones, so its github_ids do not overlap
+        print(f"Per item: {args.per_item_prs:,} PRs")
+        item_rows, item_seconds = run_per_item(org, repositories, args.per_item_prs)
+        print(f"  {item_rows:,} rows in {item_seconds:.2f}s, {item_rows / item_seconds:,.0f} rows/s")
+
+        db = DatabaseHandler()
+        try:
+            drift = db.verify_rollups()
+        finally:
+            db.close()
+        print(f"Rollups: {'consistent' if not drift else f'{len(drift)} rows drifted'}")
+
+    results = {
+        'parameters': vars(args),
+        'bulk': {'rows': bulk_rows, 'seconds': round(bulk_seconds, 3),
+                 'rows_per_second': round(bulk_rows / bulk_seconds)},
+        'per_item': {'rows': item_rows, 'seconds': round(item_seconds, 3),
+                     'rows_per_second': round(item_rows / item_seconds)},
+        'rollup_drift': len(drift)
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 1 if drift else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Local stand-in for the parts of the GitHub REST API the backfill uses
+
+Serves a deterministic synthetic organization with Link pagination, ETags
+(If-None-Match answers 304), X-RateLimit-* headers and optional injected
+rate-limit responses, so the importer can be exercised and timed offline.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.fake_github --port 8099 --repos 20 --prs 500
+    GITHUB_API_URL=http://localhost:8099 python -m prequel_app.backfill --org fake-org
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# github_id ranges for the synthetic entities
+REPO_ID_BASE = 800_000_000
+USER_ID_BASE = 810_000_000
+PR_ID_BASE = 820_000_000
+REVIEW_ID_BASE = 830_000_000
+COMMENT_ID_BASE = 840_000_000
+
+EPOCH = datetime(2024, 1, 1)
+
+def _ts(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class FakeOrganization:
+    """Deterministic synthetic organization; items are generated on demand"""
+
+    def __init__(self, org='fake-org', repos=10, prs=100, users=50, reviews=2, comments=3):
+        self.org = org
+        self.repo_count = repos
+        self.prs_per_repo = prs
+        self.user_count = users
+        self.reviews_per_pr = reviews
+        self.comments_per_pr = comments
+
+    def user(self, i):
+        i = i % self.user_count
+        return {'id': USER_ID_BASE + i, 'login': f"user{i}", 'avatar_url': f"https://avatars.example/u/{i}"}
+
+    def repositories(self):
+        return [self.repository(r) for r in range(self.repo_count)]
+
+    def repository(self, r):
+        return {'id': REPO_ID_BASE + r, 'name': f"repo{r}", 'full_name': f"{self.org}/repo{r}", 'private': False}
+
+    def repository_index(self, name):
+        if not name.startswith('repo'):
+            return None
+        try:
+            r = int(name[4:])
+        except ValueError:
+            return None
+        return r if 0 <= r < self.repo_count else None
+
+    def pull_request(self, r, number):
+        created = EPOCH + timedelta(hours=r * self.prs_per_repo + number)
+        closed = number % 3 == 0
+        updated = created + timedelta(days=number % 20)
+        return {
+            'id': PR_ID_BASE + r * self.prs_per_repo + number,
+            'number': number,
+            'title': f"Change {number} in repo{r}",
+            'state': 'closed' if closed else 'open',
+            'html_url': f"https://github.example/{self.org}/repo{r}/pull/{number}",
+            'user': self.user(r + number),
+            'created_at': _ts(created),
+            'updated_at': _ts(updated),
+            'closed_at': _ts(updated) if closed else None,
+            'merged_at': _ts(updated) if closed and number % 2 == 0 else None
+        }
+
+    def pull_requests(self, r, state):
+        prs = [self.pull_request(r, n) for n in range(1, self.prs_per_repo + 1)]
+        if state in ('open', 'closed'):
+            prs = [pr for pr in prs if pr['state'] == state]
+        return prs
+
+    def reviews(self, r, number):
+        pr_index = r * self.prs_per_repo + number
+        created = EPOCH + timedelta(hours=pr_index)
+        return [{
+            'id': REVIEW_ID_BASE + pr_index * self.reviews_per_pr + k,
+            'user': self.user(r + number + k + 1),
+            'body': "Looks good, LGTM" if k % 2 == 0 else "",
+            'state': 'APPROVED' if k % 2 == 0 else 'COMMENTED',
+            'submitted_at': _ts(created + timedelta(hours=k + 1))
+        } for k in range(self.reviews_per_pr)]
+
+    def comments(self, r, number):
+        pr_index = r * self.prs_per_repo + number
+        created = EPOCH + timedelta(hours=pr_index)
+        return [{
+            'id': COMMENT_ID_BASE + pr_index * self.comments_per_pr + k,
+            'user': self.user(r + number + k + 2),
+            'body': f"Comment {k} on #{number}",
+            'created_at': _ts(created + timedelta(minutes=30 * (k + 1))),
+            'updated_at': _ts(created + timedelta(minutes=30 * (k + 1)))
+        } for k in range(self.comments_per_pr)]
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, organization, rate_limit=5000, rate_window=3600,
+                 throttle_every=0, throttle_retry_after=1, latency=0.0):
+        """
+        Args:
+            organization: FakeOrganization to serve
+            rate_limit: Requests allowed per window (304s are free, as on GitHub)
+            rate_window: Window length in seconds
+            throttle_every: Answer every Nth request with a 403 secondary rate limit (0 disables)
+            throttle_retry_after: Retry-After sent with those 403s (None omits the header)
+            latency: Seconds added to every response
+        """
+        super().__init__(address, FakeGitHubHandler)
+        self.organization = organization
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.throttle_every = throttle_every
+        self.throttle_retry_after = throttle_retry_after
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.used = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.throttled = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, path, query):
+        org = self.server.organization
+        parts = [p for p in path.split('/') if p]
+
+        if len(parts) == 3 and parts[0] == 'orgs' and parts[1] == org.org and parts[2] == 'repos':
+            return org.repositories()
+        if len(parts) < 3 or parts[0] != 'repos' or parts[1] != org.org:
+            return None
+        r = org.repository_index(parts[2])
+        if r is None:
+            return None
+        if len(parts) == 3:
+            return org.repository(r)
+        if len(parts) == 4 and parts[3] == 'pulls':
+            return org.pull_requests(r, query.get('state', ['open'])[0])
+        if len(parts) == 6 and parts[3] == 'pulls' and parts[4].isdigit():
+            number = int(parts[4])
+            if not 1 <= number <= org.prs_per_repo:
+                return None
+            if parts[5] == 'reviews':
+                return org.reviews(r, number)
+            if parts[5] == 'comments':
+                return org.comments(r, number)
+        return None
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        with server.lock:
+            server.requests += 1
+            now = time.time()
+            if now - server.window_start >= server.rate_window:
+                server.window_start = now
+                server.used = 0
+            reset = int(server.window_start + server.rate_window)
+            throttle = server.throttle_every and server.requests % server.throttle_every == 0
+            exhausted = server.used >= server.rate_limit
+
+        if throttle or exhausted:
+            with server.lock:
+                server.throttled += 1
+            headers = {'X-RateLimit-Limit': str(server.rate_limit), 'X-RateLimit-Reset': str(reset)}
+            if throttle:
+                if server.throttle_retry_after is not None:
+                    headers['Retry-After'] = str(server.throttle_retry_after)
+                headers['X-RateLimit-Remaining'] = str(max(0, server.rate_limit - server.used))
+                message = 'You have exceeded a secondary rate limit'
+            else:
+                headers['X-RateLimit-Remaining'] = '0'
+                message = 'API rate limit exceeded'
+            return self._send_json(403, {'message': message}, headers)
+
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        items = self._route(parsed.path, query)
+        if items is None:
+            return self._send_json(404, {'message': 'Not Found'})
+
+        headers = {}
+        body = items
+        if isinstance(items, list):
+            per_page = min(100, int(query.get('per_page', ['30'])[0]))
+            page = int(query.get('page', ['1'])[0])
+            body = items[(page - 1) * per_page:page * per_page]
+            if page * per_page < len(items):
+                next_query = {k: v[0] for k, v in query.items()}
+                next_query['page'] = str(page + 1)
+                headers['Link'] = f'<{server.url}{parsed.path}?{urlencode(next_query)}>; rel="next"'
+
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+        headers['ETag'] = etag
+
+        with server.lock:
+            if self.headers.get('If-None-Match') == etag:
+                server.not_modified += 1
+                remaining = server.rate_limit - server.used
+            else:
+                server.used += 1
+                remaining = server.rate_limit - server.used
+        headers['X-RateLimit-Limit'] = str(server.rate_limit)
+        headers['X-RateLimit-Remaining'] = str(remaining)
+        headers['X-RateLimit-Reset'] = str(reset)
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self._send_json(200, body, headers)
+
+def start_fake_github(port=0, **kwargs):
+    """
+    Start a fake GitHub server on a background thread
+
+    Args:
+        port: TCP port (0 picks a free one)
+        kwargs: FakeOrganization and FakeGitHubServer options
+
+    Returns:
+        The running FakeGitHubServer; call shutdown() to stop it
+    """
+    org_options = {k: kwargs.pop(k) for k in ('org', 'repos', 'prs', 'users', 'reviews', 'comments') if k in kwargs}
+    server = FakeGitHubServer(('127.0.0.1', port), FakeOrganization(**org_options), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, name='fake-github', daemon=True)
+    thread.start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic GitHub organization for offline backfill runs")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--org', default='fake-org')
+    parser.add_argument('--repos', type=int, default=10)
+    parser.add_argument('--prs', type=int, default=100, help="PRs per repository")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--reviews', type=int, default=2, help="Reviews per PR")
+    parser.add_argument('--comments', type=int, default=3, help="Review comments per PR")
+    parser.add_argument('--rate-limit', type=int, default=5000)
+    parser.add_argument('--throttle-every', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = FakeGitHubServer(
+        ('127.0.0.1', args.port),
+        FakeOrganization(args.org, args.repos, args.prs, args.users, args.reviews, args.comments),
+        rate_limit=args.rate_limit, throttle_every=args.throttle_every, latency=args.latency
+    )
+    print(f"Fake GitHub API for '{args.org}' listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Local stand-in for Slack incoming webhooks
+
+Accepts POSTed messages on any path (each path is one webhook), enforces
+Slack's per-webhook rate limit with 429 + Retry-After, and can inject
+5xx errors and slow responses, so the delivery client can be exercised
+offline. GET /stats returns what was received.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.fake_slack --port 8098
+    SLACK_WEBHOOK_URL=http://localhost:8098/hooks/dev python -m prequel_app.app
+
+    # Drive the delivery client against a fresh server and report
+    python -m benchmarks.fake_slack --send 20 --fail-every 5 --latency 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+class FakeSlackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, rate=1.0, burst=2, retry_after=1, fail_every=0, latency=0.0):
+        """
+        Args:
+            rate: Messages per second accepted per webhook path
+            burst: Messages per path accepted back to back
+            retry_after: Retry-After seconds sent with a 429
+            fail_every: Answer every Nth POST with a 500 (0 disables)
+            latency: Seconds added to every response
+        """
+        super().__init__(address, FakeSlackHandler)
+        self.rate = rate
+        self.burst = burst
+        self.retry_after = retry_after
+        self.fail_every = fail_every
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests = 0
+        self.accepted = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.invalid = 0
+        self.messages = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # A client that timed out on the injected latency has already hung up
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def take_token(self, path):
+        """Per-path token bucket; False means the message is over the rate limit"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(path, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.buckets[path] = (tokens, now)
+            return False
+        self.buckets[path] = (tokens - 1, now)
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'accepted': self.accepted,
+                'rate_limited': self.rate_limited,
+                'failed': self.failed,
+                'invalid': self.invalid,
+                'webhooks': {path: len(messages) for path, messages in self.messages.items()}
+            }
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None, content_type='text/plain'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send(200, json.dumps(self.server.stats()), content_type='application/json')
+        self._send(404, 'not_found')
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if server.latency:
+            time.sleep(server.latency)
+
+        with server.lock:
+            server.requests += 1
+            if server.fail_every and server.requests % server.fail_every == 0:
+                server.failed += 1
+                fail = True
+            else:
+                fail = False
+                limited = not server.take_token(self.path)
+                if limited:
+                    server.rate_limited += 1
+        if fail:
+            return self._send(500, 'internal_error')
+        if limited:
+            return self._send(429, 'rate_limited', {'Retry-After': str(server.retry_after)})
+
+        try:
+            message = json.loads(body)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict) or not (message.get('text') or message.get('blocks')):
+            with server.lock:
+                server.invalid += 1
+            return self._send(400, 'invalid_payload')
+
+        with server.lock:
+            server.accepted += 1
+            server.messages.setdefault(self.path, []).append(message)
+        self._send(200, 'ok')
+
+def start_fake_slack(port=0, **kwargs):
+    """
+    Start a fake Slack webhook server on a background thread
+
+    Args:
+        port: TCP port (0 picks a free one)
+        kwargs: FakeSlackServer options
+
+    Returns:
+        The running FakeSlackServer; call shutdown() to stop it
+    """
+    server = FakeSlackServer(('127.0.0.1', port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, name='fake-slack', daemon=True)
+    thread.start()
+    return server
+
+def run_send(server, count, webhooks, workers):
+    """Send count messages spread over webhooks through a SlackClient and report"""
+    from prequel_app.slack_client import SlackClient
+
+    client = SlackClient(workers=workers, backoff_base=0.2)
+    started = time.perf_counter()
+    for i in range(count):
+        url = f"{server.url}/hooks/{i % webhooks}"
+        client.send(url, {'text': f"Message {i}", 'blocks': [{'type': 'section', 'text': {'type': 'mrkdwn', 'text': f"Message {i}"}}]})
+    enqueue_ms = (time.perf_counter() - started) * 1000
+    client.flush()
+    return {
+        'enqueue_ms': round(enqueue_ms, 1),
+        'delivery_seconds': round(time.perf_counter() - started, 2),
+        'client': client.stats(),
+        'server': server.stats()
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake Slack incoming webhooks")
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--rate', type=float, default=1.0, help="Messages per second per webhook")
+    parser.add_argument('--burst', type=int, default=2, help="Messages per webhook accepted back to back")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--fail-every', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--send', type=int, default=0,
+                        help="Send this many messages through SlackClient, print a report and exit")
+    parser.add_argument('--webhooks', type=int, default=1, help="Webhook paths used by --send")
+    parser.add_argument('--workers', type=int, default=2, help="SlackClient workers used by --send")
+    args = parser.parse_args(argv)
+
+    options = dict(rate=args.rate, burst=args.burst, retry_after=args.retry_after,
+                   fail_every=args.fail_every, latency=args.latency)
+    if args.send:
+        server = start_fake_slack(0, **options)
+        try:
+            print(json.dumps(run_send(server, args.send, args.webhooks, args.workers), indent=2))
+        finally:
+            server.shutdown()
+        return 0
+
+    server = FakeSlackServer(('127.0.0.1', args.port), **options)
+    print(f"Fake Slack webhooks listening on {server.url}/<any path>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
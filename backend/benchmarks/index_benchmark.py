@@ -0,0 +1,300 @@
+"""
+Benchmark the hot dashboard and stale-sweep queries with and without the
+indexes from migration 0002.
+
+Seeds a local SQL Server database with synthetic repositories, users and
+pull requests (1M PRs by default), then times the real DatabaseHandler
+methods and prints their query plans, first with the 0002 indexes dropped
+and then with them created.
+
+Usage (from the backend directory, against a throwaway local database):
+
+    docker run -e ACCEPT_EULA=Y -e MSSQL_SA_PASSWORD=... -p 1433:1433 \\
+        mcr.microsoft.com/mssql/server:2022-latest
+    SQL_SERVER=localhost SQL_DATABASE=prequel_bench SQL_USERNAME=sa \\
+    SQL_PASSWORD=... SQL_TRUST_SERVER_CERTIFICATE=yes \\
+        python -m benchmarks.index_benchmark --prs 1000000 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_migrations import MigrationRunner
+from prequel_db.migrations import m0002_hot_query_indexes
+
+# github_id ranges reserved for seeded rows so they never collide with real data
+REPO_ID_BASE = 900_000_000_000
+USER_ID_BASE = 910_000_000_000
+PR_ID_BASE = 920_000_000_000
+REVIEW_ID_BASE = 930_000_000_000
+COMMENT_ID_BASE = 940_000_000_000
+
+SEED_BATCH = 100_000
+
+NUMBERS_CTE = """WITH n AS (
+    SELECT TOP ({count}) CAST(? AS BIGINT) + ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS i
+    FROM sys.all_objects a CROSS JOIN sys.all_objects b CROSS JOIN sys.all_objects c
+)
+"""
+
+
+class _NoCommitConnection:
+    """Connection proxy that records statements and turns commit() into a no-op"""
+
+    def __init__(self, conn, statements):
+        self._conn = conn
+        self._statements = statements
+
+    def cursor(self):
+        return _RecordingCursor(self._conn.cursor(), self._statements)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.rollback()
+
+
+class _RecordingCursor:
+    """Cursor proxy that remembers every statement it executes"""
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, sql, *params):
+        self._statements.append((sql, params[0] if params else ()))
+        return self._cursor.execute(sql, *params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _scalar(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def seed(db, prs, repos, users, reviews, comments):
+    """Insert synthetic data in server-side batches; skips tables already seeded"""
+    cursor = db.cursor
+
+    def seeded(table, base):
+        return _scalar(cursor, f"SELECT COUNT(*) FROM {table} WHERE github_id > ?", (base,))
+
+    def insert_batched(total, base, sql_template, extra_params=()):
+        done = 0
+        while done < total:
+            count = min(SEED_BATCH, total - done)
+            cursor.execute(NUMBERS_CTE.format(count=count) + sql_template, (base + done,) + tuple(extra_params))
+            db.conn.commit()
+            done += count
+            print(f"  {done:,}/{total:,}", end='\r', flush=True)
+        print()
+
+    if seeded('repositories', REPO_ID_BASE) < repos:
+        print(f"Seeding {repos:,} repositories")
+        insert_batched(repos, REPO_ID_BASE, """
+            INSERT INTO repositories (github_id, name, full_name)
+            SELECT i, CONCAT('bench-repo-', i), CONCAT('bench-org/bench-repo-', i) FROM n""")
+
+    if seeded('users', USER_ID_BASE) < users:
+        print(f"Seeding {users:,} users")
+        insert_batched(users, USER_ID_BASE, """
+            INSERT INTO users (github_id, username, avatar_url)
+            SELECT i, CONCAT('bench-user-', i), '' FROM n""")
+
+    if seeded('pull_requests', PR_ID_BASE) < prs:
+        print(f"Seeding {prs:,} pull requests")
+        # Ages are spread over 60 days; one PR in five is open and open PRs
+        # idle for more than two weeks are already marked stale
+        insert_batched(prs, PR_ID_BASE, """
+            INSERT INTO pull_requests
+                (github_id, repository_id, author_id, title, number, state, html_url,
+                 created_at, updated_at, closed_at, merged_at, is_stale, last_activity_at)
+            SELECT n.i, r.id, u.id, CONCAT('Benchmark PR ', n.i), n.i - ?, s.state,
+                   CONCAT('https://github.com/bench-org/pull/', n.i),
+                   DATEADD(minute, -s.age - 1440, GETDATE()),
+                   DATEADD(minute, -s.age, GETDATE()),
+                   CASE WHEN s.state = 'closed' THEN DATEADD(minute, -s.age, GETDATE()) END,
+                   NULL,
+                   CASE WHEN s.state = 'open' AND s.age > 20160 THEN 1 ELSE 0 END,
+                   DATEADD(minute, -s.age, GETDATE())
+            FROM n
+            CROSS APPLY (SELECT CASE WHEN n.i % 5 = 0 THEN 'open' ELSE 'closed' END AS state,
+                                (n.i * 104729) % 86400 AS age) s
+            JOIN repositories r ON r.github_id = ? + (n.i % ?) + 1
+            JOIN users u ON u.github_id = ? + ((n.i * 7919) % ?) + 1""",
+            (PR_ID_BASE, REPO_ID_BASE, repos, USER_ID_BASE, users))
+
+    for table, base, per_pr, insert_sql in (
+        ('pr_reviews', REVIEW_ID_BASE, reviews, """
+            INSERT INTO pr_reviews (github_id, pull_request_id, reviewer_id, state, submitted_at)
+            SELECT n.i, pr.id, u.id, 'APPROVED', pr.last_activity_at
+            FROM n
+            JOIN pull_requests pr ON pr.github_id = ? + ((n.i - ? - 1) % ?) + 1
+            JOIN users u ON u.github_id = ? + ((n.i * 31) % ?) + 1"""),
+        ('review_comments', COMMENT_ID_BASE, comments, """
+            INSERT INTO review_comments
+                (github_id, pull_request_id, author_id, body, created_at, updated_at, contains_command)
+            SELECT n.i, pr.id, u.id, 'Benchmark comment', pr.last_activity_at, pr.last_activity_at,
+                   CASE WHEN n.i % 10 = 0 THEN 1 ELSE 0 END
+            FROM n
+            JOIN pull_requests pr ON pr.github_id = ? + ((n.i - ? - 1) % ?) + 1
+            JOIN users u ON u.github_id = ? + ((n.i * 17) % ?) + 1"""),
+    ):
+        total = int(prs * per_pr)
+        if total and seeded(table, base) < total:
+            print(f"Seeding {total:,} rows into {table}")
+            insert_batched(total, base, insert_sql, (PR_ID_BASE, base, prs, USER_ID_BASE, users))
+
+
+def drop_indexes(db):
+    for name, table, _ in m0002_hot_query_indexes.INDEXES:
+        db.cursor.execute(
+            f"IF EXISTS (SELECT * FROM sys.indexes WHERE name = N'{name}' AND object_id = OBJECT_ID(N'[dbo].[{table}]')) "
+            f"DROP INDEX {name} ON {table}"
+        )
+    db.conn.commit()
+
+
+def create_indexes(db):
+    for statement in m0002_hot_query_indexes.STATEMENTS:
+        db.cursor.execute(statement)
+    db.conn.commit()
+
+
+def query_plans(db, statements):
+    """Return the estimated plan (SHOWPLAN_TEXT) for each recorded statement"""
+    plans = []
+    db.cursor.execute("SET SHOWPLAN_TEXT ON")
+    try:
+        for sql, params in statements:
+            db.cursor.execute(sql, params)
+            lines = []
+            while True:
+                if db.cursor.description:
+                    lines.extend(row[0] for row in db.cursor.fetchall())
+                if not db.cursor.nextset():
+                    break
+            plans.append({'sql': ' '.join(sql.split()), 'plan': lines})
+    finally:
+        db.cursor.execute("SET SHOWPLAN_TEXT OFF")
+    return plans
+
+
+def time_method(db, name, call, repeat):
+    """Time one DatabaseHandler method; writes are rolled back"""
+    real_conn, real_cursor = db.conn, db.cursor
+    timings = []
+    statements = []
+    try:
+        for attempt in range(repeat):
+            recorded = []
+            db.conn = _NoCommitConnection(real_conn, recorded)
+            db.cursor = db.conn.cursor()
+            started = time.perf_counter()
+            call(db)
+            timings.append((time.perf_counter() - started) * 1000)
+            real_conn.rollback()
+            if attempt == 0:
+                statements = recorded
+    finally:
+        db.conn, db.cursor = real_conn, real_cursor
+
+    return {
+        'method': name,
+        'runs': repeat,
+        'median_ms': round(statistics.median(timings), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'statements': len(statements),
+        'plans': query_plans(db, statements)
+    }
+
+
+BENCHMARKS = [
+    ('check_for_stale_prs', lambda db: db.check_for_stale_prs(7)),
+    ('get_stale_prs', lambda db: db.get_stale_prs()),
+    ('get_repositories_with_pr_counts', lambda db: db.get_repositories_with_pr_counts()),
+    ('get_contributors_with_counts', lambda db: db.get_contributors_with_counts()),
+    ('get_pr_metrics', lambda db: db.get_pr_metrics()),
+    ('get_recent_prs', lambda db: db.get_recent_prs(limit=10)),
+]
+
+
+def run_suite(db, label, repeat):
+    print(f"\n== {label} ==")
+    results = []
+    for name, call in BENCHMARKS:
+        result = time_method(db, name, call, repeat)
+        print(f"{name:34} median {result['median_ms']:>10.2f} ms  ({result['statements']} statements)")
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot queries before/after migration 0002 indexes")
+    parser.add_argument('--prs', type=int, default=1_000_000)
+    parser.add_argument('--repos', type=int, default=2_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--reviews-per-pr', type=float, default=1.0)
+    parser.add_argument('--comments-per-pr', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--allow-remote', action='store_true',
+                        help="Allow running against a non-local server (seeds millions of rows)")
+    args = parser.parse_args(argv)
+
+    server = os.getenv('SQL_SERVER', '')
+    if not args.allow_remote and server not in ('localhost', '127.0.0.1'):
+        print(f"Refusing to seed benchmark data into {server!r}; use a local database or --allow-remote",
+              file=sys.stderr)
+        return 1
+
+    runner = MigrationRunner()
+    if hasattr(runner, 'connection_failed') and runner.connection_failed:
+        print("Could not connect to the database", file=sys.stderr)
+        return 1
+    runner.upgrade()
+    runner.close()
+
+    db = DatabaseHandler()
+    try:
+        seed(db, args.prs, args.repos, args.users, args.reviews_per_pr, args.comments_per_pr)
+
+        drop_indexes(db)
+        db.cursor.execute("UPDATE STATISTICS pull_requests")
+        db.conn.commit()
+        before = run_suite(db, "without 0002 indexes", args.repeat)
+
+        create_indexes(db)
+        after = run_suite(db, "with 0002 indexes", args.repeat)
+
+        print("\n== speedup ==")
+        for b, a in zip(before, after):
+            speedup = b['median_ms'] / a['median_ms'] if a['median_ms'] else float('inf')
+            print(f"{b['method']:34} {b['median_ms']:>10.2f} -> {a['median_ms']:>10.2f} ms  ({speedup:.1f}x)")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({
+                    'parameters': vars(args),
+                    'before': before,
+                    'after': after
+                }, f, indent=2)
+            print(f"\nResults written to {args.output}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
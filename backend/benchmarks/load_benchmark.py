@@ -0,0 +1,592 @@
+"""
+Load-test the webhook route and the dashboard API
+
+Generates realistic, signed GitHub webhook deliveries (pull_request,
+pull_request_review and pull_request_review_comment) at a configurable
+rate, POSTs them to the webhook route and then times the /api/* GET
+routes. Reports throughput, p50/p95/p99 latency, database statements per
+event and memory, and writes everything as JSON so runs on different
+commits can be compared.
+
+By default the app runs in-process behind the Flask test client, against
+a fresh SQLite database in a temporary directory (DB_BACKEND=sqlite), with
+deliveries processed inline (WEBHOOK_QUEUE_WORKERS=0) so each request's
+latency includes its database writes. Use --queue-workers to measure the
+queued path instead, or --url to drive a running server (statement counts
+and memory are then not available).
+
+Usage (from the backend directory):
+
+    python -m benchmarks.load_benchmark --events 5000 --rate 200 --output bench.json
+    python -m benchmarks.load_benchmark --events 5000 --compare bench.json
+    python -m benchmarks.load_benchmark --url http://localhost:5001 --secret $GITHUB_WEBHOOK_SECRET
+"""
+import os
+import sys
+import hmac
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+# github_id ranges for the generated entities
+REPO_ID_BASE = 700_000_000
+USER_ID_BASE = 710_000_000
+PR_ID_BASE = 720_000_000
+REVIEW_ID_BASE = 730_000_000
+COMMENT_ID_BASE = 740_000_000
+
+# Share of each event type in the generated stream
+EVENT_MIX = (
+    ('pull_request', 0.3),
+    ('pull_request_review', 0.3),
+    ('pull_request_review_comment', 0.4)
+)
+
+REVIEW_STATES = ('APPROVED', 'CHANGES_REQUESTED', 'COMMENTED')
+
+COMMENT_BODIES = (
+    "Looks good to me",
+    "Could you add a test for this case?",
+    "Nit: this name is a bit misleading",
+    "/lgtm",
+    "/approve",
+    "Why is this needed? The caller already checks it.",
+    "This will break on empty input"
+)
+
+# GET routes timed after the webhook phase: (name, path)
+API_ROUTES = (
+    ('stats', '/api/stats'),
+    ('metrics', '/api/metrics'),
+    ('repositories', '/api/repositories'),
+    ('contributors', '/api/contributors'),
+    ('contributors_page', '/api/contributors?limit=50&sort=last_activity'),
+    ('contributors_stream', '/api/contributors?stream=1'),
+    ('stale_prs_page', '/api/stale-prs?limit=50'),
+    ('system_db_pool', '/api/system/db-pool')
+)
+
+def _ts(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def latency_summary(latencies_ms, elapsed, errors=0):
+    """Throughput and latency percentiles for one set of requests"""
+    count = len(latencies_ms)
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(count / elapsed, 1) if elapsed else None,
+        'p50_ms': _round(percentile(latencies_ms, 50)),
+        'p95_ms': _round(percentile(latencies_ms, 95)),
+        'p99_ms': _round(percentile(latencies_ms, 99)),
+        'max_ms': _round(max(latencies_ms) if latencies_ms else None)
+    }
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+class PayloadGenerator:
+    """
+    Deterministic stream of GitHub webhook deliveries
+
+    Pull requests are opened before they are reviewed or commented on;
+    later events pick a random open PR, so activity is spread over the
+    repositories and users the way a busy organization's is.
+    """
+
+    def __init__(self, seed=1, repos=20, users=200, org='bench-org', start=None):
+        self.rng = random.Random(seed)
+        self.repo_count = repos
+        self.user_count = users
+        self.org = org
+        self.clock = start or datetime.utcnow() - timedelta(days=30)
+        self.pull_requests = []
+        self.next_pr = 0
+        self.next_review = 0
+        self.next_comment = 0
+
+    def user(self, i):
+        return {
+            'id': USER_ID_BASE + i,
+            'login': f"bench-user{i}",
+            'avatar_url': f"https://avatars.example/u/{i}",
+            'type': 'User'
+        }
+
+    def repository(self, r):
+        return {
+            'id': REPO_ID_BASE + r,
+            'name': f"repo{r}",
+            'full_name': f"{self.org}/repo{r}",
+            'private': False,
+            'owner': {'login': self.org, 'id': USER_ID_BASE - 1}
+        }
+
+    def _tick(self):
+        # Deliveries arrive a few seconds to a few minutes apart
+        self.clock += timedelta(seconds=self.rng.randint(5, 300))
+        return _ts(self.clock)
+
+    def _open_pull_request(self, now):
+        r = self.rng.randrange(self.repo_count)
+        self.next_pr += 1
+        pr = {
+            'id': PR_ID_BASE + self.next_pr,
+            'number': self.next_pr,
+            'title': f"Benchmark change {self.next_pr}",
+            'body': "Generated by benchmarks.load_benchmark",
+            'state': 'open',
+            'html_url': f"https://github.com/{self.org}/repo{r}/pull/{self.next_pr}",
+            'user': self.user(self.rng.randrange(self.user_count)),
+            'created_at': now,
+            'updated_at': now,
+            'closed_at': None,
+            'merged_at': None
+        }
+        self.pull_requests.append((r, pr))
+        return r, pr, 'opened'
+
+    def _pick_pull_request(self, now):
+        r, pr = self.rng.choice(self.pull_requests)
+        pr['updated_at'] = now
+        return r, pr
+
+    def next_event(self):
+        """
+        Returns:
+            (event_type, payload dict)
+        """
+        now = self._tick()
+        event_type = self.rng.choices([e for e, _ in EVENT_MIX], [w for _, w in EVENT_MIX])[0]
+        if not self.pull_requests:
+            event_type = 'pull_request'
+
+        if event_type == 'pull_request':
+            if self.pull_requests and self.rng.random() < 0.4:
+                r, pr = self._pick_pull_request(now)
+                action = self.rng.choice(('synchronize', 'edited'))
+            else:
+                r, pr, action = self._open_pull_request(now)
+            return event_type, {'action': action, 'number': pr['number'],
+                                'pull_request': dict(pr), 'repository': self.repository(r),
+                                'sender': pr['user']}
+
+        r, pr = self._pick_pull_request(now)
+        reviewer = self.user(self.rng.randrange(self.user_count))
+        if event_type == 'pull_request_review':
+            self.next_review += 1
+            review = {
+                'id': REVIEW_ID_BASE + self.next_review,
+                'user': reviewer,
+                'body': self.rng.choice(COMMENT_BODIES) if self.rng.random() < 0.5 else None,
+                'state': self.rng.choice(REVIEW_STATES),
+                'submitted_at': now,
+                'html_url': f"{pr['html_url']}#pullrequestreview-{self.next_review}"
+            }
+            return event_type, {'action': 'submitted', 'review': review, 'pull_request': dict(pr),
+                                'repository': self.repository(r), 'sender': reviewer}
+
+        self.next_comment += 1
+        comment = {
+            'id': COMMENT_ID_BASE + self.next_comment,
+            'user': reviewer,
+            'body': self.rng.choice(COMMENT_BODIES),
+            'path': f"src/module{self.rng.randrange(50)}.py",
+            'created_at': now,
+            'updated_at': now,
+            'html_url': f"{pr['html_url']}#discussion_r{self.next_comment}"
+        }
+        return event_type, {'action': 'created', 'comment': comment, 'pull_request': dict(pr),
+                            'repository': self.repository(r), 'sender': reviewer}
+
+    def deliveries(self, count, secret):
+        """
+        Build count signed deliveries
+
+        Returns:
+            List of (event_type, headers, body bytes)
+        """
+        deliveries = []
+        for _ in range(count):
+            event_type, payload = self.next_event()
+            body = json.dumps(payload).encode('utf-8')
+            signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+            deliveries.append((event_type, {
+                'Content-Type': 'application/json',
+                'X-GitHub-Event': event_type,
+                'X-GitHub-Delivery': str(uuid.UUID(int=self.rng.getrandbits(128))),
+                'X-Hub-Signature-256': f"sha256={signature}",
+                'User-Agent': 'GitHub-Hookshot/benchmark'
+            }, body))
+        return deliveries
+
+class StatementCounter:
+    """Counts statements executed through connections opened by the storage backend"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+    def install(self, backend):
+        """Wrap backend.connect; must run before the connection pool is created"""
+        connect = backend.connect
+        backend.connect = lambda: _CountingConnection(connect(), self)
+
+class _CountingConnection:
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self):
+        return _CountingCursor(self._conn.cursor(), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, sql, *params):
+        # Pool health checks are not part of the work being measured
+        if sql != "SELECT 1":
+            self._counter.add()
+        return self._cursor.execute(sql, *params)
+
+    def executemany(self, sql, *params):
+        self._counter.add()
+        return self._cursor.executemany(sql, *params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Forward attributes such as pyodbc's fast_executemany
+        if name in ('_cursor', '_counter'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+class InProcessTarget:
+    """The Flask app behind its test client, configured for an isolated run"""
+
+    remote = False
+
+    def __init__(self, args, workdir):
+        os.environ['GITHUB_WEBHOOK_SECRET'] = args.secret
+        os.environ['WEBHOOK_QUEUE_WORKERS'] = str(args.queue_workers)
+        os.environ['WEBHOOK_QUEUE_PATH'] = os.path.join(workdir, 'webhook_queue.db')
+        os.environ['EVENT_LOG_DIR'] = os.path.join(workdir, 'event_log')
+        os.environ['SLACK_WEBHOOK_URL'] = ''
+        os.environ['SCHEDULER_ENABLED'] = 'false'
+        os.environ['STALE_WATCHER_ENABLED'] = 'false'
+        os.environ['DB_BACKEND'] = args.backend
+        if args.backend == 'sqlite':
+            os.environ['SQLITE_PATH'] = args.sqlite_path or os.path.join(workdir, 'prequel.db')
+        if args.no_cache:
+            os.environ['RESPONSE_CACHE_MAX_AGE'] = '0'
+
+        # Imported here so the settings above are in place when the app reads them
+        from prequel_db.db_backends import get_backend
+        self.statements = StatementCounter()
+        self.statements.install(get_backend())
+
+        from prequel_app.app import app, start_background_services
+        from prequel_app.webhook_queue import get_webhook_queue_stats
+        start_background_services()
+        self.app = app
+        self._queue_stats = get_webhook_queue_stats
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def post(self, headers, body):
+        response = self._client().post('/', data=body, headers=headers)
+        return response.status_code
+
+    def get(self, path):
+        response = self._client().get(path)
+        # Drain streamed responses so their time is included
+        response.get_data()
+        return response.status_code
+
+    def wait_for_queue(self, timeout):
+        """Wait until the webhook workers have processed everything enqueued"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = self._queue_stats()
+            if not stats.get('enabled') or (stats['depth'] == 0 and stats['in_flight'] == 0):
+                return stats
+            time.sleep(0.05)
+        return self._queue_stats()
+
+class RemoteTarget:
+    """A running server reached over HTTP"""
+
+    remote = True
+    statements = None
+
+    def __init__(self, url):
+        import requests
+        self._requests = requests
+        self.url = url.rstrip('/')
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def post(self, headers, body):
+        return self._session().post(self.url + '/', data=body, headers=headers, timeout=60).status_code
+
+    def get(self, path):
+        return self._session().get(self.url + path, timeout=120).status_code
+
+    def wait_for_queue(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = self._session().get(self.url + '/api/system/webhook-queue', timeout=30).json()
+            if not stats.get('enabled') or (stats['depth'] == 0 and stats['in_flight'] == 0):
+                return stats
+            time.sleep(0.25)
+        return stats
+
+def rss_mb():
+    """Current resident set size of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        return None
+
+def run_webhooks(target, deliveries, rate, concurrency, queue_timeout):
+    """
+    POST the deliveries, paced at rate per second (0 for as fast as possible)
+
+    Latency is measured from each delivery's scheduled send time, so a
+    server that falls behind the requested rate shows up in the
+    percentiles instead of silently slowing the generator down.
+    """
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def send(index):
+        event_type, headers, body = deliveries[index]
+        scheduled = started + index / rate if rate else time.perf_counter()
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            status = target.post(headers, body)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed_ms = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    statements_before = target.statements.count if target.statements else None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(len(deliveries))))
+    acknowledged = time.perf_counter() - started
+
+    queue_stats = target.wait_for_queue(queue_timeout)
+    processed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status not in (200, 202))
+    result = latency_summary(latencies, acknowledged, errors)
+    result['statuses'] = {str(status): count for status, count in statuses.items()}
+    result['requested_rate'] = rate or None
+    result['processed_seconds'] = round(processed, 3)
+    result['processed_per_second'] = round(len(deliveries) / processed, 1) if processed else None
+    if queue_stats.get('enabled'):
+        result['queue'] = queue_stats
+    if statements_before is not None:
+        statements = target.statements.count - statements_before
+        result['db_statements'] = statements
+        result['db_statements_per_event'] = round(statements / len(deliveries), 2) if deliveries else None
+
+    by_type = {}
+    for event_type, _, _ in deliveries:
+        by_type[event_type] = by_type.get(event_type, 0) + 1
+    result['events_by_type'] = by_type
+    return result
+
+def run_routes(target, repeat, concurrency):
+    """Time each API route repeat times"""
+    results = {}
+    for name, path in API_ROUTES:
+        latencies, errors = [], 0
+        lock = threading.Lock()
+        statements_before = target.statements.count if target.statements else None
+
+        def call(_):
+            nonlocal errors
+            request_started = time.perf_counter()
+            try:
+                status = target.get(path)
+            except Exception:
+                status = None
+            elapsed_ms = (time.perf_counter() - request_started) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(call, range(repeat)))
+        result = latency_summary(latencies, time.perf_counter() - started, errors)
+        result['path'] = path
+        if statements_before is not None:
+            result['db_statements_per_request'] = round((target.statements.count - statements_before) / repeat, 2)
+        results[name] = result
+        print(f"  {name:22} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+              f"p99 {result['p99_ms']:>9.2f} ms  {result['throughput_per_second']:>8} req/s")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current):
+    """Print throughput and p95 changes against an earlier result file"""
+    def line(name, old, new):
+        if not old or not new:
+            return
+        for key, better in (('throughput_per_second', 'higher'), ('p95_ms', 'lower')):
+            if old.get(key) and new.get(key) is not None:
+                change = (new[key] - old[key]) / old[key] * 100
+                print(f"  {name:22} {key:22} {old[key]:>10} -> {new[key]:>10}  ({change:+.1f}%, {better} is better)")
+
+    print(f"\n== compared with {baseline.get('environment', {}).get('commit') or 'baseline'} ==")
+    line('webhooks', baseline.get('webhooks'), current.get('webhooks'))
+    for name, result in current.get('routes', {}).items():
+        line(name, baseline.get('routes', {}).get(name), result)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the webhook route and the /api endpoints")
+    parser.add_argument('--events', type=int, default=2000, help="Webhook deliveries to send")
+    parser.add_argument('--rate', type=float, default=0, help="Deliveries per second (0 = as fast as possible)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent client threads")
+    parser.add_argument('--repos', type=int, default=20)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the payload generator")
+    parser.add_argument('--get-requests', type=int, default=50, help="Requests per API route")
+    parser.add_argument('--url', help="Benchmark a running server instead of the in-process app")
+    parser.add_argument('--secret', default=os.getenv('GITHUB_WEBHOOK_SECRET') or 'benchmark-secret',
+                        help="Webhook secret used to sign the payloads")
+    parser.add_argument('--backend', choices=['sqlite', 'sqlserver'], default='sqlite',
+                        help="Storage backend of the in-process app")
+    parser.add_argument('--sqlite-path', help="SQLite file for the in-process app (default: a temporary file)")
+    parser.add_argument('--queue-workers', type=int, default=0,
+                        help="Webhook queue workers of the in-process app (0 processes deliveries inline)")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the response cache of the in-process app")
+    parser.add_argument('--queue-timeout', type=float, default=600, help="Seconds to wait for the queue to drain")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    print(f"Generating {args.events:,} deliveries")
+    deliveries = PayloadGenerator(seed=args.seed, repos=args.repos, users=args.users).deliveries(
+        args.events, args.secret
+    )
+
+    with tempfile.TemporaryDirectory(prefix='prequel-bench-') as workdir:
+        if args.url:
+            target = RemoteTarget(args.url)
+        else:
+            # The app logs every request at DEBUG/INFO, which would dominate the timings
+            logging.disable(logging.INFO)
+            target = InProcessTarget(args, workdir)
+        rss_before = rss_mb() if not target.remote else None
+
+        print(f"Sending webhooks ({'unpaced' if not args.rate else f'{args.rate:g}/s'}, "
+              f"{args.concurrency} clients)")
+        webhooks = run_webhooks(target, deliveries, args.rate, args.concurrency, args.queue_timeout)
+        print(f"  {webhooks['requests']:,} deliveries, {webhooks['throughput_per_second']} req/s, "
+              f"p50 {webhooks['p50_ms']} ms, p95 {webhooks['p95_ms']} ms, p99 {webhooks['p99_ms']} ms, "
+              f"{webhooks.get('db_statements_per_event', 'n/a')} statements/event, "
+              f"{webhooks['errors']} errors")
+
+        print(f"Timing API routes ({args.get_requests} requests each)")
+        routes = run_routes(target, args.get_requests, args.concurrency)
+
+        memory = None
+        if not target.remote:
+            memory = {'rss_before_mb': rss_before, 'rss_after_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb()}
+            print(f"Memory: RSS {memory['rss_before_mb']} -> {memory['rss_after_mb']} MB, "
+                  f"peak {memory['peak_rss_mb']} MB")
+
+    results = {
+        'parameters': vars(args),
+        'environment': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'target': args.url or f"in-process ({args.backend})",
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        },
+        'webhooks': webhooks,
+        'routes': routes,
+        'memory': memory
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 1 if webhooks['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
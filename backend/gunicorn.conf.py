@@ -0,0 +1,11 @@
+# Gunicorn settings for serving prequel_app.app:app
+#
+#   gunicorn -c gunicorn.conf.py prequel_app.app:app
+
+bind = '0.0.0.0:5001'
+workers = 2
+
+def post_worker_init(worker):
+    """Start the migrations, webhook queue workers, scheduler and stale watcher in each worker"""
+    from prequel_app.app import start_background_services
+    start_background_services()
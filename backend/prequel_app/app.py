@@ -1,25 +1,29 @@
 from flask import Flask, jsonify
 import logging
-import threading
-import time
 import os
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from flask_cors import CORS
 
-from prequel_app.webhook_handler import setup_webhook_routes
+# Load environment variables before importing the modules below: several of
+# them read their settings (caches, page sizes, Slack delivery, ...) at import
+load_dotenv()
+
+from prequel_app.webhook_handler import setup_webhook_routes, start_webhook_workers
 from prequel_app.config_handler import setup_config_routes
 from prequel_app.repository_handler import setup_repository_routes
 from prequel_app.stats_handler import setup_stats_routes
+from prequel_app.system_handler import setup_system_routes
+from prequel_db.db_migrations import apply_migrations
 from prequel_app.slack_notifier import check_stale_prs
+from prequel_app.scheduler import start_scheduler
+from prequel_app.stale_watcher import start_stale_watcher
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -27,23 +31,48 @@ app = Flask(__name__)
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
 GITHUB_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET')
 STALE_PR_DAYS = int(os.getenv('STALE_PR_DAYS', '7'))  # Default to 7 days
+STALE_SWEEP_SCHEDULE = os.getenv('STALE_SWEEP_SCHEDULE', '@daily')  # Cron or 'every <n><s|m|h|d>', in UTC
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() == 'true'
 
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-# Background task for checking stale PRs
-def stale_pr_checker():
-    """Background thread to check for stale PRs on a schedule"""
-    while True:
-        logger.info("Running scheduled stale PR check")
-        check_stale_prs(STALE_PR_DAYS)
-        # Sleep for 1 day (86400 seconds)
-        time.sleep(86400)
+CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["ETag", "X-Total-Count", "X-Next-Cursor"])
 
 # Register all routes
 setup_webhook_routes(app, GITHUB_SECRET, SLACK_WEBHOOK_URL)
 setup_config_routes(app)
 setup_repository_routes(app)
 setup_stats_routes(app)
+setup_system_routes(app)
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_background_services():
+    """
+    Bring the schema up to date, then start the background threads
+
+    Importing the app starts nothing, so tests and tools can use it without
+    threads; each serving process calls this once: __main__ below, gunicorn
+    through post_worker_init in gunicorn.conf.py, and the load benchmark.
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+
+        # Request handlers never run DDL; the workers below need the tables
+        if DB_AUTO_MIGRATE:
+            apply_migrations()
+
+        start_webhook_workers(SLACK_WEBHOOK_URL)
+
+        # Scheduled jobs run in whichever process holds their lease, so every worker can start the scheduler
+        start_scheduler([
+            ('stale_pr_sweep', STALE_SWEEP_SCHEDULE, lambda: check_stale_prs(STALE_PR_DAYS))
+        ])
+
+        # Marks PRs stale as their deadlines pass; the scheduled sweep above is the backstop
+        start_stale_watcher(STALE_PR_DAYS)
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -66,13 +95,10 @@ if __name__ == '__main__':
         logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
         logger.error("Please set these variables in your .env file")
     
-    # Start stale PR checker in a separate thread if Slack webhook is configured
-    if SLACK_WEBHOOK_URL:
-        checker_thread = threading.Thread(target=stale_pr_checker, daemon=True)
-        checker_thread.start()
-        logger.info("Started stale PR checker thread")
-    else:
+    # The stale PR sweep still runs on its schedule; it just has nowhere to send notifications
+    if not SLACK_WEBHOOK_URL:
         logger.warning("SLACK_WEBHOOK_URL not set, stale PR notifications disabled")
     
+    start_background_services()
     logger.info("Starting GitHub webhook server...")
     app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+Import an organization's existing pull requests, reviews and review comments
+
+Walks the GitHub REST API and stores every item through the same
+process_* functions the webhook uses, so the rows (and rollups) are
+identical to what live events would have produced. Progress is
+checkpointed per repository, so an interrupted run resumes where it
+stopped; with the response cache, a re-run only transfers what changed.
+
+With --bulk, PRs are fetched in chunks and each chunk is written through
+the set-based bulk upserts instead (three transactions per chunk rather
+than one per item), which is much faster for large organizations.
+
+Usage (from the backend directory):
+
+    GITHUB_TOKEN=... python -m prequel_app.backfill --org my-org --workers 4
+
+Against the offline fake server:
+
+    python -m benchmarks.fake_github --port 8099 &
+    GITHUB_API_URL=http://localhost:8099 python -m prequel_app.backfill --org fake-org
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from prequel_app.github_client import GitHubClient, ResponseStore
+from prequel_app.github_handler import (process_pull_request, process_review, process_review_comment,
+                                        review_body_comment)
+from prequel_db.db_handler import DatabaseHandler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+DEFAULT_CHECKPOINT_PATH = os.path.join(DATA_DIR, 'backfill_checkpoint.json')
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, 'github_cache')
+
+# PRs per bulk write in --bulk mode
+DEFAULT_BULK_CHUNK = 200
+
+class BackfillError(Exception):
+    """Raised when an item could not be stored; the repository is retried on the next run"""
+
+class Checkpoint:
+    """
+    JSON file recording, per repository, the last fully imported PR number
+
+    PRs are imported in creation order, and PR numbers increase with
+    creation, so everything up to last_pr_number is known to be stored.
+    """
+
+    def __init__(self, path, save_interval=5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._state = {'repositories': {}}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._state = json.load(f)
+
+    def _repo(self, full_name):
+        return self._state['repositories'].setdefault(full_name, {'last_pr_number': 0, 'complete': False})
+
+    def last_pr_number(self, full_name):
+        with self._lock:
+            return self._repo(full_name)['last_pr_number']
+
+    def is_complete(self, full_name):
+        with self._lock:
+            return self._repo(full_name)['complete']
+
+    def record_pr(self, full_name, number):
+        with self._lock:
+            self._repo(full_name)['last_pr_number'] = number
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def complete(self, full_name):
+        with self._lock:
+            self._repo(full_name)['complete'] = True
+        self.save()
+
+    def reset(self, full_name):
+        with self._lock:
+            self._state['repositories'][full_name] = {'last_pr_number': 0, 'complete': False}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._last_save = time.monotonic()
+
+class BackfillImporter:
+    """Imports repositories concurrently, each repository's PRs in order"""
+
+    def __init__(self, client, checkpoint, workers=4, state='all', refresh=False, bulk_chunk=0):
+        """
+        Args:
+            client: GitHubClient
+            checkpoint: Checkpoint
+            workers: Repositories imported in parallel
+            state: PR state to import ('all', 'open' or 'closed')
+            refresh: Re-import repositories the checkpoint marks complete
+            bulk_chunk: Write PRs through the bulk upserts in chunks of this
+                many (0 stores each item through the webhook path)
+        """
+        self.client = client
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.state = state
+        self.refresh = refresh
+        self.bulk_chunk = bulk_chunk
+        self._lock = threading.Lock()
+        self.counts = {'repositories': 0, 'pull_requests': 0, 'reviews': 0, 'comments': 0,
+                       'skipped_repositories': 0, 'failed_repositories': 0}
+
+    def _add(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def list_repositories(self, org):
+        return list(self.client.iter_paginated(f"orgs/{org}/repos", {'type': 'all'}))
+
+    def run(self, org=None, repositories=None):
+        """
+        Import every repository of org, or the given 'owner/name' repositories
+
+        Returns:
+            Dict of counters
+        """
+        if repositories:
+            repos = [self.client.get_page(f"repos/{full_name}")[0] for full_name in repositories]
+        else:
+            repos = self.list_repositories(org)
+        logger.info(f"Backfilling {len(repos)} repositories with {self.workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as executor:
+            futures = {executor.submit(self.import_repository, repo): repo['full_name'] for repo in repos}
+            for future in as_completed(futures):
+                full_name = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    self._add('failed_repositories')
+                    logger.error(f"Backfill of {full_name} failed, it will resume from its checkpoint: {str(e)}")
+
+        self.checkpoint.save()
+        return dict(self.counts)
+
+    def import_repository(self, repo):
+        full_name = repo['full_name']
+        if self.refresh:
+            self.checkpoint.reset(full_name)
+        elif self.checkpoint.is_complete(full_name):
+            self._add('skipped_repositories')
+            return
+
+        last_number = self.checkpoint.last_pr_number(full_name)
+        pulls = self.client.iter_paginated(
+            f"repos/{full_name}/pulls",
+            {'state': self.state, 'sort': 'created', 'direction': 'asc'}
+        )
+        chunk = []
+        for pr in pulls:
+            if pr['number'] <= last_number:
+                continue
+            if self.bulk_chunk:
+                chunk.append(pr)
+                if len(chunk) >= self.bulk_chunk:
+                    self.import_chunk(repo, chunk)
+                    chunk = []
+                continue
+            self.import_pull_request(repo, pr)
+            self.checkpoint.record_pr(full_name, pr['number'])
+        if chunk:
+            self.import_chunk(repo, chunk)
+
+        self.checkpoint.complete(full_name)
+        self._add('repositories')
+        logger.info(f"Backfilled {full_name}")
+
+    def _reviews(self, full_name, number):
+        for review in self.client.iter_paginated(f"repos/{full_name}/pulls/{number}/reviews"):
+            # Pending reviews are drafts and ghost users have no id
+            if review.get('state') == 'PENDING' or not review.get('user') or not review.get('submitted_at'):
+                continue
+            yield review
+
+    def _comments(self, full_name, number):
+        for comment in self.client.iter_paginated(f"repos/{full_name}/pulls/{number}/comments"):
+            if comment.get('user'):
+                yield comment
+
+    def import_pull_request(self, repo, pr):
+        """
+        Store a PR with its reviews and review comments
+
+        The PR itself is written last: its upsert sets last_activity_at to
+        the PR's updated_at, which is at least as recent as any review or
+        comment, so stale detection sees the true last activity.
+        """
+        if not pr.get('user'):
+            return
+
+        full_name = repo['full_name']
+        number = pr['number']
+
+        for review in self._reviews(full_name, number):
+            data = {'action': 'submitted', 'repository': repo, 'pull_request': pr, 'review': review}
+            if process_review(data) is None:
+                raise BackfillError(f"Failed to store review {review.get('id')} of {full_name}#{number}")
+            self._add('reviews')
+
+        for comment in self._comments(full_name, number):
+            data = {'action': 'created', 'repository': repo, 'pull_request': pr, 'comment': comment}
+            if process_review_comment(data) is None:
+                raise BackfillError(f"Failed to store comment {comment.get('id')} of {full_name}#{number}")
+            self._add('comments')
+
+        if process_pull_request({'action': 'opened', 'repository': repo, 'pull_request': pr}) is None:
+            raise BackfillError(f"Failed to store {full_name}#{number}")
+        self._add('pull_requests')
+
+    def import_chunk(self, repo, prs):
+        """
+        Store a chunk of PRs with their reviews and review comments through the bulk upserts
+
+        PRs go first so the reviews and comments can reference them; the bulk
+        path only moves last_activity_at forward, so the result matches the
+        per-item order used by import_pull_request.
+        """
+        full_name = repo['full_name']
+        prs = [pr for pr in prs if pr.get('user')]
+        reviews, comments = [], []
+        for pr in prs:
+            for review in self._reviews(full_name, pr['number']):
+                reviews.append((pr['id'], review))
+                body_comment = review_body_comment(review)
+                if body_comment:
+                    comments.append((pr['id'], body_comment, review['id']))
+            for comment in self._comments(full_name, pr['number']):
+                comments.append((pr['id'], comment, None))
+
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                raise BackfillError(f"Database connection failed while importing {full_name}")
+            if prs and db.bulk_upsert_pull_requests([(repo, pr) for pr in prs]) is None:
+                raise BackfillError(f"Failed to bulk store PRs of {full_name}")
+            if reviews and db.bulk_upsert_reviews(reviews) is None:
+                raise BackfillError(f"Failed to bulk store reviews of {full_name}")
+            if comments and db.bulk_upsert_comments(comments) is None:
+                raise BackfillError(f"Failed to bulk store comments of {full_name}")
+        finally:
+            db.close()
+
+        self._add('pull_requests', len(prs))
+        self._add('reviews', len(reviews))
+        self._add('comments', sum(1 for _, _, review_id in comments if review_id is None))
+        if prs:
+            self.checkpoint.record_pr(full_name, max(pr['number'] for pr in prs))
+
+def mark_stale_prs(stale_days):
+    """Run the stale sweep once, without Slack notifications for the historical PRs"""
+    db = DatabaseHandler()
+    try:
+        if hasattr(db, 'connection_failed') and db.connection_failed:
+            logger.error("Database connection failed, skipping stale sweep")
+            return 0
+        return len(db.check_for_stale_prs(stale_days))
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill PRs, reviews and comments from the GitHub API")
+    parser.add_argument('--org', default=os.getenv('ORGANIZATION_NAME'), help="Organization to import (ORGANIZATION_NAME)")
+    parser.add_argument('--repo', action='append', default=[], help="Import only this owner/name repository (repeatable)")
+    parser.add_argument('--state', choices=['all', 'open', 'closed'], default='all')
+    parser.add_argument('--workers', type=int, default=4, help="Repositories imported in parallel")
+    parser.add_argument('--max-requests', type=int, default=8, help="Maximum concurrent GitHub API requests")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="ETag response cache ('' to disable)")
+    parser.add_argument('--refresh', action='store_true', help="Re-import repositories already marked complete")
+    parser.add_argument('--bulk', type=int, nargs='?', const=DEFAULT_BULK_CHUNK, default=0, metavar='CHUNK',
+                        help=f"Write through the bulk upserts, CHUNK PRs at a time (default {DEFAULT_BULK_CHUNK})")
+    parser.add_argument('--no-stale-sweep', action='store_true', help="Do not mark stale PRs afterwards")
+    args = parser.parse_args(argv)
+
+    if not args.org and not args.repo:
+        parser.error("--org or --repo is required")
+
+    logging.basicConfig(level=logging.INFO)
+
+    client = GitHubClient(
+        max_concurrency=args.max_requests,
+        store=ResponseStore(args.cache_dir) if args.cache_dir else None
+    )
+    importer = BackfillImporter(client, Checkpoint(args.checkpoint), workers=args.workers,
+                                state=args.state, refresh=args.refresh, bulk_chunk=args.bulk)
+
+    started = time.monotonic()
+    counts = importer.run(org=args.org, repositories=args.repo)
+    if not args.no_stale_sweep:
+        counts['marked_stale'] = mark_stale_prs(int(os.getenv('STALE_PR_DAYS') or '7'))
+    counts['seconds'] = round(time.monotonic() - started, 1)
+    counts['github'] = client.stats()
+
+    print(json.dumps(counts, indent=2))
+    return 1 if counts['failed_repositories'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from prequel_db.db_handler import DatabaseHandler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class SectionFetcher:
+    """
+    Runs the independent queries of a dashboard response ("sections")
+
+    In parallel mode every section runs on its own pooled connection in a
+    process-wide executor, so /api/stats takes as long as its slowest
+    section instead of the sum of all of them, and the executor's size
+    bounds how many connections dashboard requests hold at once. A section
+    whose query fails, that cannot connect or is still running when its
+    timeout expires gets its default value and is flagged in the metadata;
+    the other sections are still returned.
+    """
+
+    def __init__(self, parallel=True, workers=5, timeout=10.0):
+        """
+        Args:
+            parallel: Run sections concurrently (False runs them one after
+                another on a single connection)
+            workers: Executor threads shared by all requests
+            timeout: Seconds a request waits for its sections, counted from
+                when they are submitted
+        """
+        self.parallel = parallel
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._partial = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dashboard')
+            return self._executor
+
+    def fetch(self, sections):
+        """
+        Run the sections
+
+        Args:
+            sections: Dict of name -> (fetch, default); fetch takes a
+                DatabaseHandler and returns the section's value
+
+        Returns:
+            (results, meta): results maps every name to its value (the
+            default if the section failed); meta has the mode, a partial
+            flag, total_ms and per-section status ('ok', 'error' or
+            'timeout'), ms and error
+        """
+        started = time.perf_counter()
+        if self.parallel:
+            results, section_meta = self._fetch_parallel(sections)
+        else:
+            results, section_meta = self._fetch_sequential(sections)
+
+        failed = [name for name, meta in section_meta.items() if meta['status'] != 'ok']
+        with self._lock:
+            self._runs += 1
+            self._partial += 1 if failed else 0
+            self._timeouts += sum(1 for name in failed if section_meta[name]['status'] == 'timeout')
+            self._errors += sum(1 for name in failed if section_meta[name]['status'] == 'error')
+        if failed:
+            logger.warning(f"Dashboard sections failed or timed out: {', '.join(failed)}")
+
+        return results, {
+            'mode': 'parallel' if self.parallel else 'sequential',
+            'partial': bool(failed),
+            'total_ms': _ms(started),
+            'sections': section_meta
+        }
+
+    def _fetch_parallel(self, sections):
+        executor = self._get_executor()
+        futures = {name: executor.submit(_run_section, fetch) for name, (fetch, _) in sections.items()}
+        wait(futures.values(), timeout=self.timeout)
+
+        results, section_meta = {}, {}
+        for name, future in futures.items():
+            default = sections[name][1]
+            if not future.done():
+                # A queued section is dropped; a running one finishes in the
+                # background and returns its connection to the pool
+                future.cancel()
+                results[name] = default
+                section_meta[name] = {'status': 'timeout', 'ms': round(self.timeout * 1000, 1),
+                                      'error': f"Timed out after {self.timeout:g}s"}
+                continue
+            value, meta = future.result()
+            results[name] = value if meta['status'] == 'ok' else default
+            section_meta[name] = meta
+        return results, section_meta
+
+    def _fetch_sequential(self, sections):
+        results, section_meta = {}, {}
+        db = DatabaseHandler()
+        try:
+            for name, (fetch, default) in sections.items():
+                value, meta = _run_section(fetch, db)
+                results[name] = value if meta['status'] == 'ok' else default
+                section_meta[name] = meta
+        finally:
+            db.close()
+        return results, section_meta
+
+    def stats(self):
+        with self._lock:
+            return {
+                'parallel': self.parallel,
+                'workers': self.workers,
+                'timeout_seconds': self.timeout,
+                'runs': self._runs,
+                'partial_runs': self._partial,
+                'section_timeouts': self._timeouts,
+                'section_errors': self._errors
+            }
+
+def server_timing(meta):
+    """Render fetch() timings as a Server-Timing header value"""
+    parts = [f"{name};dur={section['ms']}" for name, section in meta['sections'].items()]
+    parts.append(f"total;dur={meta['total_ms']}")
+    return ", ".join(parts)
+
+def body_meta(meta):
+    """
+    fetch() metadata without the timings, for response bodies
+
+    Timings describe a single run and would be replayed from the response
+    cache with the body, so they are sent in the Server-Timing header instead.
+    """
+    sections = {}
+    for name, section in meta['sections'].items():
+        sections[name] = {key: value for key, value in section.items() if key != 'ms'}
+    return {'mode': meta['mode'], 'partial': meta['partial'], 'sections': sections}
+
+class _ErrorTrackingCursor:
+    """
+    Cursor proxy that remembers the first statement error
+
+    The DatabaseHandler read methods log query errors and return an empty
+    value, which a section could not tell apart from an empty result.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.error = None
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self._cursor, method)(*args)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            raise
+
+    def execute(self, *args):
+        return self._call('execute', *args)
+
+    def fetchone(self):
+        return self._call('fetchone')
+
+    def fetchall(self):
+        return self._call('fetchall')
+
+    def fetchmany(self, *args):
+        return self._call('fetchmany', *args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def _run_section(fetch, db=None):
+    """
+    Run one section, on its own connection unless db is given
+
+    Returns:
+        (value, meta)
+    """
+    started = time.perf_counter()
+    own_connection = db is None
+    try:
+        if own_connection:
+            db = DatabaseHandler()
+        if hasattr(db, 'connection_failed') and db.connection_failed:
+            return None, {'status': 'error', 'ms': _ms(started), 'error': "Database connection failed"}
+        cursor = db.cursor = _ErrorTrackingCursor(db.cursor)
+        try:
+            value = fetch(db)
+        finally:
+            db.cursor = cursor._cursor
+        if cursor.error is not None:
+            raise cursor.error
+        return value, {'status': 'ok', 'ms': _ms(started)}
+    except Exception as e:
+        logger.error(f"Error in dashboard section: {str(e)}")
+        return None, {'status': 'error', 'ms': _ms(started), 'error': str(e)}
+    finally:
+        if own_connection and db is not None:
+            db.close()
+
+section_fetcher = SectionFetcher(
+    parallel=os.getenv('DASHBOARD_PARALLEL', 'true').lower() == 'true',
+    workers=int(os.getenv('DASHBOARD_WORKERS', '5')),
+    timeout=float(os.getenv('DASHBOARD_SECTION_TIMEOUT', '10'))
+)
@@ -0,0 +1,98 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_cache import LRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class DeliveryDeduplicator:
+    """
+    Suppresses repeated GitHub deliveries, keyed on X-GitHub-Delivery
+
+    A bounded in-memory set answers the common case (GitHub retrying a
+    delivery to the same process) with a single hash lookup on the request
+    thread. The webhook_deliveries table is the durable record shared by
+    all processes; DatabaseModels inserts the delivery id in the same
+    transaction as the event's writes and rejects ids already present.
+    """
+
+    def __init__(self, ttl_hours=72, memory_size=50000, purge_interval=3600):
+        """
+        Args:
+            ttl_hours: How long a delivery id is remembered
+            memory_size: Maximum delivery ids held in memory
+            purge_interval: Seconds between purges of expired rows in the database
+        """
+        self.ttl = timedelta(hours=ttl_hours)
+        self._recent = LRUCache('webhook_deliveries', max_size=memory_size, ttl=int(self.ttl.total_seconds()))
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._suppressed = 0
+        self._accepted = 0
+
+    def _suppress(self, delivery_id, where):
+        with self._lock:
+            self._suppressed += 1
+        logger.info(f"Suppressed duplicate delivery {delivery_id} ({where})")
+
+    def accept(self, delivery_id):
+        """
+        Check a delivery on the request thread before it is queued
+
+        Returns:
+            False if the delivery id was already seen by this process
+        """
+        if not delivery_id:
+            return True
+        if self._recent.get(delivery_id) is not None:
+            self._suppress(delivery_id, "memory")
+            return False
+        self._recent.set(delivery_id, True)
+        with self._lock:
+            self._accepted += 1
+        return True
+
+    def suppressed(self, delivery_id):
+        """Count a delivery rejected because the database already recorded it"""
+        self._suppress(delivery_id, "database")
+
+    def release(self, delivery_id):
+        """Forget a delivery whose processing failed so a redelivery to this process is not suppressed"""
+        if delivery_id:
+            self._recent.invalidate(delivery_id)
+
+    def maybe_purge(self):
+        """Delete expired delivery ids, at most once per purge_interval"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+
+        db = DatabaseHandler()
+        try:
+            if not (hasattr(db, 'connection_failed') and db.connection_failed):
+                removed = db.purge_deliveries(datetime.now() - self.ttl)
+                if removed:
+                    logger.info(f"Purged {removed} expired webhook delivery ids")
+        finally:
+            db.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'accepted': self._accepted,
+                'suppressed_duplicates': self._suppressed,
+                'memory': self._recent.stats()
+            }
+
+delivery_deduplicator = DeliveryDeduplicator(
+    ttl_hours=int(os.getenv('WEBHOOK_DEDUP_TTL_HOURS', '72')),
+    memory_size=int(os.getenv('WEBHOOK_DEDUP_MEMORY_SIZE', '50000'))
+)
@@ -0,0 +1,200 @@
+import os
+import zlib
+import gzip
+import json
+import glob
+import heapq
+import time
+import logging
+import threading
+from datetime import datetime
+from itertools import chain
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/event_log'))
+
+SEGMENT_PATTERN = 'events-*.ndjson.gz'
+
+class EventLog:
+    """
+    Append-only archive of verified webhook deliveries
+
+    Each process writes its own gzip-compressed NDJSON segment (the pid is
+    part of the file name) and starts a new one when the current segment
+    reaches max_segment_bytes or max_segment_seconds. Every record is
+    sync-flushed, so a crashed process leaves a segment that reads back up
+    to its last complete record.
+    """
+
+    def __init__(self, directory=DEFAULT_EVENT_LOG_DIR, max_segment_bytes=64 * 1024 * 1024,
+                 max_segment_seconds=3600):
+        """
+        Args:
+            directory: Directory holding the segment files
+            max_segment_bytes: Uncompressed bytes written before rotating
+            max_segment_seconds: Age in seconds after which a segment is rotated
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._segment_bytes = 0
+
+        # Counters for this process
+        self._appended = 0
+        self._bytes = 0
+        self._segments = 0
+        self._errors = 0
+
+    def _open_segment(self):
+        started = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        self._path = os.path.join(self.directory, f"events-{started}-{os.getpid()}.ndjson.gz")
+        self._file = gzip.open(self._path, 'ab')
+        self._opened_at = time.monotonic()
+        self._segment_bytes = 0
+        self._segments += 1
+        logger.info(f"Opened event log segment {self._path}")
+
+    def _close_segment(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    def append(self, delivery_id, event_type, body):
+        """
+        Archive one delivery
+
+        Args:
+            delivery_id: X-GitHub-Delivery header
+            event_type: X-GitHub-Event header
+            body: Raw request body (bytes)
+        """
+        record = json.dumps({
+            'received_at': time.time(),
+            'delivery_id': delivery_id,
+            'event_type': event_type,
+            'body': body.decode('utf-8') if isinstance(body, bytes) else body
+        }).encode('utf-8') + b'\n'
+
+        with self._lock:
+            try:
+                if self._file is not None and (
+                        self._segment_bytes >= self.max_segment_bytes or
+                        time.monotonic() - self._opened_at >= self.max_segment_seconds):
+                    self._close_segment()
+                if self._file is None:
+                    self._open_segment()
+                self._file.write(record)
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+                self._segment_bytes += len(record)
+                self._bytes += len(record)
+                self._appended += 1
+            except Exception:
+                self._errors += 1
+                self._close_segment()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'current_segment': os.path.basename(self._path) if self._file is not None else None,
+                'appended': self._appended,
+                'bytes_written': self._bytes,
+                'segments_opened': self._segments,
+                'errors': self._errors
+            }
+
+def _read_segment(path):
+    """Yield the records of one segment, stopping cleanly at a truncated tail"""
+    try:
+        with gzip.open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logger.warning(f"Ignoring partial record at the end of {path}")
+                    return
+                yield json.loads(line)
+    except (EOFError, zlib.error) as e:
+        # Segment still being written, or its process died before closing it
+        logger.debug(f"Segment {path} ends without a gzip trailer: {str(e)}")
+
+def list_segments(directory):
+    """Segment paths in the order they were started"""
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))
+
+def iter_events(directory=DEFAULT_EVENT_LOG_DIR, since=None, until=None, event_types=None):
+    """
+    Yield archived deliveries in the order they were received
+
+    Each writer's segments are read one after the other and the writers are
+    merged on received_at, so only one segment per writer is open at a time.
+
+    Args:
+        directory: Event log directory
+        since: Skip deliveries received before this Unix time
+        until: Skip deliveries received at or after this Unix time
+        event_types: Only yield these event types
+
+    Yields:
+        Dicts with received_at, delivery_id, event_type and body (str)
+    """
+    writers = {}
+    for path in list_segments(directory):
+        # events-<started>-<pid>.ndjson.gz
+        writer = os.path.basename(path).split('.')[0].rsplit('-', 1)[-1]
+        writers.setdefault(writer, []).append(path)
+
+    streams = [chain.from_iterable(_read_segment(path) for path in paths) for paths in writers.values()]
+    for record in heapq.merge(*streams, key=lambda r: r['received_at']):
+        if since is not None and record['received_at'] < since:
+            continue
+        if until is not None and record['received_at'] >= until:
+            continue
+        if event_types and record['event_type'] not in event_types:
+            continue
+        yield record
+
+# Process-wide event log, created by start_event_log()
+_event_log = None
+_event_log_lock = threading.Lock()
+
+def start_event_log():
+    """
+    Create the process-wide event log from environment settings
+
+    Returns:
+        The EventLog, or None when EVENT_LOG_ENABLED is false
+    """
+    global _event_log
+    with _event_log_lock:
+        if _event_log is not None:
+            return _event_log
+        if os.getenv('EVENT_LOG_ENABLED', 'true').lower() != 'true':
+            logger.info("Webhook event log disabled")
+            return None
+        _event_log = EventLog(
+            directory=os.getenv('EVENT_LOG_DIR') or DEFAULT_EVENT_LOG_DIR,
+            max_segment_bytes=int(os.getenv('EVENT_LOG_SEGMENT_MB', '64')) * 1024 * 1024,
+            max_segment_seconds=int(os.getenv('EVENT_LOG_SEGMENT_SECONDS', '3600'))
+        )
+        return _event_log
+
+def get_event_log_stats():
+    if _event_log is None:
+        return {'enabled': False}
+    stats = _event_log.stats()
+    stats['enabled'] = True
+    return stats
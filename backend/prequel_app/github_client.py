@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://api.github.com'
+
+# GitHub asks clients hit by a secondary rate limit without Retry-After to wait at least a minute
+SECONDARY_RATE_LIMIT_BACKOFF = 60
+
+class GitHubAPIError(Exception):
+    """Raised when the GitHub API returns an error that retrying will not fix"""
+
+    def __init__(self, status, url, message):
+        super().__init__(f"GitHub API {status} for {url}: {message}")
+        self.status = status
+
+class ResponseStore:
+    """
+    On-disk copy of GitHub responses keyed by URL, with their ETags
+
+    Lets a later run send If-None-Match and reuse the stored body on 304,
+    which GitHub does not count against the rate limit.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url, etag, body, next_url):
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'etag': etag, 'body': body, 'next': next_url}, f)
+        os.replace(tmp_path, path)
+
+class GitHubClient:
+    """
+    Minimal GitHub REST client for bulk reads
+
+    Follows Link pagination, sends conditional requests when a ResponseStore
+    is given, waits out primary and secondary rate limits, and bounds the
+    number of requests in flight across threads.
+    """
+
+    def __init__(self, token=None, api_url=None, max_concurrency=4, store=None,
+                 timeout=30, max_retries=5, min_remaining=50,
+                 secondary_backoff=SECONDARY_RATE_LIMIT_BACKOFF):
+        """
+        Args:
+            token: Personal access or app token (GITHUB_TOKEN)
+            api_url: API root (GITHUB_API_URL, e.g. a local fake server)
+            max_concurrency: Maximum concurrent requests
+            store: Optional ResponseStore for ETag caching
+            timeout: Seconds per request
+            max_retries: Attempts for rate-limited or 5xx responses
+            min_remaining: Pause new requests when fewer than this many remain in the window
+            secondary_backoff: Seconds to wait after a secondary rate limit without
+                Retry-After, doubled on each further attempt
+        """
+        self.api_url = (api_url or os.getenv('GITHUB_API_URL') or DEFAULT_API_URL).rstrip('/')
+        self.token = token if token is not None else os.getenv('GITHUB_TOKEN')
+        self.store = store
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.min_remaining = min_remaining
+        self.secondary_backoff = secondary_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+
+        # Shared rate limit view, updated from every response
+        self._rate_lock = threading.Lock()
+        self._remaining = None
+        self._reset_at = 0.0
+
+        self._counter_lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.rate_limit_waits = 0
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'Accept': 'application/vnd.github+json',
+                'X-GitHub-Api-Version': '2022-11-28',
+                'User-Agent': 'prequel-backfill'
+            })
+            if self.token:
+                session.headers['Authorization'] = f"Bearer {self.token}"
+            self._local.session = session
+        return session
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _wait_for_budget(self):
+        """Sleep until the rate limit window resets if the budget is nearly spent"""
+        with self._rate_lock:
+            remaining, reset_at = self._remaining, self._reset_at
+        if remaining is not None and remaining < self.min_remaining:
+            delay = reset_at - time.time()
+            if delay > 0:
+                self._count('rate_limit_waits')
+                logger.warning(f"GitHub rate limit nearly exhausted ({remaining} left), sleeping {delay:.0f}s")
+                time.sleep(delay + 1)
+
+    def _record_rate_limit(self, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self._rate_lock:
+            self._remaining = int(remaining)
+            self._reset_at = float(reset)
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying a throttled or failed request, or None if not retryable"""
+        if response.status_code in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                return float(retry_after)
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                return max(0.0, float(response.headers.get('X-RateLimit-Reset', time.time())) - time.time()) + 1
+            if response.status_code == 429:
+                return 2 ** attempt
+            # Other 403s (e.g. missing permissions) are not worth retrying
+            if 'rate limit' in response.text.lower():
+                return self.secondary_backoff * 2 ** attempt
+            return None
+        if response.status_code >= 500:
+            return 2 ** attempt
+        return None
+
+    def get_page(self, url, params=None):
+        """
+        GET one page
+
+        Returns:
+            (body, next_url): parsed JSON and the Link rel="next" URL (or None)
+        """
+        if not url.startswith('http'):
+            url = f"{self.api_url}/{url.lstrip('/')}"
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+
+        cached = self.store.get(url) if self.store else None
+        headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+
+        for attempt in range(self.max_retries):
+            self._wait_for_budget()
+            with self._slots:
+                try:
+                    response = self._session().get(url, headers=headers, timeout=self.timeout)
+                except requests.RequestException as e:
+                    if attempt == self.max_retries - 1:
+                        raise
+                    logger.warning(f"GitHub request failed ({str(e)}), retrying")
+                    time.sleep(2 ** attempt)
+                    continue
+            self._count('requests')
+            self._record_rate_limit(response)
+
+            if response.status_code == 304 and cached:
+                self._count('not_modified')
+                return cached['body'], cached.get('next')
+
+            if response.status_code == 200:
+                body = response.json()
+                next_url = response.links.get('next', {}).get('url')
+                if self.store and response.headers.get('ETag'):
+                    self.store.set(url, response.headers['ETag'], body, next_url)
+                return body, next_url
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries - 1:
+                raise GitHubAPIError(response.status_code, url, response.text[:200])
+            self._count('rate_limit_waits')
+            logger.warning(f"GitHub returned {response.status_code} for {url}, retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    def iter_paginated(self, path, params=None):
+        """Yield every item of a paginated list endpoint"""
+        params = dict(params or {})
+        params.setdefault('per_page', 100)
+        body, next_url = self.get_page(path, params)
+        while True:
+            for item in body:
+                yield item
+            if not next_url:
+                return
+            body, next_url = self.get_page(next_url)
+
+    def stats(self):
+        with self._counter_lock, self._rate_lock:
+            return {
+                'requests': self.requests,
+                'not_modified': self.not_modified,
+                'rate_limit_waits': self.rate_limit_waits,
+                'rate_limit_remaining': self._remaining
+            }
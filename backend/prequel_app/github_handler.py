@@ -7,6 +7,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
 from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_models import DuplicateDeliveryError
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -47,9 +48,12 @@ def verify_github_webhook(request, github_secret):
         logger.error(f"Error during signature verification: {str(e)}")
         return False
 
-def process_pull_request(data):
+def process_pull_request(data, delivery=None):
     """
     Process pull request event data and store in database
+
+    delivery is an optional (delivery_id, event_type) recorded with the writes;
+    raises DuplicateDeliveryError if it was already recorded
     """
     try:
         db = DatabaseHandler()
@@ -59,40 +63,40 @@ def process_pull_request(data):
             logger.error("Database connection failed, skipping PR processing")
             return None
             
-        # Extract repository and user info
-        repo_data = data.get('repository')
-        pr_data = data.get('pull_request')
-        
-        if not repo_data or not pr_data:
-            logger.error("Missing repository or PR data")
-            return None
-            
-        user_data = pr_data.get('user')
-        
-        if not user_data:
-            logger.error("Missing user data in PR")
-            return None
-        
-        # Store in database
-        repo_id = db.get_or_create_repository(repo_data)
-        user_id = db.get_or_create_user(user_data)
-        
-        if repo_id is None or user_id is None:
-            logger.error(f"Failed to get or create repository or user: repo_id={repo_id}, user_id={user_id}")
-            db.close()
-            return None
-            
-        pr_id = db.get_or_create_pull_request(pr_data, repo_id, user_id)
+        # Repository, author and PR are written in a single transaction
+        pr_id = db.record_pull_request_event(data.get('repository'), data.get('pull_request'), delivery)
         
         db.close()
         return pr_id
+    except DuplicateDeliveryError:
+        db.close()
+        raise
     except Exception as e:
         logger.error(f"Error processing pull request: {str(e)}")
         return None
 
-def process_review(data):
+def review_body_comment(review_data):
+    """
+    Build the comment stored for a review's body, or None if it has no body
+    """
+    if not review_data or not review_data.get('body') or review_data.get('id') is None:
+        return None
+    
+    # Use some math to create a unique numeric ID based on the review ID
+    return {
+        'id': int(review_data.get('id')) + 10000000000,
+        'body': review_data.get('body'),
+        'created_at': review_data.get('submitted_at'),
+        'updated_at': review_data.get('submitted_at'),
+        'user': review_data.get('user')
+    }
+
+def process_review(data, delivery=None):
     """
     Process pull request review event data and store in database
+
+    delivery is an optional (delivery_id, event_type) recorded with the writes;
+    raises DuplicateDeliveryError if it was already recorded
     """
     try:
         db = DatabaseHandler()
@@ -102,67 +106,35 @@ def process_review(data):
             logger.error("Database connection failed, skipping review processing")
             return None
             
-        # Extract repository, user, PR, and review info
-        repo_data = data.get('repository')
         review_data = data.get('review')
-        pr_data = data.get('pull_request')
-        
-        if not repo_data or not review_data or not pr_data:
-            logger.error("Missing repository, review, or PR data")
-            return None
-            
-        reviewer_data = review_data.get('user')
-        pr_author_data = pr_data.get('user')
-        
-        if not reviewer_data or not pr_author_data:
-            logger.error("Missing reviewer or PR author data")
-            return None
-        
-        # Store in database
-        repo_id = db.get_or_create_repository(repo_data)
-        reviewer_id = db.get_or_create_user(reviewer_data)
-        pr_author_id = db.get_or_create_user(pr_author_data)
-        
-        if repo_id is None or reviewer_id is None or pr_author_id is None:
-            logger.error("Failed to get or create repository, reviewer, or PR author")
-            db.close()
-            return None
-            
-        pr_id = db.get_or_create_pull_request(pr_data, repo_id, pr_author_id)
-        
-        if pr_id is None:
-            logger.error("Failed to get or create pull request")
-            db.close()
-            return None
-            
-        review_id = db.add_pr_review(review_data, pr_id, reviewer_id)
         
         # Add review body as a comment if it exists
-        if review_data.get('body'):
-            # Create comment data from the review with a numeric ID
-            review_github_id = review_data.get('id')
-            # Use some math to create a unique numeric ID based on the review ID
-            comment_github_id = int(review_github_id) + 10000000000
-            
-            comment_data = {
-                'id': comment_github_id,
-                'body': review_data.get('body'),
-                'created_at': review_data.get('submitted_at'),
-                'updated_at': review_data.get('submitted_at')
-            }
-            
-            # Add the review comment, linking it to the review
-            db.add_review_comment(comment_data, pr_id, reviewer_id, review_id)
+        comment_data = review_body_comment(review_data)
+        
+        # Repository, users, PR, review and review comment are written in a single transaction
+        review_id = db.record_review_event(
+            data.get('repository'),
+            data.get('pull_request'),
+            review_data,
+            comment_data,
+            delivery
+        )
         
         db.close()
         return review_id
+    except DuplicateDeliveryError:
+        db.close()
+        raise
     except Exception as e:
         logger.error(f"Error processing review: {str(e)}")
         return None
 
-def process_review_comment(data):
+def process_review_comment(data, delivery=None):
     """
     Process pull request review comment and store in database
+
+    delivery is an optional (delivery_id, event_type) recorded with the writes;
+    raises DuplicateDeliveryError if it was already recorded
     """
     try:
         db = DatabaseHandler()
@@ -172,48 +144,19 @@ def process_review_comment(data):
             logger.error("Database connection failed, skipping comment processing")
             return None
             
-        # Extract repository, user, PR, and comment info
-        repo_data = data.get('repository')
-        comment_data = data.get('comment')
-        pr_data = data.get('pull_request')
-        
-        if not repo_data or not comment_data or not pr_data:
-            logger.error("Missing repository, comment, or PR data")
-            return None
-            
-        commenter_data = comment_data.get('user')
-        pr_author_data = pr_data.get('user')
-        
-        if not commenter_data or not pr_author_data:
-            logger.error("Missing commenter or PR author data")
-            return None
-        
-        # Store in database
-        repo_id = db.get_or_create_repository(repo_data)
-        commenter_id = db.get_or_create_user(commenter_data)
-        pr_author_id = db.get_or_create_user(pr_author_data)
-        
-        if repo_id is None or commenter_id is None or pr_author_id is None:
-            logger.error("Failed to get or create repository, commenter, or PR author")
-            db.close()
-            return None
-            
-        pr_id = db.get_or_create_pull_request(pr_data, repo_id, pr_author_id)
-        
-        if pr_id is None:
-            logger.error("Failed to get or create pull request")
-            db.close()
-            return None
-        
-        # Check if this comment is associated with a review
-        review_id = None
-        if comment_data.get('pull_request_review_id'):
-            pass
-        
-        comment_id = db.add_review_comment(comment_data, pr_id, commenter_id, review_id)
+        # Repository, users, PR and comment are written in a single transaction
+        comment_id = db.record_review_comment_event(
+            data.get('repository'),
+            data.get('pull_request'),
+            data.get('comment'),
+            delivery
+        )
         
         db.close()
         return comment_id
+    except DuplicateDeliveryError:
+        db.close()
+        raise
     except Exception as e:
         logger.error(f"Error processing review comment: {str(e)}")
-        return None
\ No newline at end of file
+        return None
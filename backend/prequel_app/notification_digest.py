@@ -0,0 +1,218 @@
+import os
+import time
+import atexit
+import logging
+import threading
+
+from prequel_app.slack_client import get_slack_client
+from prequel_app.slack_notifier import send_slack_notification
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Slack limits for one message
+MAX_BLOCKS_PER_MESSAGE = 50
+MAX_HEADER_CHARS = 150
+MAX_SECTION_CHARS = 3000
+# Header and the "part x of y" context take two blocks of every digest message
+DIGEST_ITEMS_PER_MESSAGE = MAX_BLOCKS_PER_MESSAGE - 2
+
+class DigestEvent:
+    def __init__(self, message, summary, url=None, button_text='View'):
+        """
+        Args:
+            message: (title, text, fields, actions) sent when the event is alone in its window
+            summary: mrkdwn line describing the event in a digest
+            url: Link for the digest line's button
+            button_text: Label of that button
+        """
+        self.message = message
+        self.summary = summary
+        self.url = url
+        self.button_text = button_text
+
+def _truncate(text, limit):
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+def build_digest_messages(title, events):
+    """
+    Render events as one or more Slack messages within the block limits
+
+    Args:
+        title: Header text; '{count}' is replaced with the number of events
+        events: DigestEvents, one section block each
+
+    Returns:
+        List of message payloads
+    """
+    chunks = [events[i:i + DIGEST_ITEMS_PER_MESSAGE] for i in range(0, len(events), DIGEST_ITEMS_PER_MESSAGE)]
+    header = _truncate(title.replace('{count}', str(len(events))), MAX_HEADER_CHARS)
+    messages = []
+    for part, chunk in enumerate(chunks, 1):
+        blocks = [{"type": "header", "text": {"type": "plain_text", "text": header}}]
+        for event in chunk:
+            section = {"type": "section", "text": {"type": "mrkdwn", "text": _truncate(event.summary, MAX_SECTION_CHARS)}}
+            if event.url:
+                section["accessory"] = {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": _truncate(event.button_text, 75)},
+                    "url": event.url
+                }
+            blocks.append(section)
+        blocks.append({"type": "context", "elements": [
+            {"type": "mrkdwn", "text": f"Part {part} of {len(chunks)}" if len(chunks) > 1 else f"{len(events)} events"}
+        ]})
+        messages.append({"text": header, "blocks": blocks})
+    return messages
+
+class _Group:
+    def __init__(self, webhook_url, title, flush_at):
+        self.webhook_url = webhook_url
+        self.title = title
+        self.flush_at = flush_at
+        self.events = []
+
+class NotificationCoalescer:
+    """
+    Groups notifications per Slack webhook (channel) and key over a window
+
+    The first event of a group opens a window of `window` seconds; events
+    with the same webhook and key that arrive before it closes are sent
+    together as one digest message (split into several when it would
+    exceed Slack's block limit). A group that ends up with a single event
+    is sent as the usual individual message, so quiet periods look the
+    same as before. With window=0 every event is sent immediately.
+    """
+
+    def __init__(self, window=10.0, max_events=500):
+        """
+        Args:
+            window: Seconds a group collects events before it is sent
+            max_events: Events after which a group is sent without waiting
+                for its window to close
+        """
+        self.window = window
+        self.max_events = max_events
+        self._groups = {}
+        self._thread = None
+        self._changed = threading.Condition()
+
+        # Counters for this process
+        self._events = 0
+        self._messages = 0
+        self._digests = 0
+        self._largest_digest = 0
+
+    def add(self, webhook_url, key, title, event):
+        """
+        Queue an event for its group
+
+        Args:
+            webhook_url: Slack webhook (one per channel)
+            key: Group key within the channel, e.g. ('opened', repository)
+            title: Digest header; '{count}' is replaced with the event count
+            event: DigestEvent
+        """
+        if not webhook_url:
+            logger.error("SLACK_WEBHOOK_URL not configured")
+            return
+        if self.window <= 0:
+            with self._changed:
+                self._events += 1
+            self._send(webhook_url, title, [event])
+            return
+
+        full = None
+        with self._changed:
+            self._events += 1
+            group = self._groups.get((webhook_url, key))
+            if group is None:
+                group = self._groups[(webhook_url, key)] = _Group(webhook_url, title, time.monotonic() + self.window)
+                self._ensure_thread()
+                self._changed.notify()
+            group.events.append(event)
+            if len(group.events) >= self.max_events:
+                full = self._groups.pop((webhook_url, key))
+        if full is not None:
+            self._send(full.webhook_url, full.title, full.events)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='notification-digest', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                now = time.monotonic()
+                due = [key for key, group in self._groups.items() if group.flush_at <= now]
+                groups = [self._groups.pop(key) for key in due]
+                if not groups:
+                    next_flush = min((group.flush_at for group in self._groups.values()), default=None)
+                    self._changed.wait(None if next_flush is None else next_flush - now)
+                    continue
+            for group in groups:
+                try:
+                    self._send(group.webhook_url, group.title, group.events)
+                except Exception as e:
+                    logger.error(f"Error sending notification digest: {str(e)}")
+
+    def _send(self, webhook_url, title, events):
+        if len(events) == 1:
+            send_slack_notification(webhook_url, *events[0].message)
+            sent = 1
+        else:
+            messages = build_digest_messages(title, events)
+            for message in messages:
+                get_slack_client().send(webhook_url, message)
+            sent = len(messages)
+            logger.info(f"Sent digest of {len(events)} notifications as {sent} Slack messages")
+        with self._changed:
+            self._messages += sent
+            if len(events) > 1:
+                self._digests += 1
+                self._largest_digest = max(self._largest_digest, len(events))
+
+    def flush(self):
+        """Send every pending group now"""
+        with self._changed:
+            groups, self._groups = list(self._groups.values()), {}
+        for group in groups:
+            self._send(group.webhook_url, group.title, group.events)
+
+    def _flush_at_exit(self):
+        self.flush()
+        get_slack_client().flush(5)
+
+    def stats(self):
+        with self._changed:
+            return {
+                'window_seconds': self.window,
+                'events_received': self._events,
+                'messages_sent': self._messages,
+                'digests': self._digests,
+                'largest_digest': self._largest_digest,
+                'pending_groups': len(self._groups),
+                'pending_events': sum(len(group.events) for group in self._groups.values())
+            }
+
+# Process-wide coalescer, created by get_notification_coalescer()
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+def get_notification_coalescer():
+    """
+    Get the process-wide NotificationCoalescer, creating it from environment settings on first use
+
+    Created lazily so SLACK_COALESCE_* values loaded from .env after import still apply.
+    """
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = NotificationCoalescer(
+                    window=float(os.getenv('SLACK_COALESCE_SECONDS', '10')),
+                    max_events=int(os.getenv('SLACK_COALESCE_MAX_EVENTS', '500'))
+                )
+    return _coalescer
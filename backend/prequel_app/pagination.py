@@ -0,0 +1,114 @@
+import os
+import json
+import base64
+import logging
+from datetime import datetime
+from flask import request, jsonify
+
+from prequel_db.db_paging import PageRequest
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+
+# Query parameters parsed as dates
+DATE_FILTERS = ('since', 'until')
+
+class PaginationError(ValueError):
+    """Raised for malformed paging, sort or filter parameters (answered with 400)"""
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+def encode_cursor(sort, after):
+    """Opaque token holding the sort name and the sort key of the last row returned"""
+    payload = json.dumps([sort, [_encode_value(value) for value in after]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """
+    Returns:
+        (sort, after) encoded by encode_cursor()
+
+    Raises:
+        PaginationError: If the token is not a cursor
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort, after = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort, [_decode_value(value) for value in after]
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+def _parse_date(name, value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise PaginationError(f"Invalid date for '{name}': {value}")
+
+def parse_page_request(sorts, filters):
+    """
+    Build a PageRequest from the query string
+
+    Supported parameters: limit (1..API_MAX_PAGE_SIZE), cursor (from
+    X-Next-Cursor), sort (a key of sorts) and any key of filters; since/until
+    take ISO 8601 dates. Without limit or cursor every matching row is returned.
+
+    Raises:
+        PaginationError: If a parameter is malformed
+    """
+    args = request.args
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    sort = args.get('sort')
+    if sort is not None and sort not in sorts:
+        raise PaginationError(f"sort must be one of: {', '.join(sorts)}")
+
+    after = None
+    cursor = args.get('cursor')
+    if cursor:
+        cursor_sort, after = decode_cursor(cursor)
+        if sort is not None and sort != cursor_sort:
+            raise PaginationError("cursor was issued for a different sort")
+        if cursor_sort not in sorts or len(after) != len(sorts[cursor_sort]):
+            raise PaginationError("Invalid cursor")
+        sort = cursor_sort
+        # Continue in pages of the default size when only a cursor is given
+        limit = limit or MAX_PAGE_SIZE
+
+    page_filters = {}
+    for name in filters:
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        page_filters[name] = _parse_date(name, value) if name in DATE_FILTERS else value
+
+    return PageRequest(sort=sort, filters=page_filters, limit=limit, after=after)
+
+def paged_response(items, page, next_after, total, default_sort):
+    """
+    JSON array response with X-Total-Count and, if more rows follow, X-Next-Cursor
+
+    The body stays a plain array so existing clients are unaffected.
+    """
+    response = jsonify(items)
+    response.headers['X-Total-Count'] = str(total)
+    if next_after is not None:
+        response.headers['X-Next-Cursor'] = encode_cursor(page.sort or default_sort, next_after)
+    return response, 200
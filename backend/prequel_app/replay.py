@@ -0,0 +1,231 @@
+"""
+Replay archived webhook deliveries from the event log
+
+Reads the segments written by prequel_app.event_log and feeds the events
+back through the ingestion path (process_webhook_event, without Slack
+notifications). Events are partitioned by pull request, so deliveries for
+the same PR are applied in the order they were received while different
+PRs are replayed concurrently. The writes are upserts, so replaying events
+that were already stored is harmless. Pointed at a test database, a replay
+of a large log also works as a load generator for the ingestion path.
+
+Usage (from the backend directory):
+
+    python -m prequel_app.replay --since 2024-05-01T00:00 --concurrency 8
+    python -m prequel_app.replay --bulk --batch-size 500
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from prequel_app.event_log import DEFAULT_EVENT_LOG_DIR, iter_events
+from prequel_app.github_handler import review_body_comment
+from prequel_app.webhook_handler import process_webhook_event, PULL_REQUEST_ACTIONS
+from prequel_db.db_handler import DatabaseHandler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+REPLAYED_EVENT_TYPES = ('pull_request', 'pull_request_review', 'pull_request_review_comment')
+
+def ordering_key(record, data):
+    """Events with the same key must be applied in order: one key per pull request"""
+    pr = data.get('pull_request') or {}
+    repo = data.get('repository') or {}
+    if pr.get('id') is not None:
+        return f"pr:{pr['id']}"
+    if repo.get('id') is not None and pr.get('number') is not None:
+        return f"pr:{repo['id']}#{pr['number']}"
+    return f"delivery:{record.get('delivery_id')}"
+
+class Replayer:
+    """Replays events on a fixed set of partitions, one worker thread per partition"""
+
+    def __init__(self, concurrency=4, batch_size=100, bulk=False, queue_depth=4):
+        """
+        Args:
+            concurrency: Partitions (and worker threads) replaying in parallel
+            batch_size: Events handed to a partition at a time
+            bulk: Write each batch through the bulk upserts, falling back to
+                per-event processing if the bulk write fails
+            queue_depth: Batches buffered per partition before reading pauses
+        """
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.bulk = bulk
+        self.queue_depth = queue_depth
+        self._lock = threading.Lock()
+        self.failed_deliveries = []
+        self.counts = {'events': 0, 'replayed': 0, 'failed': 0, 'ignored': 0,
+                       'bulk_batches': 0, 'fallback_batches': 0}
+
+    def _add(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def run(self, records):
+        """
+        Replay an iterable of event log records
+
+        Returns:
+            Dict of counters
+        """
+        partitions = [queue.Queue(maxsize=self.queue_depth) for _ in range(self.concurrency)]
+        threads = [
+            threading.Thread(target=self._work, args=(partition,), name=f"replay-{i}", daemon=True)
+            for i, partition in enumerate(partitions)
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending = [[] for _ in range(self.concurrency)]
+        for record in records:
+            self._add('events')
+            try:
+                data = json.loads(record['body'])
+            except ValueError as e:
+                logger.error(f"Skipping unreadable delivery {record.get('delivery_id')}: {str(e)}")
+                self._add('failed')
+                continue
+            if record.get('event_type') not in REPLAYED_EVENT_TYPES:
+                self._add('ignored')
+                continue
+
+            index = zlib.crc32(ordering_key(record, data).encode('utf-8')) % self.concurrency
+            pending[index].append((record, data))
+            if len(pending[index]) >= self.batch_size:
+                # Blocks while the partition is behind, bounding memory
+                partitions[index].put(pending[index])
+                pending[index] = []
+
+        for index, batch in enumerate(pending):
+            if batch:
+                partitions[index].put(batch)
+        for partition in partitions:
+            partition.put(None)
+        for thread in threads:
+            thread.join()
+        return dict(self.counts)
+
+    def _work(self, partition):
+        while True:
+            batch = partition.get()
+            if batch is None:
+                return
+            try:
+                self.replay_batch(batch)
+            except Exception as e:
+                logger.error(f"Error replaying batch of {len(batch)} events: {str(e)}")
+                self._add('failed', len(batch))
+
+    def replay_batch(self, batch):
+        if self.bulk:
+            if self._replay_bulk(batch):
+                self._add('bulk_batches')
+                return
+            self._add('fallback_batches')
+        for record, data in batch:
+            self.replay_event(record, data)
+
+    def replay_event(self, record, data):
+        try:
+            process_webhook_event(record['event_type'], data, None)
+            self._add('replayed')
+        except Exception as e:
+            logger.error(f"Failed to replay {record['event_type']} delivery {record.get('delivery_id')}: {str(e)}")
+            self._add('failed')
+            with self._lock:
+                self.failed_deliveries.append(record.get('delivery_id'))
+
+    def _replay_bulk(self, batch):
+        """
+        Write a batch with the bulk upserts
+
+        Each event's pull_request snapshot is upserted like the per-event
+        path does; later events win, matching an in-order replay.
+
+        Returns:
+            True if every bulk write succeeded
+        """
+        pull_requests, reviews, comments = [], [], []
+        for record, data in batch:
+            repo, pr = data.get('repository'), data.get('pull_request')
+            if not repo or not pr:
+                continue
+            event_type = record['event_type']
+            if event_type == 'pull_request' and data.get('action') not in PULL_REQUEST_ACTIONS:
+                continue
+            pull_requests.append((repo, pr))
+            if event_type == 'pull_request_review' and data.get('review'):
+                review = data['review']
+                reviews.append((pr.get('id'), review))
+                body_comment = review_body_comment(review)
+                if body_comment:
+                    comments.append((pr.get('id'), body_comment, review.get('id')))
+            elif event_type == 'pull_request_review_comment' and data.get('comment'):
+                comments.append((pr.get('id'), data['comment'], None))
+
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                return False
+            if pull_requests and db.bulk_upsert_pull_requests(pull_requests) is None:
+                return False
+            if reviews and db.bulk_upsert_reviews(reviews) is None:
+                return False
+            if comments and db.bulk_upsert_comments(comments) is None:
+                return False
+        finally:
+            db.close()
+
+        self._add('replayed', len(batch))
+        return True
+
+def _timestamp(value):
+    """Parse an ISO date/time argument into a Unix time"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay archived webhook deliveries into the database")
+    parser.add_argument('--dir', default=os.getenv('EVENT_LOG_DIR') or DEFAULT_EVENT_LOG_DIR, help="Event log directory")
+    parser.add_argument('--since', help="Only events received at or after this ISO date/time (local time)")
+    parser.add_argument('--until', help="Only events received before this ISO date/time (local time)")
+    parser.add_argument('--event-type', action='append', choices=REPLAYED_EVENT_TYPES,
+                        help="Only replay this event type (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Partitions replayed in parallel")
+    parser.add_argument('--batch-size', type=int, default=100, help="Events per partition batch")
+    parser.add_argument('--bulk', action='store_true', help="Write batches through the bulk upserts")
+    parser.add_argument('--dry-run', action='store_true', help="Only count the matching events")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    records = iter_events(args.dir, since=_timestamp(args.since), until=_timestamp(args.until),
+                          event_types=args.event_type)
+
+    started = time.monotonic()
+    if args.dry_run:
+        counts = {'events': sum(1 for _ in records)}
+    else:
+        replayer = Replayer(concurrency=args.concurrency, batch_size=args.batch_size, bulk=args.bulk)
+        counts = replayer.run(records)
+        if replayer.failed_deliveries:
+            counts['failed_deliveries'] = replayer.failed_deliveries[:100]
+    elapsed = time.monotonic() - started
+    counts['seconds'] = round(elapsed, 1)
+    counts['events_per_second'] = round(counts['events'] / elapsed, 1) if elapsed else None
+
+    print(json.dumps(counts, indent=2))
+    return 1 if counts.get('failed') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,10 @@ import logging
 import os
 import json
 
-from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_handler import DatabaseHandler, REPOSITORY_SORTS, REPOSITORY_FILTERS
 from prequel_app.pulumi_executor import PulumiExecutor
+from prequel_app.response_cache import cached_response
+from prequel_app.pagination import PaginationError, parse_page_request, paged_response
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -92,14 +94,20 @@ def create_repository():
         logger.error(f"Repository creation error: {str(e)}")
         return jsonify({"error": f"Failed to create repository: {str(e)}"}), 500
 
+@cached_response
 def get_repositories():
-    """Get a list of repositories with PR counts"""
+    """Get repositories with PR counts, optionally paginated, sorted and filtered (see parse_page_request)"""
+    try:
+        page = parse_page_request(REPOSITORY_SORTS, REPOSITORY_FILTERS)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         db = DatabaseHandler()
-        repositories = db.get_repositories_with_pr_counts()
+        repositories, next_after, total = db.list_repositories(page)
         db.close()
         
-        return jsonify(repositories), 200
+        return paged_response(repositories, page, next_after, total, 'pr_count')
     except Exception as e:
         logger.error(f"Error retrieving repositories: {str(e)}")
         return jsonify({"error": f"Failed to retrieve repositories: {str(e)}"}), 500
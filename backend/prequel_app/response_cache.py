@@ -0,0 +1,192 @@
+import os
+import time
+import logging
+import threading
+import hashlib
+import functools
+from flask import request, current_app
+
+from prequel_db.db_cache import LRUCache, data_version
+from prequel_app.streaming import wants_stream
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Cache of serialized JSON responses for the read-only dashboard endpoints
+
+    Entries are tagged with the data version they were built from and are
+    discarded once it moves on. The version is shared through the database,
+    so a write in any worker process is noticed within the data version's
+    poll interval; max_age caps how long an entry is reused regardless.
+
+    Every response carries a strong ETag derived from its key and the data
+    version it was built from, so all worker processes agree on it and it
+    stays valid for as long as the data does. A conditional GET is checked
+    against the current version before anything else, and a match is
+    answered 304 without running SQL or serializing JSON, even after the
+    cached body expired or with caching disabled.
+    """
+
+    def __init__(self, max_age=30, max_entries=256):
+        """
+        Args:
+            max_age: Seconds a response may be served from cache (0 disables caching)
+            max_entries: Maximum number of cached responses (one per path and query string)
+        """
+        self.max_age = max_age
+        self._entries = LRUCache('responses', max_size=max_entries, ttl=max_age)
+        self._lock = threading.Lock()
+        # Striped locks so concurrent misses for a key build the response only once
+        self._build_locks = [threading.Lock() for _ in range(32)]
+        self._hits = 0
+        self._misses = 0
+        self._invalidated = 0
+        self._not_modified = 0
+        self._builds = 0
+        self._build_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_age > 0
+
+    def _build_lock(self, key):
+        return self._build_locks[hash(key) % len(self._build_locks)]
+
+    def _lookup(self, key, version):
+        """Return the cached (body, headers) for key if it was built from version"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        built_from, body, headers = entry
+        if built_from != version:
+            self._entries.invalidate(key)
+            with self._lock:
+                self._invalidated += 1
+            return None
+        return body, headers
+
+    def _not_modified_response(self, etag):
+        with self._lock:
+            self._not_modified += 1
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = 'HIT'
+        return response, 304
+
+    def _respond(self, body, etag, headers, cache_status, live_headers=()):
+        """
+        Build a 200 for a cached or freshly built body
+
+        live_headers describe the run that built the body (Server-Timing)
+        and are only sent with that response, never replayed from cache.
+        """
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers.extend(headers)
+        response.headers.extend(live_headers)
+        # Let browsers keep the body but revalidate it on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = cache_status
+        return response, 200
+
+    def serve(self, key, view):
+        """
+        Answer from cache, or run the view and cache a successful response
+
+        Args:
+            key: Cache key (path and query string)
+            view: Callable returning the usual (response, status) tuple
+
+        Returns:
+            (response, status) tuple
+        """
+        # Read before building, so a write during the build makes the new ETag stale at once
+        version = data_version.current()
+        etag = _etag(key, version)
+        if request.if_none_match.contains(etag):
+            return self._not_modified_response(etag)
+
+        if not self.enabled:
+            response, status = view()
+            if status != 200 or response.cache_control.no_store:
+                return response, status
+            return self._respond(response.get_data(), etag, _extra_headers(response), 'BYPASS',
+                                 _live_headers(response))
+
+        cached = self._lookup(key, version)
+        if cached is None:
+            with self._build_lock(key):
+                # Another request may have built it while we waited
+                cached = self._lookup(key, version)
+                if cached is None:
+                    with self._lock:
+                        self._misses += 1
+                    started = time.perf_counter()
+                    response, status = view()
+                    elapsed = time.perf_counter() - started
+                    with self._lock:
+                        self._builds += 1
+                        self._build_seconds += elapsed
+
+                    # Errors and responses marked no-store (e.g. partial results) are never cached
+                    if status != 200 or response.cache_control.no_store:
+                        return response, status
+                    body = response.get_data()
+                    headers = _extra_headers(response)
+                    self._entries.set(key, (version, body, headers))
+                    return self._respond(body, etag, headers, 'MISS', _live_headers(response))
+
+        with self._lock:
+            self._hits += 1
+        body, headers = cached
+        return self._respond(body, etag, headers, 'HIT')
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'max_age': self.max_age,
+                'data_version': data_version.current(),
+                'size': self._entries.stats()['size'],
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'invalidated': self._invalidated,
+                'not_modified': self._not_modified,
+                'builds': self._builds,
+                'avg_build_seconds': round(self._build_seconds / self._builds, 4) if self._builds else 0.0
+            }
+
+def _etag(key, version):
+    """Strong ETag for the response to key built from a data version"""
+    return hashlib.sha256(f"{version}:{key}".encode()).hexdigest()[:32]
+
+def _extra_headers(response):
+    """Application headers (e.g. X-Total-Count, X-Next-Cursor) replayed with a cached body"""
+    return [(name, value) for name, value in response.headers.items() if name.startswith('X-')]
+
+def _live_headers(response):
+    """Headers about this particular build of a response, sent once and not cached"""
+    return [(name, value) for name, value in response.headers.items() if name == 'Server-Timing']
+
+response_cache = ResponseCache(
+    max_age=int(os.getenv('RESPONSE_CACHE_MAX_AGE', '30')),
+    max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+)
+
+def cached_response(view):
+    """Decorator serving a GET handler through the response cache (with ETags), keyed on path and query string"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Streamed responses are never buffered, so they bypass the cache
+        if wants_stream():
+            return view(*args, **kwargs)
+        return response_cache.serve(request.full_path, lambda: view(*args, **kwargs))
+    return wrapper
@@ -0,0 +1,339 @@
+import os
+import socket
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from prequel_db.db_handler import DatabaseHandler
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Schedules are evaluated in UTC and job state is stored as naive UTC datetimes
+EPOCH = datetime(1970, 1, 1)
+
+CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *'
+}
+
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+class IntervalSchedule:
+    """
+    'every <n><s|m|h|d>', e.g. 'every 15m'
+
+    Runs are aligned to multiples of the interval since the Unix epoch, so
+    'every 1h' fires on the hour no matter when the process started.
+    """
+
+    def __init__(self, spec, seconds):
+        self.spec = spec
+        self.seconds = seconds
+
+    def next_after(self, dt):
+        """First run time strictly after dt"""
+        elapsed = (dt - EPOCH).total_seconds()
+        return EPOCH + timedelta(seconds=(int(elapsed // self.seconds) + 1) * self.seconds)
+
+class CronSchedule:
+    """
+    Five-field cron expression: minute hour day-of-month month day-of-week
+
+    Fields accept *, numbers, ranges (a-b), lists (a,b) and steps (*/n,
+    a-b/n); day-of-week is 0-6 with 0 (or 7) for Sunday. As in cron, when
+    both day fields are restricted a day matching either one runs.
+    """
+
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, spec):
+        self.spec = spec
+        parts = CRON_ALIASES.get(spec, spec).split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression '{spec}' must have 5 fields")
+        values = [self._parse_field(part, name, low, high) for part, (name, low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(field, name, low, high):
+        values = set()
+        for item in field.split(','):
+            expr, _, step = item.partition('/')
+            step = int(step) if step else 1
+            if expr == '*':
+                start, end = low, high
+            elif '-' in expr:
+                start, end = (int(v) for v in expr.split('-', 1))
+            else:
+                start = end = int(expr)
+                if step > 1:
+                    end = high
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid {name} field '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        # isoweekday() is 1-7 for Monday-Sunday; cron uses 0 for Sunday
+        weekday_ok = dt.isoweekday() % 7 in self.weekdays
+        if self.any_day:
+            return weekday_ok
+        if self.any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt):
+        """First run time strictly after dt"""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Skips a whole month, day or hour at a time; bounded for expressions
+        # that never match (e.g. February 30th)
+        for _ in range(100000):
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression '{self.spec}' never matches")
+
+def parse_schedule(spec):
+    """
+    Parse an interval ('every 1h') or cron ('0 * * * *', '@daily') schedule
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    spec = spec.strip()
+    if spec.startswith('every '):
+        amount = spec[len('every '):].strip()
+        unit = amount[-1:]
+        if unit not in INTERVAL_UNITS or not amount[:-1].isdigit() or int(amount[:-1]) <= 0:
+            raise ValueError(f"Invalid interval '{spec}' (expected e.g. 'every 30m')")
+        return IntervalSchedule(spec, int(amount[:-1]) * INTERVAL_UNITS[unit])
+    return CronSchedule(spec)
+
+class ScheduledJob:
+    def __init__(self, name, schedule, func, lease_seconds=900, catch_up=True):
+        """
+        Args:
+            name: Unique job name (scheduled_jobs primary key)
+            schedule: Schedule expression, see parse_schedule()
+            func: Callable run without arguments; raising marks the run failed
+            lease_seconds: Lease length; renewed while the job runs, and
+                taken over by another process if the owner dies
+            catch_up: Run once when a scheduled run was missed (e.g. while
+                every process was down); otherwise missed runs are skipped
+        """
+        self.name = name
+        self.spec = schedule
+        self.schedule = parse_schedule(schedule)
+        self.func = func
+        self.lease_seconds = lease_seconds
+        self.catch_up = catch_up
+        self.registered = False
+        self.next_run_at = None
+
+class Scheduler:
+    """
+    Runs registered jobs on their schedules in one background thread
+
+    Every process runs a scheduler, but a run only happens in the process
+    that takes the job's lease in scheduled_jobs, and finishing the run
+    moves next_run_at forward, so each scheduled run happens once across
+    all workers and nodes. State survives restarts: a run that came due
+    while no process was up is caught up once at the next start.
+    """
+
+    def __init__(self, owner=None, poll_interval=30):
+        """
+        Args:
+            owner: Lease owner id (defaults to host:pid)
+            poll_interval: Maximum seconds between checks for due jobs
+        """
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.jobs = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._failures = 0
+
+    def register(self, name, schedule, func, lease_seconds=900, catch_up=True):
+        self.jobs[name] = ScheduledJob(name, schedule, func, lease_seconds, catch_up)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler started as {self.owner} with jobs: {', '.join(self.jobs)}")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Error in scheduler loop: {str(e)}")
+            self._stop.wait(self._seconds_until_next())
+
+    def _seconds_until_next(self):
+        now = datetime.utcnow()
+        upcoming = [job.next_run_at for job in self.jobs.values() if job.next_run_at]
+        if not upcoming:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.5, (min(upcoming) - now).total_seconds()))
+
+    def run_pending(self):
+        """Run every job that is due and whose lease this process obtains"""
+        for job in self.jobs.values():
+            if self._stop.is_set():
+                return
+            self._run_if_due(job)
+
+    def _run_if_due(self, job):
+        now = datetime.utcnow()
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                return
+            if not job.registered:
+                state = db.ensure_scheduled_job(job.name, job.spec, job.schedule.next_after(now))
+                if state is None:
+                    return
+                job.registered = True
+                job.next_run_at = state['next_run_at']
+
+            if not db.acquire_job_lease(job.name, self.owner, now, now + timedelta(seconds=job.lease_seconds)):
+                # Not due, or running elsewhere; learn the current next run
+                state = db.get_scheduled_job(job.name)
+                if state:
+                    job.next_run_at = state['next_run_at']
+                return
+            state = db.get_scheduled_job(job.name)
+        finally:
+            db.close()
+
+        scheduled_for = state['next_run_at'] if state else now
+        # Overdue by more than a polling cycle means the run was missed
+        missed = (now - scheduled_for).total_seconds() > 2 * self.poll_interval
+        if missed and not job.catch_up:
+            logger.info(f"Skipping missed run of {job.name} scheduled for {scheduled_for}")
+            self._finish(job, now, now, 'skipped')
+            return
+        if missed:
+            logger.info(f"Catching up on missed run of {job.name} scheduled for {scheduled_for}")
+
+        self._execute(job, now)
+
+    def _execute(self, job, started_at):
+        logger.info(f"Running scheduled job {job.name}")
+        renewing = threading.Event()
+        renewer = threading.Thread(target=self._renew_lease, args=(job, renewing),
+                                   name=f"scheduler-lease-{job.name}", daemon=True)
+        renewer.start()
+        status, error = 'ok', None
+        try:
+            job.func()
+        except Exception as e:
+            status, error = 'failed', f"{str(e)}\n{traceback.format_exc()}"[:4000]
+            logger.error(f"Scheduled job {job.name} failed: {str(e)}")
+        finally:
+            renewing.set()
+            renewer.join()
+        self._finish(job, started_at, datetime.utcnow(), status, error)
+
+    def _renew_lease(self, job, done):
+        while not done.wait(job.lease_seconds / 3):
+            db = DatabaseHandler()
+            try:
+                lease_until = datetime.utcnow() + timedelta(seconds=job.lease_seconds)
+                if not db.renew_job_lease(job.name, self.owner, lease_until):
+                    logger.warning(f"Lost the lease of {job.name} while it was running")
+            finally:
+                db.close()
+
+    def _finish(self, job, started_at, finished_at, status, error=None):
+        # Runs that came due while this one was running are not repeated
+        next_run_at = job.schedule.next_after(finished_at)
+        db = DatabaseHandler()
+        try:
+            if not db.finish_scheduled_job(job.name, self.owner, started_at, finished_at, next_run_at, status, error):
+                logger.warning(f"Could not record the run of {job.name}; its lease expired")
+        finally:
+            db.close()
+        job.next_run_at = next_run_at
+        with self._lock:
+            self._runs += 1
+            self._failures += 1 if status == 'failed' else 0
+        logger.info(f"Scheduled job {job.name} finished ({status}), next run at {next_run_at} UTC")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'owner': self.owner,
+                'poll_interval': self.poll_interval,
+                'jobs': {name: job.spec for name, job in self.jobs.items()},
+                'runs': self._runs,
+                'failures': self._failures
+            }
+
+# Process-wide scheduler, created by start_scheduler()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_scheduler(jobs):
+    """
+    Create and start the process-wide scheduler
+
+    Args:
+        jobs: List of (name, schedule, func) or (name, schedule, func, options dict)
+
+    Returns:
+        The Scheduler, or None when SCHEDULER_ENABLED is false
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+        if os.getenv('SCHEDULER_ENABLED', 'true').lower() != 'true':
+            logger.info("Scheduler disabled")
+            return None
+
+        scheduler = Scheduler(poll_interval=float(os.getenv('SCHEDULER_POLL_SECONDS', '30')))
+        for name, schedule, func, *options in jobs:
+            scheduler.register(name, schedule, func, **(options[0] if options else {}))
+        scheduler.start()
+        _scheduler = scheduler
+        return _scheduler
+
+def get_scheduler_stats():
+    """Scheduler counters for this process plus the persisted state of every job"""
+    stats = _scheduler.stats() if _scheduler is not None else {}
+    stats['enabled'] = _scheduler is not None
+    db = DatabaseHandler()
+    try:
+        jobs = db.list_scheduled_jobs()
+    finally:
+        db.close()
+    for job in jobs:
+        for key, value in job.items():
+            if isinstance(value, datetime):
+                job[key] = value.isoformat()
+    stats['job_state'] = jobs
+    return stats
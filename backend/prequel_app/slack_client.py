@@ -0,0 +1,269 @@
+import os
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket pacing the messages sent to one Slack webhook
+
+    reserve() takes a token even when none is available and returns how
+    long the caller has to wait for it, so concurrent workers are spaced
+    out instead of all waking at the same moment. pause() holds the bucket
+    after Slack answers 429.
+    """
+
+    def __init__(self, rate, burst):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens held (messages that can go out back to back)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token; returns the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every reservation for at least seconds (Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class SlackClient:
+    """
+    Delivers Slack incoming-webhook messages from a background worker pool
+
+    send() only queues the message, so webhook handlers and the stale
+    watcher never wait on Slack. Workers post over keep-alive sessions
+    with connect/read timeouts, pace each webhook URL with a TokenBucket
+    (Slack accepts about one message per second per webhook), wait out
+    429s for their Retry-After, and retry connection errors and 5xx
+    responses with exponential backoff. With workers=0 send() delivers
+    inline on the caller's thread, retries included.
+    """
+
+    def __init__(self, workers=2, queue_size=1000, connect_timeout=3.0, read_timeout=10.0,
+                 max_retries=5, backoff_base=1.0, backoff_max=60.0, rate=1.0, burst=1):
+        """
+        Args:
+            workers: Delivery threads (0 delivers inline)
+            queue_size: Messages waiting for delivery before send() drops new ones
+            connect_timeout: Seconds to establish the connection
+            read_timeout: Seconds to wait for Slack's response
+            max_retries: Attempts per message
+            backoff_base: First retry delay in seconds (doubles per attempt)
+            backoff_max: Longest single retry delay
+            rate: Messages per second per webhook URL
+            burst: Messages per webhook URL that can be sent back to back
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate = rate
+        self.burst = burst
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._buckets = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Counters for this process
+        self._queued = 0
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._retries = 0
+        self._rate_limited = 0
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = 'prequel-slack'
+            self._local.session = session
+        return session
+
+    def _bucket(self, webhook_url):
+        with self._lock:
+            bucket = self._buckets.get(webhook_url)
+            if bucket is None:
+                bucket = self._buckets[webhook_url] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"slack-delivery-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        atexit.register(self.flush, 5)
+
+    def send(self, webhook_url, message):
+        """
+        Queue a message for delivery
+
+        Returns:
+            True if the message was queued (or, inline, delivered); False if
+            the queue is full or, inline, delivery failed
+        """
+        if self.workers <= 0:
+            return self.deliver(webhook_url, message)
+
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((webhook_url, message))
+        except queue.Full:
+            self._count('_dropped')
+            logger.warning(f"Slack delivery queue full ({self.queue_size}), dropping message")
+            return False
+        self._count('_queued')
+        return True
+
+    def _work(self):
+        while True:
+            webhook_url, message = self._queue.get()
+            try:
+                self.deliver(webhook_url, message)
+            except Exception as e:
+                logger.error(f"Error in Slack delivery worker: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def deliver(self, webhook_url, message):
+        """
+        Post one message on the calling thread, pacing and retrying as needed
+
+        Returns:
+            True if Slack accepted the message
+        """
+        bucket = self._bucket(webhook_url)
+        for attempt in range(self.max_retries):
+            wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                response = self._session().post(webhook_url, json=message, timeout=self.timeout)
+            except requests.RequestException as e:
+                delay = self._backoff(attempt)
+                logger.warning(f"Slack request failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code == 200:
+                    self._count('_sent')
+                    return True
+                if response.status_code == 429:
+                    self._count('_rate_limited')
+                    try:
+                        delay = float(response.headers.get('Retry-After'))
+                    except (TypeError, ValueError):
+                        delay = self._backoff(attempt)
+                    # Holds the other workers posting to this webhook too
+                    bucket.pause(delay)
+                    delay = 0
+                    logger.warning(f"Slack rate limited the webhook, retrying after {response.headers.get('Retry-After')}s")
+                elif response.status_code >= 500:
+                    delay = self._backoff(attempt)
+                    logger.warning(f"Slack returned {response.status_code}, retrying in {delay:.1f}s")
+                else:
+                    # Invalid payload, revoked webhook, ...: retrying will not help
+                    self._count('_failed')
+                    logger.error(f"Slack rejected the message: {response.status_code} - {response.text[:200]}")
+                    return False
+
+            if attempt < self.max_retries - 1:
+                self._count('_retries')
+                if delay:
+                    time.sleep(delay)
+
+        self._count('_failed')
+        logger.error(f"Giving up on Slack message after {self.max_retries} attempts")
+        return False
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued message has been delivered or given up on
+
+        Returns:
+            True if the queue drained within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self._queue.qsize(),
+                'queued': self._queued,
+                'sent': self._sent,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'retries': self._retries,
+                'rate_limited': self._rate_limited,
+                'webhooks': len(self._buckets)
+            }
+
+# Process-wide client, created by get_slack_client()
+_client = None
+_client_lock = threading.Lock()
+
+def get_slack_client():
+    """
+    Get the process-wide SlackClient, creating it from environment settings on first use
+
+    Created lazily so SLACK_* values loaded from .env after import still apply.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SlackClient(
+                    workers=int(os.getenv('SLACK_WORKERS', '2')),
+                    queue_size=int(os.getenv('SLACK_QUEUE_SIZE', '1000')),
+                    connect_timeout=float(os.getenv('SLACK_CONNECT_TIMEOUT', '3')),
+                    read_timeout=float(os.getenv('SLACK_READ_TIMEOUT', '10')),
+                    max_retries=int(os.getenv('SLACK_MAX_RETRIES', '5')),
+                    rate=float(os.getenv('SLACK_RATE_PER_SECOND', '1')),
+                    burst=int(os.getenv('SLACK_BURST', '1'))
+                )
+    return _client
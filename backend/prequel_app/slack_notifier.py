@@ -1,4 +1,3 @@
-import requests
 import logging
 from datetime import datetime
 import os
@@ -7,6 +6,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
 from prequel_db.db_handler import DatabaseHandler
+from prequel_app.slack_client import get_slack_client
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,6 +15,9 @@ logger = logging.getLogger(__name__)
 def send_slack_notification(webhook_url, title, text, fields=None, actions=None):
     """
     Send a notification to the Slack webhook
+
+    Delivery happens on the SlackClient workers; the return value says
+    whether the message was accepted for delivery, not whether Slack got it.
     """
     try:
         if not webhook_url:
@@ -72,14 +75,61 @@ def send_slack_notification(webhook_url, title, text, fields=None, actions=None)
             "blocks": blocks
         }
         
-        logger.debug("Sending notification to Slack")
-        response = requests.post(webhook_url, json=message)
-        logger.debug(f"Slack API Response: {response.status_code} - {response.text}")
-        return response.status_code == 200
+        logger.debug("Queueing notification for Slack")
+        return get_slack_client().send(webhook_url, message)
     except Exception as e:
         logger.error(f"Error sending Slack notification: {str(e)}")
         return False
 
+def stale_prs_message(stale_days, stale_prs, total=None):
+    """
+    Build the stale PR message for rows returned by get_stale_prs()
+
+    Args:
+        stale_days: Threshold used, for the message text
+        stale_prs: Rows to list; only the first 10 are shown
+        total: Count to report when more than 10 (defaults to len(stale_prs))
+
+    Returns:
+        (title, text, fields, actions) for send_slack_notification()
+    """
+    # Notify about stale PRs
+    title = "🚨 Stale Pull Requests Detected"
+    text = f"The following pull requests have been inactive for {stale_days} days:"
+    
+    fields = []
+    actions = []
+    
+    # Only include up to 10 PRs to avoid Slack message size limits
+    for i, pr in enumerate(stale_prs[:10]):
+        pr_id, pr_title, pr_number, pr_url, repo_name, username, created_at, last_activity = pr
+        
+        days_inactive = (datetime.now() - last_activity).days if isinstance(last_activity, datetime) else '?'
+        fields.append(f"*{repo_name} #{pr_number}*: {pr_title}")
+        fields.append(f"Created by: {username} | Inactive for {days_inactive} days")
+        
+        actions.append({
+            "text": f"View #{pr_number}",
+            "url": pr_url
+        })
+    
+    # If there are more than 10 stale PRs, add a note
+    total = len(stale_prs) if total is None else total
+    if total > 10:
+        text += f"\n\n*Note: Showing 10 of {total} stale PRs*"
+    
+    return title, text, fields, actions
+
+def notify_stale_prs(stale_days, stale_prs, total=None):
+    """Send the stale PR message for rows returned by get_stale_prs()"""
+    # Check if slack webhook URL is available
+    webhook_url = os.getenv('SLACK_WEBHOOK_URL')
+    if not webhook_url:
+        logger.error("SLACK_WEBHOOK_URL not configured")
+        return False
+    
+    return send_slack_notification(webhook_url, *stale_prs_message(stale_days, stale_prs, total))
+
 def check_stale_prs(stale_days):
     """
     Check for stale PRs and send notifications
@@ -98,40 +148,8 @@ def check_stale_prs(stale_days):
             stale_prs = db.get_stale_prs()
             
             if stale_prs:
-                # Check if slack webhook URL is available
-                import os
-                webhook_url = os.getenv('SLACK_WEBHOOK_URL')
-                if not webhook_url:
-                    logger.error("SLACK_WEBHOOK_URL not configured")
-                    db.close()
-                    return
-                
-                # Notify about stale PRs
-                title = "🚨 Stale Pull Requests Detected"
-                text = f"The following pull requests have been inactive for {stale_days} days:"
-                
-                fields = []
-                actions = []
-                
-                # Only include up to 10 PRs to avoid Slack message size limits
-                for i, pr in enumerate(stale_prs[:10]):
-                    pr_id, pr_title, pr_number, pr_url, repo_name, username, created_at, last_activity = pr
-                    
-                    days_inactive = (datetime.now() - last_activity).days if isinstance(last_activity, datetime) else '?'
-                    fields.append(f"*{repo_name} #{pr_number}*: {pr_title}")
-                    fields.append(f"Created by: {username} | Inactive for {days_inactive} days")
-                    
-                    actions.append({
-                        "text": f"View #{pr_number}",
-                        "url": pr_url
-                    })
-                
-                # If there are more than 10 stale PRs, add a note
-                if len(stale_prs) > 10:
-                    text += f"\n\n*Note: Showing 10 of {len(stale_prs)} stale PRs*"
-                
-                send_slack_notification(webhook_url, title, text, fields, actions)
+                notify_stale_prs(stale_days, stale_prs)
         
         db.close()
     except Exception as e:
-        logger.error(f"Error checking for stale PRs: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error checking for stale PRs: {str(e)}")
@@ -0,0 +1,220 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_analytics import STALE_MARK_BATCH_SIZE
+from prequel_db.db_deadlines import stale_deadlines
+from prequel_app.slack_notifier import stale_prs_message
+from prequel_app.notification_digest import get_notification_coalescer, DigestEvent
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class StaleWatcher:
+    """
+    Marks PRs stale when their deadline passes instead of scanning for them
+
+    The deadline index is loaded once from the open, non-stale PRs and then
+    kept current by the writes in DatabaseModels, so the watcher sleeps
+    until the earliest deadline and only touches the PRs that are due:
+    mark_prs_stale() re-checks them in the database, marks the ones that
+    are still inactive and the others are re-read and put back with their
+    current deadline. Activity written by other processes is picked up by
+    a periodic refresh of the recently active PRs; the scheduled full sweep
+    remains as a backstop for anything the index misses.
+    """
+
+    def __init__(self, days_threshold, index=stale_deadlines, refresh_interval=300, max_sleep=60):
+        """
+        Args:
+            days_threshold: Days without activity before a PR is stale
+            index: StaleDeadlineIndex fed by the database writes
+            refresh_interval: Seconds between refreshes of recently active
+                PRs (covers writes made by other processes)
+            max_sleep: Upper bound on a single wait, in seconds
+        """
+        self.days_threshold = days_threshold
+        self.index = index
+        self.refresh_interval = refresh_interval
+        self.max_sleep = max_sleep
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_refresh = None
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._marked = 0
+        self._requeued = 0
+
+    def start(self):
+        self.index.configure(self.days_threshold)
+        self._thread = threading.Thread(target=self._run, name='stale-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Stale watcher started ({self.days_threshold} day threshold)")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.index.loaded:
+                    self._load()
+                elif datetime.now() - self._last_refresh >= timedelta(seconds=self.refresh_interval):
+                    self._refresh()
+                self.process_due()
+            except Exception as e:
+                logger.error(f"Error in stale watcher: {str(e)}")
+            self.index.wait(self._seconds_until_next())
+
+    def _seconds_until_next(self):
+        now = datetime.now()
+        timeout = self.max_sleep
+        if self._last_refresh is not None:
+            refresh_at = self._last_refresh + timedelta(seconds=self.refresh_interval)
+            timeout = min(timeout, (refresh_at - now).total_seconds())
+        next_deadline = self.index.next_deadline()
+        if next_deadline is not None:
+            timeout = min(timeout, (next_deadline - now).total_seconds())
+        return max(1.0, timeout)
+
+    def _load(self):
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                return
+            started = datetime.now()
+            self.index.begin_load()
+            count = self.index.load(list(db.iter_stale_candidates()))
+            self._last_refresh = started
+            logger.info(f"Stale deadline index loaded with {count} open PRs")
+        finally:
+            db.close()
+
+    def _refresh(self):
+        # Overlap the previous window so writes committed during it are not missed
+        started = datetime.now()
+        since = self._last_refresh - timedelta(seconds=self.refresh_interval)
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                return
+            self.index.merge(list(db.iter_stale_candidates(active_since=since)))
+            self._last_refresh = started
+        finally:
+            db.close()
+
+    def process_due(self):
+        """
+        Mark the PRs whose deadline has passed and notify about them
+
+        Returns:
+            List of ids of the PRs marked stale
+        """
+        now = datetime.now()
+        due = self.index.pop_due(now)
+        if not due:
+            return []
+
+        db = DatabaseHandler()
+        try:
+            if hasattr(db, 'connection_failed') and db.connection_failed:
+                # Put them back due again in max_sleep seconds
+                retry_activity = now - timedelta(days=self.days_threshold) + timedelta(seconds=self.max_sleep)
+                self.index.merge((pr_id, retry_activity) for pr_id in due)
+                return []
+
+            marked = db.mark_prs_stale(due, self.days_threshold)
+            marked_ids = set(marked)
+            self._requeue(db, [pr_id for pr_id in due if pr_id not in marked_ids], now)
+            with self._lock:
+                self._checked += len(due)
+                self._marked += len(marked)
+
+            if marked:
+                logger.info(f"Stale watcher marked {len(marked)} PRs stale")
+                stale_prs = [pr for pr in db.get_stale_prs() if pr[0] in marked_ids]
+                self._notify(stale_prs, now)
+            return marked
+        finally:
+            db.close()
+
+    def _notify(self, stale_prs, now):
+        """Queue one notification per newly stale PR; PRs going stale close together share a digest"""
+        webhook_url = os.getenv('SLACK_WEBHOOK_URL')
+        if not webhook_url:
+            logger.error("SLACK_WEBHOOK_URL not configured")
+            return
+        for pr in stale_prs:
+            pr_id, pr_title, pr_number, pr_url, repo_name, username, created_at, last_activity = pr
+            days_inactive = (now - last_activity).days if isinstance(last_activity, datetime) else '?'
+            get_notification_coalescer().add(
+                webhook_url, ('stale',), "🚨 {count} Pull Requests Became Stale",
+                DigestEvent(
+                    stale_prs_message(self.days_threshold, [pr]),
+                    f"*{repo_name} #{pr_number}*: {pr_title}\nCreated by: {username} | Inactive for {days_inactive} days",
+                    pr_url, f"View #{pr_number}"
+                )
+            )
+
+    def _requeue(self, db, pr_ids, now):
+        """Put back the due PRs that were not marked, with the deadline their current activity gives"""
+        stale_date = now - timedelta(days=self.days_threshold)
+        for i in range(0, len(pr_ids), STALE_MARK_BATCH_SIZE):
+            rows = list(db.iter_stale_candidates(pr_ids=pr_ids[i:i + STALE_MARK_BATCH_SIZE]))
+            # Rows still past their deadline could not be marked; leave them to the sweep
+            rows = [(pr_id, last_activity_at) for pr_id, last_activity_at in rows if last_activity_at >= stale_date]
+            self.index.merge(rows)
+            with self._lock:
+                self._requeued += len(rows)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'days_threshold': self.days_threshold,
+                'refresh_interval': self.refresh_interval,
+                'checked': self._checked,
+                'marked': self._marked,
+                'requeued': self._requeued,
+                'last_refresh': self._last_refresh.isoformat() if self._last_refresh else None
+            }
+        next_deadline = self.index.next_deadline()
+        stats['next_deadline'] = next_deadline.isoformat() if next_deadline else None
+        stats['index'] = self.index.stats()
+        return stats
+
+# Process-wide watcher, created by start_stale_watcher()
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def start_stale_watcher(days_threshold):
+    """
+    Create and start the process-wide stale watcher
+
+    Returns:
+        The StaleWatcher, or None when STALE_WATCHER_ENABLED is false
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            return _watcher
+        if os.getenv('STALE_WATCHER_ENABLED', 'true').lower() != 'true':
+            logger.info("Stale watcher disabled")
+            return None
+
+        watcher = StaleWatcher(
+            days_threshold,
+            refresh_interval=float(os.getenv('STALE_WATCHER_REFRESH_SECONDS', '300'))
+        )
+        watcher.start()
+        _watcher = watcher
+        return _watcher
+
+def get_stale_watcher_stats():
+    """Stale watcher counters and deadline index size for this process"""
+    stats = _watcher.stats() if _watcher is not None else {}
+    stats['enabled'] = _watcher is not None
+    return stats
@@ -3,23 +3,45 @@ import logging
 from datetime import datetime
 
 from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_handler import CONTRIBUTOR_SORTS, CONTRIBUTOR_FILTERS
+from prequel_db.db_analytics import STALE_PR_SORTS, STALE_PR_FILTERS
+from prequel_app.response_cache import cached_response
+from prequel_app.pagination import PaginationError, parse_page_request, paged_response
+from prequel_app.streaming import STREAM_BATCH_SIZE, wants_stream, ndjson_response
+from prequel_app.dashboard_sections import section_fetcher, server_timing, body_meta
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+EMPTY_PR_METRICS = {
+    'pr_authors': [],
+    'active_reviewers': [],
+    'comment_users': [],
+    'stale_pr_count': 0
+}
+
+# Independent queries behind /api/stats: name -> (fetch, value if the section fails)
+DASHBOARD_SECTIONS = {
+    'pr_metrics': (lambda db: db.get_pr_metrics(), EMPTY_PR_METRICS),
+    'repositories': (lambda db: db.get_repositories_with_pr_counts(), []),
+    'contributors': (lambda db: db.get_contributors_with_counts(), []),
+    'stale_prs': (lambda db: db.get_stale_prs(), []),
+    'recent_prs': (lambda db: db.get_recent_prs(limit=10), [])
+}
+
+@cached_response
 def get_dashboard_stats():
-    """Get comprehensive dashboard statistics"""
+    """
+    Get comprehensive dashboard statistics
+
+    The sections are fetched by section_fetcher (concurrently unless
+    DASHBOARD_PARALLEL=false). Sections that fail or time out are returned
+    empty and listed in 'meta'; such partial responses are not cached.
+    Section timings go in the Server-Timing header so cached bodies do not
+    replay them.
+    """
     try:
-        db = DatabaseHandler()
-        
-        # Collect statistics
-        stats = {
-            'pr_metrics': db.get_pr_metrics(),
-            'repositories': db.get_repositories_with_pr_counts(),
-            'contributors': db.get_contributors_with_counts(),
-            'stale_prs': db.get_stale_prs(),
-            'recent_prs': db.get_recent_prs(limit=10)
-        }
+        stats, meta = section_fetcher.fetch(DASHBOARD_SECTIONS)
         
         # Process stale PRs into a user-friendly format
         formatted_stale_prs = []
@@ -38,13 +60,19 @@ def get_dashboard_stats():
             })
         
         stats['stale_prs'] = formatted_stale_prs
+        stats['meta'] = body_meta(meta)
         
-        db.close()
-        return jsonify(stats), 200
+        response = jsonify(stats)
+        response.headers['Server-Timing'] = server_timing(meta)
+        if meta['partial']:
+            response.headers['X-Partial-Response'] = 'true'
+            response.cache_control.no_store = True
+        return response, 200
     except Exception as e:
         logger.error(f"Error retrieving dashboard stats: {str(e)}")
         return jsonify({"error": f"Failed to retrieve statistics: {str(e)}"}), 500
 
+@cached_response
 def get_pr_metrics():
     """Get PR metrics"""
     try:
@@ -56,48 +84,70 @@ def get_pr_metrics():
         logger.error(f"Error retrieving PR metrics: {str(e)}")
         return jsonify({"error": f"Failed to retrieve PR metrics: {str(e)}"}), 500
 
+def _format_stale_pr(pr):
+    """Convert a stale PR row to the PullRequest shape the frontend expects"""
+    pr_id, title, number, html_url, repo_name, username, created_at, last_activity_at = pr
+    return {
+        'id': pr_id,
+        'github_id': 0,  # Not available from the query
+        'repository_id': 0,  # Not available from the query
+        'author_id': 0,  # Not available from the query
+        'title': title,
+        'number': number,
+        'state': 'open',
+        'html_url': html_url,
+        'created_at': created_at.isoformat() if created_at else None,
+        'updated_at': last_activity_at.isoformat() if last_activity_at else None,
+        'closed_at': None,
+        'merged_at': None,
+        'is_stale': True,
+        'last_activity_at': last_activity_at.isoformat() if last_activity_at else None,
+        'repository_name': repo_name,
+        'author_name': username
+    }
+
+@cached_response
 def get_stale_prs():
-    """Get stale PRs"""
+    """Get stale PRs, optionally paginated, sorted and filtered (see parse_page_request) or streamed as NDJSON"""
+    try:
+        page = parse_page_request(STALE_PR_SORTS, STALE_PR_FILTERS)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_stream():
+        db = DatabaseHandler()
+        return ndjson_response(db, (_format_stale_pr(pr) for pr in db.iter_stale_prs(page, STREAM_BATCH_SIZE)))
+
     try:
         db = DatabaseHandler()
-        stale_prs = db.get_stale_prs()
+        stale_prs, next_after, total = db.list_stale_prs(page)
         db.close()
         
         # Convert to JSON-friendly format
-        result = []
-        for pr in stale_prs:
-            pr_id, title, number, html_url, repo_name, username, created_at, last_activity_at = pr
-            result.append({
-                'id': pr_id,
-                'github_id': 0,  # Not available from the query
-                'repository_id': 0,  # Not available from the query
-                'author_id': 0,  # Not available from the query
-                'title': title,
-                'number': number,
-                'state': 'open',
-                'html_url': html_url,
-                'created_at': created_at.isoformat() if created_at else None,
-                'updated_at': last_activity_at.isoformat() if last_activity_at else None,
-                'closed_at': None,
-                'merged_at': None,
-                'is_stale': True,
-                'last_activity_at': last_activity_at.isoformat() if last_activity_at else None,
-                'repository_name': repo_name,
-                'author_name': username
-            })
+        result = [_format_stale_pr(pr) for pr in stale_prs]
         
-        return jsonify(result), 200
+        return paged_response(result, page, next_after, total, 'last_activity')
     except Exception as e:
         logger.error(f"Error retrieving stale PRs: {str(e)}")
         return jsonify({"error": f"Failed to retrieve stale PRs: {str(e)}"}), 500
 
+@cached_response
 def get_contributors():
-    """Get contributors with counts"""
+    """Get contributors with counts, optionally paginated, sorted and filtered (see parse_page_request) or streamed as NDJSON"""
+    try:
+        page = parse_page_request(CONTRIBUTOR_SORTS, CONTRIBUTOR_FILTERS)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_stream():
+        db = DatabaseHandler()
+        return ndjson_response(db, db.iter_contributors(page, STREAM_BATCH_SIZE))
+
     try:
         db = DatabaseHandler()
-        contributors = db.get_contributors_with_counts()
+        contributors, next_after, total = db.list_contributors(page)
         db.close()
-        return jsonify(contributors), 200
+        return paged_response(contributors, page, next_after, total, 'pr_count')
     except Exception as e:
         logger.error(f"Error retrieving contributors: {str(e)}")
         return jsonify({"error": f"Failed to retrieve contributors: {str(e)}"}), 500
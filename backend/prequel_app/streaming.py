@@ -0,0 +1,48 @@
+import os
+import json
+import logging
+from flask import request, Response
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Rows fetched from the database per round trip while streaming
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '500'))
+
+def wants_stream():
+    """True for ?stream=1 or when the client prefers NDJSON over JSON"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def ndjson_response(db, items):
+    """
+    Stream items as newline-delimited JSON in a chunked response
+
+    Args:
+        db: DatabaseHandler that items reads from; closed when the stream ends
+            (including when the client disconnects)
+        items: Iterable of JSON-serializable objects, normally a generator
+            over the database cursor
+
+    Returns:
+        (response, status) tuple
+    """
+    def generate():
+        count = 0
+        try:
+            for item in items:
+                count += 1
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            # Headers are already sent; re-raising aborts the connection without
+            # the final chunk, so the client sees the body as truncated
+            logger.error(f"Error streaming response after {count} rows: {str(e)}")
+            raise
+        finally:
+            db.close()
+
+    return Response(generate(), mimetype=NDJSON_MIMETYPE), 200
@@ -0,0 +1,100 @@
+from flask import jsonify
+import logging
+
+from prequel_db.db_pool import get_pool_stats
+from prequel_db.db_cache import get_identity_cache_stats
+from prequel_app.webhook_queue import get_webhook_queue_stats
+from prequel_app.delivery_dedup import delivery_deduplicator
+from prequel_app.event_log import get_event_log_stats
+from prequel_app.response_cache import response_cache
+from prequel_app.dashboard_sections import section_fetcher
+from prequel_app.scheduler import get_scheduler_stats
+from prequel_app.stale_watcher import get_stale_watcher_stats
+from prequel_app.slack_client import get_slack_client
+from prequel_app.notification_digest import get_notification_coalescer
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def get_db_pool_stats():
+    """Get database connection pool statistics"""
+    try:
+        return jsonify(get_pool_stats()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving pool stats: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve pool stats: {str(e)}"}), 500
+
+def get_cache_stats():
+    """Get in-process cache statistics"""
+    try:
+        return jsonify({
+            'identity': get_identity_cache_stats(),
+            'responses': response_cache.stats(),
+            'dashboard_sections': section_fetcher.stats()
+        }), 200
+    except Exception as e:
+        logger.error(f"Error retrieving cache stats: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve cache stats: {str(e)}"}), 500
+
+def get_queue_stats():
+    """Get webhook queue depth, lag and worker counters, plus event log counters"""
+    try:
+        stats = get_webhook_queue_stats()
+        stats['deduplication'] = delivery_deduplicator.stats()
+        stats['event_log'] = get_event_log_stats()
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Error retrieving webhook queue stats: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve webhook queue stats: {str(e)}"}), 500
+
+def get_scheduler_state():
+    """Get scheduled job state, leases and this process's scheduler counters"""
+    try:
+        return jsonify(get_scheduler_stats()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving scheduler state: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve scheduler state: {str(e)}"}), 500
+
+def get_stale_watcher_state():
+    """Get the stale watcher's counters and deadline index size"""
+    try:
+        return jsonify(get_stale_watcher_stats()), 200
+    except Exception as e:
+        logger.error(f"Error retrieving stale watcher state: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve stale watcher state: {str(e)}"}), 500
+
+def get_slack_delivery_stats():
+    """Get Slack delivery queue depth and counters, and notification coalescing counters"""
+    try:
+        stats = get_slack_client().stats()
+        stats['coalescing'] = get_notification_coalescer().stats()
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Error retrieving Slack delivery stats: {str(e)}")
+        return jsonify({"error": f"Failed to retrieve Slack delivery stats: {str(e)}"}), 500
+
+def setup_system_routes(app):
+    """Set up operational/system routes for the Flask app"""
+    @app.route('/api/system/db-pool', methods=['GET'])
+    def system_db_pool_route():
+        return get_db_pool_stats()
+    
+    @app.route('/api/system/caches', methods=['GET'])
+    def system_caches_route():
+        return get_cache_stats()
+    
+    @app.route('/api/system/webhook-queue', methods=['GET'])
+    def system_webhook_queue_route():
+        return get_queue_stats()
+    
+    @app.route('/api/system/scheduler', methods=['GET'])
+    def system_scheduler_route():
+        return get_scheduler_state()
+    
+    @app.route('/api/system/stale-watcher', methods=['GET'])
+    def system_stale_watcher_route():
+        return get_stale_watcher_state()
+    
+    @app.route('/api/system/slack', methods=['GET'])
+    def system_slack_route():
+        return get_slack_delivery_stats()
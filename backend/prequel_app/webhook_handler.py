@@ -1,4 +1,5 @@
 from flask import request, jsonify
+import json
 import logging
 from datetime import datetime
 
@@ -8,80 +9,185 @@ from prequel_app.github_handler import (
     process_review,
     process_review_comment
 )
-from prequel_app.slack_notifier import send_slack_notification
+from prequel_app.notification_digest import get_notification_coalescer, DigestEvent
+from prequel_app.webhook_queue import start_webhook_queue, get_webhook_queue
+from prequel_app.delivery_dedup import delivery_deduplicator
+from prequel_db.db_models import DuplicateDeliveryError
+from prequel_app.event_log import start_event_log
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def handle_webhook(github_secret, slack_webhook_url):
+# pull_request actions that are stored
+PULL_REQUEST_ACTIONS = ['opened', 'reopened', 'synchronize', 'edited']
+
+class WebhookProcessingError(Exception):
+    """Raised when a webhook event could not be stored, so the queue retries it"""
+
+def process_webhook_event(event_type, data, slack_webhook_url, delivery_id=None):
+    """
+    Store a GitHub webhook event and send any notifications
+
+    Args:
+        event_type: Value of the X-GitHub-Event header
+        data: Parsed JSON payload
+        slack_webhook_url: Slack webhook for notifications (optional)
+        delivery_id: X-GitHub-Delivery, recorded in the same transaction as
+            the event's writes (optional)
+
+    Returns:
+        Short status message
+
+    Raises:
+        WebhookProcessingError: If the event's database writes failed
+        DuplicateDeliveryError: If delivery_id was already recorded (nothing
+            was written or sent)
+    """
+    logger.info(f"Event type: {event_type}")
+    delivery = (delivery_id, event_type) if delivery_id else None
+
+    # Handle different event types
+    if event_type == 'pull_request':
+        action = data.get('action')
+        logger.info(f"Pull request action: {action}")
+
+        if action in PULL_REQUEST_ACTIONS:
+            pr_id = process_pull_request(data, delivery)
+            if pr_id is None:
+                raise WebhookProcessingError("Failed to store pull request")
+
+            # Send notification for new PRs
+            if action == 'opened' and slack_webhook_url:
+                pr = data['pull_request']
+                repo = data['repository']
+
+                title = "🔔 New Pull Request Created"
+                text = f"*{pr['title']}*\n{pr.get('body', 'No description provided.')}"
+
+                fields = [
+                    f"*Repository:* {repo['full_name']}",
+                    f"*Created by:* {pr['user']['login']}"
+                ]
+
+                actions = [{
+                    "text": "View Pull Request",
+                    "url": pr['html_url']
+                }]
+
+                # Bursts (e.g. a bot opening many PRs) go out as one digest per repository
+                get_notification_coalescer().add(
+                    slack_webhook_url, ('opened', repo['full_name']),
+                    f"🔔 {{count}} New Pull Requests in {repo['full_name']}",
+                    DigestEvent(
+                        (title, text, fields, actions),
+                        f"*#{pr.get('number')} {pr['title']}*\nCreated by: {pr['user']['login']}",
+                        pr['html_url'], f"View #{pr.get('number')}"
+                    )
+                )
+
+            return "PR processed"
+
+    elif event_type == 'pull_request_review':
+        if process_review(data, delivery) is None:
+            raise WebhookProcessingError("Failed to store review")
+        return "Review processed"
+
+    elif event_type == 'pull_request_review_comment':
+        if process_review_comment(data, delivery) is None:
+            raise WebhookProcessingError("Failed to store review comment")
+        return "Comment processed"
+
+    return "Event received"
+
+def process_delivery(event_type, delivery_id, data, slack_webhook_url):
+    """
+    Process a delivery exactly once across redeliveries and processes
+
+    The delivery id is recorded in the same transaction as the event's
+    writes, so a write that fails or is interrupted leaves no record and
+    the retry is processed normally; a delivery that was already recorded
+    aborts before anything is written or sent.
+    """
+    delivery_deduplicator.maybe_purge()
+    try:
+        return process_webhook_event(event_type, data, slack_webhook_url, delivery_id)
+    except DuplicateDeliveryError:
+        delivery_deduplicator.suppressed(delivery_id)
+        return "Duplicate delivery suppressed"
+    except Exception:
+        # Let a redelivery to this process through
+        delivery_deduplicator.release(delivery_id)
+        raise
+
+def handle_webhook(github_secret, slack_webhook_url, webhook_queue, event_log=None):
     """
     Handle GitHub webhook events
+
+    Only the signature is checked on the request thread; the delivery is
+    then archived to the event log (for replays), persisted to the webhook
+    queue and acknowledged with 202. Without a queue
+    (WEBHOOK_QUEUE_WORKERS=0) the event is processed inline.
     """
     logger.info("Received webhook request")
     logger.debug(f"Request Headers: {dict(request.headers)}")
-    
+
     # Verify webhook signature
     if not verify_github_webhook(request, github_secret):
         logger.error("Webhook verification failed")
         return jsonify({"error": "Invalid signature"}), 400
-    
+
+    event_type = request.headers.get('X-GitHub-Event')
+    delivery_id = request.headers.get('X-GitHub-Delivery')
+
+    # Handle ping event (GitHub sends this when webhook is first configured)
+    if event_type == 'ping':
+        return jsonify({"status": "success", "message": "Pong!"}), 200
+
+    # Archive every verified delivery, duplicates included; replays are idempotent
+    if event_log is not None:
+        try:
+            event_log.append(delivery_id, event_type, request.get_data())
+        except Exception as e:
+            logger.error(f"Error archiving webhook delivery {delivery_id}: {str(e)}")
+
+    # Redeliveries of something this process already accepted stop here
+    if not delivery_deduplicator.accept(delivery_id):
+        return jsonify({"status": "duplicate", "message": "Delivery already received"}), 200
+
+    if webhook_queue is not None:
+        try:
+            queue_id = webhook_queue.enqueue(delivery_id, event_type, dict(request.headers), request.get_data())
+            logger.info(f"Queued {event_type} delivery {delivery_id} as #{queue_id}")
+            return jsonify({"status": "accepted", "message": "Event queued"}), 202
+        except Exception as e:
+            logger.error(f"Error queueing webhook: {str(e)}")
+            delivery_deduplicator.release(delivery_id)
+            return jsonify({"error": f"Error queueing webhook: {str(e)}"}), 500
+
     try:
-        data = request.get_json()
-        event_type = request.headers.get('X-GitHub-Event')
-        logger.info(f"Event type: {event_type}")
-        
-        # Handle different event types
-        if event_type == 'pull_request':
-            action = data.get('action')
-            logger.info(f"Pull request action: {action}")
-            
-            if action in ['opened', 'reopened', 'synchronize', 'edited']:
-                pr_id = process_pull_request(data)
-                
-                # Send notification for new PRs
-                if action == 'opened' and slack_webhook_url:
-                    pr = data['pull_request']
-                    repo = data['repository']
-                    
-                    title = "🔔 New Pull Request Created"
-                    text = f"*{pr['title']}*\n{pr.get('body', 'No description provided.')}"
-                    
-                    fields = [
-                        f"*Repository:* {repo['full_name']}",
-                        f"*Created by:* {pr['user']['login']}"
-                    ]
-                    
-                    actions = [{
-                        "text": "View Pull Request",
-                        "url": pr['html_url']
-                    }]
-                    
-                    send_slack_notification(slack_webhook_url, title, text, fields, actions)
-                
-                return jsonify({"status": "success", "message": "PR processed"}), 200
-                
-        elif event_type == 'pull_request_review':
-            review_id = process_review(data)
-            return jsonify({"status": "success", "message": "Review processed"}), 200
-            
-        elif event_type == 'pull_request_review_comment':
-            comment_id = process_review_comment(data)
-            return jsonify({"status": "success", "message": "Comment processed"}), 200
-        
-        # Handle ping event (GitHub sends this when webhook is first configured)
-        elif event_type == 'ping':
-            return jsonify({"status": "success", "message": "Pong!"}), 200
-            
-        return jsonify({"status": "success", "message": "Event received"}), 200
-        
+        message = process_delivery(event_type, delivery_id, request.get_json(), slack_webhook_url)
+        return jsonify({"status": "success", "message": message}), 200
     except Exception as e:
         logger.error(f"Error processing webhook: {str(e)}")
         return jsonify({"error": f"Error processing webhook: {str(e)}"}), 500
 
+def start_webhook_workers(slack_webhook_url):
+    """
+    Start the webhook queue and its workers (see start_webhook_queue)
+
+    Until this runs, the webhook route processes deliveries inline.
+    """
+    def process_queued_delivery(item):
+        process_delivery(item['event_type'], item['delivery_id'], json.loads(item['body']), slack_webhook_url)
+
+    return start_webhook_queue(process_queued_delivery)
+
 def setup_webhook_routes(app, github_secret, slack_webhook_url):
     """
     Set up webhook routes for the Flask app
     """
+    event_log = start_event_log()
+
     @app.route('/', methods=['POST'])
     def webhook_route():
-        return handle_webhook(github_secret, slack_webhook_url)
\ No newline at end of file
+        return handle_webhook(github_secret, slack_webhook_url, get_webhook_queue(), event_log)
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/webhook_queue.db'))
+
+class WebhookQueue:
+    """
+    Durable, SQLite-backed queue of verified webhook deliveries
+
+    Items are leased while a worker processes them, so a delivery claimed
+    by a process that crashes becomes visible again once its lease expires.
+    Each claim gets a new lease token; complete() and fail() only act on
+    the row while it still holds that token, so a worker whose lease
+    expired cannot delete or reset a delivery another worker has since
+    claimed. Several processes can share the same file.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=5, lease_seconds=300, retry_delay=5):
+        """
+        Args:
+            path: SQLite database file holding the queue
+            max_attempts: Attempts before a delivery is moved to the dead letter state
+            lease_seconds: How long a claimed delivery stays invisible to other workers
+            retry_delay: Base delay in seconds before a failed delivery is retried (doubles per attempt)
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                delivery_id TEXT,
+                event_type TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                enqueued_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                leased_until REAL,
+                lease_token TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                last_error TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_webhook_queue_ready ON webhook_queue (status, available_at, id)"
+        )
+
+        # Wakes idle workers as soon as something is enqueued
+        self.not_empty = threading.Event()
+
+        # Counters for this process
+        self._enqueued = 0
+        self._processed = 0
+        self._failed = 0
+        self._dead = 0
+        self._leases_lost = 0
+        self._lag_total = 0.0
+        self._lag_last = 0.0
+
+    def enqueue(self, delivery_id, event_type, headers, body):
+        """
+        Persist a delivery
+
+        Returns:
+            Queue id of the stored delivery
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO webhook_queue (delivery_id, event_type, headers, body, enqueued_at, available_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (delivery_id, event_type, json.dumps(headers), body, now, now)
+            )
+            self._enqueued += 1
+        self.not_empty.set()
+        return cursor.lastrowid
+
+    def claim(self):
+        """
+        Lease the oldest ready delivery
+
+        Returns:
+            Dict describing the delivery, or None if nothing is ready
+        """
+        now = time.time()
+        lease_token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """SELECT id, delivery_id, event_type, headers, body, enqueued_at, attempts
+                       FROM webhook_queue
+                       WHERE (status = 'pending' AND available_at <= ?)
+                          OR (status = 'processing' AND leased_until < ?)
+                       ORDER BY id
+                       LIMIT 1""",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    """UPDATE webhook_queue
+                       SET status = 'processing', leased_until = ?, lease_token = ?, attempts = attempts + 1
+                       WHERE id = ?""",
+                    (now + self.lease_seconds, lease_token, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {
+            'id': row[0],
+            'delivery_id': row[1],
+            'event_type': row[2],
+            'headers': json.loads(row[3]),
+            'body': row[4],
+            'enqueued_at': row[5],
+            'attempts': row[6] + 1,
+            'lease_token': lease_token
+        }
+
+    def _lease_lost(self, item, action):
+        """Record that item's lease was taken over; the caller holds self._lock"""
+        self._leases_lost += 1
+        logger.warning(
+            f"Lease on webhook delivery {item['delivery_id']} was lost (expired and re-claimed), "
+            f"not {action} it"
+        )
+        return False
+
+    def complete(self, item):
+        """
+        Remove a successfully processed delivery
+
+        Returns:
+            True if removed; False if the lease was lost to another worker
+        """
+        lag = time.time() - item['enqueued_at']
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM webhook_queue WHERE id = ? AND status = 'processing' AND lease_token = ?",
+                (item['id'], item['lease_token'])
+            )
+            if cursor.rowcount == 0:
+                return self._lease_lost(item, 'completing')
+            self._processed += 1
+            self._lag_total += lag
+            self._lag_last = lag
+        return True
+
+    def fail(self, item, error):
+        """
+        Schedule a failed delivery for retry, or dead-letter it after max_attempts
+
+        Returns:
+            True if the delivery was updated; False if the lease was lost to
+            another worker
+        """
+        with self._lock:
+            if item['attempts'] >= self.max_attempts:
+                cursor = self._conn.execute(
+                    """UPDATE webhook_queue
+                       SET status = 'dead', leased_until = NULL, lease_token = NULL, last_error = ?
+                       WHERE id = ? AND status = 'processing' AND lease_token = ?""",
+                    (str(error), item['id'], item['lease_token'])
+                )
+                if cursor.rowcount == 0:
+                    return self._lease_lost(item, 'dead-lettering')
+                self._failed += 1
+                self._dead += 1
+                logger.error(f"Webhook delivery {item['delivery_id']} dead-lettered after {item['attempts']} attempts")
+                return True
+
+            delay = self.retry_delay * (2 ** (item['attempts'] - 1))
+            cursor = self._conn.execute(
+                """UPDATE webhook_queue
+                   SET status = 'pending', leased_until = NULL, lease_token = NULL, available_at = ?, last_error = ?
+                   WHERE id = ? AND status = 'processing' AND lease_token = ?""",
+                (time.time() + delay, str(error), item['id'], item['lease_token'])
+            )
+            if cursor.rowcount == 0:
+                return self._lease_lost(item, 'retrying')
+            self._failed += 1
+        self.not_empty.set()
+        return True
+
+    def stats(self):
+        """Queue depth and lag, plus counters for this process"""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM webhook_queue GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued_at) FROM webhook_queue WHERE status IN ('pending', 'processing')"
+            ).fetchone()[0]
+            processed = self._processed
+            return {
+                'depth': counts.get('pending', 0),
+                'in_flight': counts.get('processing', 0),
+                'dead': counts.get('dead', 0),
+                'oldest_age_seconds': round(now - oldest, 3) if oldest else 0.0,
+                'enqueued': self._enqueued,
+                'processed': processed,
+                'failed_attempts': self._failed,
+                'dead_lettered': self._dead,
+                'leases_lost': self._leases_lost,
+                'avg_lag_seconds': round(self._lag_total / processed, 3) if processed else 0.0,
+                'last_lag_seconds': round(self._lag_last, 3)
+            }
+
+class WebhookWorkerPool:
+    """Background threads draining a WebhookQueue through a handler function"""
+
+    def __init__(self, queue, handler, workers=4, poll_interval=1.0):
+        """
+        Args:
+            queue: WebhookQueue to drain
+            handler: Callable taking a claimed delivery dict; raising marks it failed
+            workers: Number of worker threads
+            poll_interval: Seconds an idle worker sleeps before re-checking the queue
+        """
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} webhook worker threads")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.queue.not_empty.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                item = self.queue.claim()
+            except Exception as e:
+                logger.error(f"Error claiming webhook delivery: {str(e)}")
+                item = None
+
+            if item is None:
+                self.queue.not_empty.wait(self.poll_interval)
+                self.queue.not_empty.clear()
+                continue
+
+            try:
+                self.handler(item)
+                self.queue.complete(item)
+            except Exception as e:
+                logger.error(f"Error processing webhook delivery {item['delivery_id']}: {str(e)}")
+                self.queue.fail(item, e)
+
+# Process-wide queue, created by start_webhook_queue()
+_queue = None
+_workers = None
+
+def start_webhook_queue(handler):
+    """
+    Create the process-wide queue and its workers from environment settings
+
+    Returns:
+        The WebhookQueue, or None when WEBHOOK_QUEUE_WORKERS=0 (synchronous processing)
+    """
+    global _queue, _workers
+    if _queue is not None:
+        return _queue
+
+    workers = int(os.getenv('WEBHOOK_QUEUE_WORKERS', '4'))
+    if workers <= 0:
+        logger.info("Webhook queue disabled, deliveries are processed synchronously")
+        return None
+
+    _queue = WebhookQueue(
+        path=os.getenv('WEBHOOK_QUEUE_PATH', DEFAULT_QUEUE_PATH),
+        max_attempts=int(os.getenv('WEBHOOK_QUEUE_MAX_ATTEMPTS', '5')),
+        lease_seconds=int(os.getenv('WEBHOOK_QUEUE_LEASE_SECONDS', '300'))
+    )
+    _workers = WebhookWorkerPool(_queue, handler, workers=workers)
+    _workers.start()
+    return _queue
+
+def get_webhook_queue():
+    """The process-wide queue, or None until start_webhook_queue() creates it"""
+    return _queue
+
+def get_webhook_queue_stats():
+    if _queue is None:
+        return {'enabled': False}
+    stats = _queue.stats()
+    stats['enabled'] = True
+    stats['workers'] = _workers.workers if _workers else 0
+    return stats
@@ -1,89 +1,292 @@
+import os
 import logging
 from datetime import datetime, timedelta
 from prequel_db.db_connection import DatabaseConnection
+from prequel_db.db_cache import data_version
+from prequel_db.db_paging import PageRequest, fetch_page, page_select_sql, iter_rows
+from prequel_db.db_sqlite import mark_stale_chunk
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Upper bound on PRs marked stale per transaction during a sweep
+STALE_SWEEP_CHUNK_SIZE = int(os.getenv('STALE_SWEEP_CHUNK_SIZE', '5000'))
+
+# Sort orders and filters accepted by list_stale_prs()
+STALE_PR_SORTS = {
+    'last_activity': [('pr.last_activity_at', 'ASC'), ('pr.id', 'ASC')],
+    'created_at': [('pr.created_at', 'ASC'), ('pr.id', 'ASC')],
+    'repository': [('repo.full_name', 'ASC'), ('pr.last_activity_at', 'ASC'), ('pr.id', 'ASC')]
+}
+STALE_PR_FILTERS = {
+    'repository': ('(repo.name = ? OR repo.full_name = ?)', 2),
+    'author': ('u.username = ?', 1),
+    'state': ('pr.state = ?', 1),
+    'since': ('pr.last_activity_at >= ?', 1),
+    'until': ('pr.last_activity_at < ?', 1)
+}
+
+STALE_PR_COLUMNS = """pr.id, pr.title, pr.number, pr.html_url, repo.full_name, u.username,
+                      pr.created_at, pr.last_activity_at"""
+STALE_PR_FROM = """FROM pull_requests pr
+                   JOIN repositories repo ON pr.repository_id = repo.id
+                   JOIN users u ON pr.author_id = u.id"""
+
+# Most ids bound in one mark_prs_stale() statement (SQL Server allows 2100 parameters)
+STALE_MARK_BATCH_SIZE = 500
+
+def _mark_stale_sql(id_count=0):
+    """
+    T-SQL marking up to TOP (?) inactive open PRs stale, optionally only
+    among id_count given ids, with their history rows and rollup stale
+    counts; returns the marked ids. Parameters: (top, stale_date, *ids).
+    """
+    id_filter = f"AND id IN ({', '.join('?' * id_count)})" if id_count else ""
+    return f"""SET NOCOUNT ON;
+               DECLARE @marked TABLE (id INT PRIMARY KEY);
+               
+               UPDATE TOP (?) pull_requests
+               SET is_stale = 1
+               OUTPUT INSERTED.id INTO @marked
+               WHERE state = 'open' 
+               AND is_stale = 0 
+               AND last_activity_at < ? 
+               AND (closed_at IS NULL AND merged_at IS NULL)
+               {id_filter};
+               
+               INSERT INTO stale_pr_history (pull_request_id)
+               SELECT id FROM @marked;
+               
+               UPDATE rr
+               SET stale_pr_count = rr.stale_pr_count + m.stale_count
+               FROM repository_rollups rr
+               JOIN (SELECT pr.repository_id, COUNT(*) as stale_count
+                     FROM @marked mk JOIN pull_requests pr ON pr.id = mk.id
+                     GROUP BY pr.repository_id) m ON m.repository_id = rr.repository_id;
+               
+               UPDATE ur
+               SET stale_pr_count = ur.stale_pr_count + m.stale_count
+               FROM user_rollups ur
+               JOIN (SELECT pr.author_id, COUNT(*) as stale_count
+                     FROM @marked mk JOIN pull_requests pr ON pr.id = mk.id
+                     GROUP BY pr.author_id) m ON m.author_id = ur.user_id;
+               
+               SELECT id FROM @marked;"""
+
+def _stale_pr_scope(page):
+    """
+    Resolve the 'state' filter (default 'open', 'all' for any state)
+
+    Returns:
+        (base_predicate, page without a literal 'open' state filter); open
+        stale PRs are matched literally so the filtered index applies
+    """
+    filters = dict(page.filters)
+    state = filters.pop('state', None) or 'open'
+    base_predicate = "pr.is_stale = 1"
+    if state == 'open':
+        base_predicate += " AND pr.state = 'open'"
+    elif state != 'all':
+        filters['state'] = state
+    return base_predicate, PageRequest(sort=page.sort, filters=filters, limit=page.limit, after=page.after)
+
 class DatabaseAnalytics(DatabaseConnection):
     """
     Handles analytics and reporting functions related to PR data
     """
     
-    def check_for_stale_prs(self, days_threshold=7):
-        """Mark PRs as stale if they haven't had activity in the specified number of days"""
+    def check_for_stale_prs(self, days_threshold=7, chunk_size=None):
+        """
+        Mark PRs as stale if they haven't had activity in the specified number of days
+
+        Each chunk is one set-based UPDATE ... OUTPUT feeding the history
+        insert and the rollup stale counts, committed on its own so locks
+        are held for at most chunk_size rows at a time.
+
+        Args:
+            days_threshold: Days without activity before a PR is stale
+            chunk_size: Maximum PRs marked per transaction (defaults to STALE_SWEEP_CHUNK_SIZE)
+
+        Returns:
+            List of ids of the PRs marked stale by this call
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
             return []
             
+        chunk_size = chunk_size or STALE_SWEEP_CHUNK_SIZE
+        newly_stale_pr_ids = []
+        
         try:
             # Calculate the stale date threshold
             stale_date = datetime.now() - timedelta(days=days_threshold)
             
-            # Find PRs that have become stale
-            self.cursor.execute(
-                """SELECT id 
-                   FROM pull_requests 
-                   WHERE state = 'open' 
-                   AND is_stale = 0 
-                   AND last_activity_at < ? 
-                   AND (closed_at IS NULL AND merged_at IS NULL)""", 
-                (stale_date,)
-            )
-            
-            newly_stale_prs = self.cursor.fetchall()
-            newly_stale_pr_ids = []
-            
-            # Mark PRs as stale
-            for row in newly_stale_prs:
-                pr_id = row[0]
-                self.cursor.execute(
-                    "UPDATE pull_requests SET is_stale = 1 WHERE id = ?", 
-                    (pr_id,)
-                )
+            while True:
+                if self.dialect == 'sqlite':
+                    self.begin()
+                    chunk_ids = mark_stale_chunk(self.cursor, chunk_size, stale_date)
+                    self.conn.commit()
+                    if chunk_ids:
+                        data_version.bump(self.conn)
+                    newly_stale_pr_ids.extend(chunk_ids)
+                    if len(chunk_ids) < chunk_size:
+                        break
+                    continue
                 
-                # Add to stale PR history
-                self.cursor.execute(
-                    "INSERT INTO stale_pr_history (pull_request_id) VALUES (?)", 
-                    (pr_id,)
-                )
+                self.cursor.execute(_mark_stale_sql(), (chunk_size, stale_date))
+                chunk_ids = [row[0] for row in self.cursor.fetchall()]
+                self.conn.commit()
+                if chunk_ids:
+                    data_version.bump(self.conn)
                 
-                newly_stale_pr_ids.append(pr_id)
+                newly_stale_pr_ids.extend(chunk_ids)
+                if len(chunk_ids) < chunk_size:
+                    break
             
-            self.conn.commit()
             return newly_stale_pr_ids
             
         except Exception as e:
             logger.error(f"Error in check_for_stale_prs: {str(e)}")
             if hasattr(self, 'conn') and self.conn:
                 self.conn.rollback()
-            return []
+            # Earlier chunks are already committed; report them so they still get notified
+            return newly_stale_pr_ids
     
+    def mark_prs_stale(self, pr_ids, days_threshold=7):
+        """
+        Mark the given PRs stale if they are still open, not stale and inactive
+
+        The incremental counterpart of check_for_stale_prs(): the stale
+        watcher passes the PRs whose deadline passed, and the same
+        conditions as the sweep are re-checked in the database, so ids
+        with newer activity or that were closed are left alone.
+
+        Args:
+            pr_ids: Internal ids of the candidate pull requests
+            days_threshold: Days without activity before a PR is stale
+
+        Returns:
+            List of ids of the PRs marked stale by this call
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return []
+
+        stale_date = datetime.now() - timedelta(days=days_threshold)
+        marked = []
+        try:
+            for i in range(0, len(pr_ids), STALE_MARK_BATCH_SIZE):
+                batch = list(pr_ids[i:i + STALE_MARK_BATCH_SIZE])
+                if self.dialect == 'sqlite':
+                    self.begin()
+                    batch_ids = mark_stale_chunk(self.cursor, len(batch), stale_date, batch)
+                else:
+                    self.cursor.execute(_mark_stale_sql(len(batch)), (len(batch), stale_date, *batch))
+                    batch_ids = [row[0] for row in self.cursor.fetchall()]
+                self.conn.commit()
+                if batch_ids:
+                    data_version.bump(self.conn)
+                marked.extend(batch_ids)
+            return marked
+
+        except Exception as e:
+            logger.error(f"Error in mark_prs_stale: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return marked
+
+    def iter_stale_candidates(self, active_since=None, pr_ids=None, batch_size=500):
+        """
+        Yield (id, last_activity_at) of the open, non-stale PRs, the ones that can still go stale
+
+        Reads the filtered index the sweep uses, so loading the stale
+        watcher's deadline index costs one index scan.
+
+        Args:
+            active_since: Only PRs with last_activity_at at or after this time
+            pr_ids: Only these PRs (at most STALE_MARK_BATCH_SIZE)
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return
+
+        sql = """SELECT id, last_activity_at FROM pull_requests
+                 WHERE state = 'open'
+                 AND is_stale = 0
+                 AND (closed_at IS NULL AND merged_at IS NULL)"""
+        params = []
+        if active_since is not None:
+            sql += " AND last_activity_at >= ?"
+            params.append(active_since)
+        if pr_ids:
+            sql += f" AND id IN ({', '.join('?' * len(pr_ids))})"
+            params.extend(pr_ids)
+        try:
+            yield from iter_rows(self.cursor, sql, params, batch_size)
+        except Exception as e:
+            logger.error(f"Error in iter_stale_candidates: {str(e)}")
+
     def get_stale_prs(self):
         """Get all currently stale PRs"""
+        stale_prs, _, _ = self.list_stale_prs(PageRequest())
+        return stale_prs
+
+    def list_stale_prs(self, page):
+        """
+        Get one page of stale PRs
+
+        Args:
+            page: PageRequest; sorts are STALE_PR_SORTS, filters STALE_PR_FILTERS.
+                The 'state' filter defaults to 'open'; 'all' includes every state.
+
+        Returns:
+            (rows, next_after, total) as described in fetch_page(); each row is
+            (id, title, number, html_url, repository full name, author username,
+            created_at, last_activity_at)
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
-            return []
+            return [], None, 0
             
+        base_predicate, page = _stale_pr_scope(page)
         try:
-            self.cursor.execute(
-                """SELECT pr.id, pr.title, pr.number, pr.html_url, repo.full_name, u.username,
-                          pr.created_at, pr.last_activity_at
-                   FROM pull_requests pr
-                   JOIN repositories repo ON pr.repository_id = repo.id
-                   JOIN users u ON pr.author_id = u.id
-                   WHERE pr.is_stale = 1
-                   AND pr.state = 'open'
-                   ORDER BY pr.last_activity_at ASC"""
+            return fetch_page(
+                self.cursor, STALE_PR_COLUMNS, STALE_PR_FROM, base_predicate,
+                page, STALE_PR_SORTS, 'last_activity', STALE_PR_FILTERS, dialect=self.dialect
             )
-            return self.cursor.fetchall()
             
         except Exception as e:
-            logger.error(f"Error in get_stale_prs: {str(e)}")
-            return []
+            logger.error(f"Error in list_stale_prs: {str(e)}")
+            return [], None, 0
+
+    def iter_stale_prs(self, page, batch_size=500):
+        """
+        Yield the stale PRs selected by a PageRequest without materializing them
+
+        Rows are the same as list_stale_prs(); at most batch_size are held
+        in memory. The connection must stay open until the generator ends.
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return
+            
+        base_predicate, page = _stale_pr_scope(page)
+        sql, params, order, _, _ = page_select_sql(
+            STALE_PR_COLUMNS, STALE_PR_FROM, base_predicate,
+            page, STALE_PR_SORTS, 'last_activity', STALE_PR_FILTERS, dialect=self.dialect
+        )
+        try:
+            for row in iter_rows(self.cursor, sql, params, batch_size):
+                yield tuple(row[:-len(order)])
+        except Exception as e:
+            logger.error(f"Error in iter_stale_prs: {str(e)}")
+            raise
     
     def get_pr_metrics(self):
         """Get metrics for the frontend dashboard"""
@@ -0,0 +1,160 @@
+import os
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Define pyodbc at the module level
+pyodbc = None
+
+try:
+    import pyodbc
+    logger.info("Successfully imported pyodbc")
+except ImportError as e:
+    logger.error(f"Failed to import pyodbc: {str(e)}")
+    # Temporary fallback to allow debugging
+    class MockPyodbc:
+        def connect(self, *args, **kwargs):
+            logger.error("Using mock pyodbc connection")
+            return None
+    pyodbc = MockPyodbc()
+
+DEFAULT_SQLITE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/prequel.db'))
+
+# A storage backend opens connections for the pool and names the SQL dialect
+# (backend.name) the db_* modules use for the few statements that differ:
+# 'sqlserver' runs the T-SQL in those modules, 'sqlite' the equivalents in
+# db_sqlite and the SQLITE_STATEMENTS of each migration.
+
+class SqlServerBackend:
+    """Azure SQL / SQL Server through ODBC Driver 17"""
+
+    name = 'sqlserver'
+
+    def connection_string(self):
+        """Build the ODBC connection string from environment variables"""
+        # Get credentials from environment variables with no defaults
+        server = os.getenv("SQL_SERVER")
+        database = os.getenv("SQL_DATABASE")
+        username = os.getenv("SQL_USERNAME")
+        password = os.getenv("SQL_PASSWORD")
+
+        # Check if any required environment variables are missing
+        missing_vars = []
+        if not server: missing_vars.append("SQL_SERVER")
+        if not database: missing_vars.append("SQL_DATABASE")
+        if not username: missing_vars.append("SQL_USERNAME")
+        if not password: missing_vars.append("SQL_PASSWORD")
+
+        if missing_vars:
+            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+        logger.debug(f"Using database: {database} on server: {server}")
+
+        # Local SQL Server instances (e.g. the benchmark container) use self-signed certificates
+        trust_cert = "yes" if os.getenv("SQL_TRUST_SERVER_CERTIFICATE", "no").lower() == "yes" else "no"
+
+        return (
+            f"Driver={{ODBC Driver 17 for SQL Server}};"
+            f"Server=tcp:{server},1433;"
+            f"Database={database};"
+            f"Uid={username};"
+            f"Pwd={password};"
+            f"Encrypt=yes;"
+            f"TrustServerCertificate={trust_cert};"
+            f"Connection Timeout=30;"
+        )
+
+    def check_config(self):
+        """Raise ValueError if required settings are missing"""
+        self.connection_string()
+
+    def connect(self):
+        """Open a new physical connection; used by the connection pool"""
+        logger.debug(f"Attempting to connect to database")
+        conn = pyodbc.connect(self.connection_string())
+        logger.info(f"Successfully connected to Azure SQL database at {os.getenv('SQL_SERVER')}")
+        return conn
+
+def _adapt_datetime(value):
+    return value.isoformat(' ')
+
+def _convert_datetime(value):
+    text = value.decode('utf-8').replace('T', ' ')
+    if text.endswith('Z'):
+        text = text[:-1]
+    return datetime.fromisoformat(text)
+
+# DATETIME columns are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text, which
+# sorts and compares like the datetimes it represents
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+
+class SqliteBackend:
+    """
+    Single-file SQLite database for local-only mode, development and load tests
+
+    Connections run in autocommit mode; multi-statement writes open an
+    explicit BEGIN IMMEDIATE (see DatabaseConnection.begin), which takes the
+    write lock up front so concurrent writers queue on busy_timeout instead
+    of failing to upgrade a read lock.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('SQLITE_PATH') or DEFAULT_SQLITE_PATH
+
+    def check_config(self):
+        """SQLite needs no credentials"""
+
+    def connect(self):
+        """Open a new connection in WAL mode; used by the connection pool"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+            # The pool hands a connection to one thread at a time
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        logger.info(f"Opened SQLite database at {self.path}")
+        return conn
+
+BACKENDS = {
+    'sqlserver': SqlServerBackend,
+    'sqlite': SqliteBackend
+}
+
+# Process-wide backend, chosen by DB_BACKEND on first use
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Get the storage backend selected by DB_BACKEND ('sqlserver' or 'sqlite')
+
+    Raises:
+        ValueError: If DB_BACKEND names an unknown backend
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                # Load environment variables from .env file
+                load_dotenv()
+                name = (os.getenv('DB_BACKEND') or 'sqlserver').lower()
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown DB_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+                _backend = BACKENDS[name]()
+                logger.info(f"Using the {name} storage backend")
+    return _backend
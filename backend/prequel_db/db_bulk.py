@@ -0,0 +1,462 @@
+import os
+import logging
+from datetime import datetime
+from prequel_db.db_connection import DatabaseConnection
+from prequel_db.db_cache import data_version
+from prequel_db.db_deadlines import stale_deadlines
+from prequel_db.db_models import _detect_command
+from prequel_db.db_sqlite import apply_bulk
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Rows sent per executemany call while staging
+BULK_STAGE_BATCH_SIZE = int(os.getenv('BULK_STAGE_BATCH_SIZE', '10000'))
+
+# Bulk writes stage rows into session temp tables with fast_executemany and
+# then apply them with a few set-based statements, all in one transaction.
+# The statements capture the rows they insert or update with OUTPUT and
+# derive the rollup deltas from those row sets, so the rollups end up the
+# same as if every item had gone through the per-event fragments in db_models.
+
+STAGING_COLUMNS = {
+    '#bulk_repositories': """
+        github_id BIGINT PRIMARY KEY,
+        name NVARCHAR(255) NOT NULL,
+        full_name NVARCHAR(255) NOT NULL""",
+    '#bulk_users': """
+        github_id BIGINT PRIMARY KEY,
+        username NVARCHAR(255) NOT NULL,
+        avatar_url NVARCHAR(255) NULL""",
+    '#bulk_pull_requests': """
+        github_id BIGINT PRIMARY KEY,
+        repo_github_id BIGINT NOT NULL,
+        author_github_id BIGINT NOT NULL,
+        title NVARCHAR(255) NOT NULL,
+        number INT NOT NULL,
+        state NVARCHAR(50) NOT NULL,
+        html_url NVARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        closed_at DATETIME NULL,
+        merged_at DATETIME NULL""",
+    '#bulk_reviews': """
+        github_id BIGINT PRIMARY KEY,
+        pr_github_id BIGINT NOT NULL,
+        reviewer_github_id BIGINT NOT NULL,
+        state NVARCHAR(50) NOT NULL,
+        submitted_at DATETIME NOT NULL""",
+    '#bulk_comments': """
+        github_id BIGINT PRIMARY KEY,
+        pr_github_id BIGINT NOT NULL,
+        author_github_id BIGINT NOT NULL,
+        review_github_id BIGINT NULL,
+        body NVARCHAR(MAX) NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        contains_command BIT NOT NULL,
+        command_type NVARCHAR(50) NULL""",
+    # Row sets captured with OUTPUT for the rollup deltas
+    '#bulk_new_prs': "id INT, repository_id INT, author_id INT, last_activity_at DATETIME",
+    '#bulk_touched_prs': "repository_id INT, author_id INT, last_activity_at DATETIME, was_stale INT",
+    '#bulk_new_pairs': "user_id INT, repository_id INT",
+    '#bulk_new_items': "pull_request_id INT, user_id INT"
+}
+
+INSERT_MISSING_REPOSITORIES = """
+    INSERT INTO repositories (github_id, name, full_name)
+    SELECT s.github_id, s.name, s.full_name
+    FROM #bulk_repositories s
+    WHERE NOT EXISTS (SELECT 1 FROM repositories r WITH (UPDLOCK, HOLDLOCK) WHERE r.github_id = s.github_id);
+"""
+
+INSERT_MISSING_USERS = """
+    INSERT INTO users (github_id, username, avatar_url)
+    SELECT s.github_id, s.username, s.avatar_url
+    FROM #bulk_users s
+    WHERE NOT EXISTS (SELECT 1 FROM users u WITH (UPDLOCK, HOLDLOCK) WHERE u.github_id = s.github_id);
+"""
+
+def _rollup_delta_sql(table, key_column, delta_select, increments, activity=True):
+    """
+    Add per-key deltas to a rollup table, creating missing rows first
+
+    Args:
+        table: Rollup table
+        key_column: Its single key column
+        delta_select: SELECT returning k, one column per increment and,
+            when activity is set, last_activity
+        increments: Rollup columns incremented by the same-named delta column
+        activity: Move last_activity_at forward to last_activity
+    """
+    set_clauses = [f"{column} = t.{column} + d.{column}" for column in increments]
+    if activity:
+        set_clauses.append(
+            "last_activity_at = CASE WHEN t.last_activity_at IS NULL OR t.last_activity_at < d.last_activity "
+            "THEN d.last_activity ELSE t.last_activity_at END"
+        )
+    return f"""
+    INSERT INTO {table} ({key_column})
+    SELECT d.k FROM ({delta_select}) d
+    WHERE d.k IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM {table} t WITH (UPDLOCK, HOLDLOCK) WHERE t.{key_column} = d.k);
+    UPDATE t SET {', '.join(set_clauses)}
+    FROM {table} t
+    JOIN ({delta_select}) d ON t.{key_column} = d.k;
+    """
+
+MERGE_PULL_REQUESTS = INSERT_MISSING_REPOSITORIES + INSERT_MISSING_USERS + """
+    UPDATE pr
+    SET title = s.title,
+        state = s.state,
+        updated_at = s.updated_at,
+        closed_at = s.closed_at,
+        merged_at = s.merged_at,
+        last_activity_at = s.updated_at
+    OUTPUT inserted.repository_id, inserted.author_id, inserted.last_activity_at, 0
+    INTO #bulk_touched_prs
+    FROM pull_requests pr WITH (UPDLOCK, HOLDLOCK)
+    JOIN #bulk_pull_requests s ON s.github_id = pr.github_id;
+
+    INSERT INTO pull_requests
+        (github_id, repository_id, author_id, title, number, state, html_url,
+         created_at, updated_at, closed_at, merged_at, last_activity_at)
+    OUTPUT inserted.id, inserted.repository_id, inserted.author_id, inserted.last_activity_at
+    INTO #bulk_new_prs
+    SELECT s.github_id, r.id, u.id, s.title, s.number, s.state, s.html_url,
+           s.created_at, s.updated_at, s.closed_at, s.merged_at, s.updated_at
+    FROM #bulk_pull_requests s
+    JOIN repositories r ON r.github_id = s.repo_github_id
+    JOIN users u ON u.github_id = s.author_github_id
+    WHERE NOT EXISTS (SELECT 1 FROM pull_requests pr WITH (UPDLOCK, HOLDLOCK) WHERE pr.github_id = s.github_id);
+
+    INSERT INTO user_repository_rollups (user_id, repository_id)
+    OUTPUT inserted.user_id, inserted.repository_id INTO #bulk_new_pairs
+    SELECT DISTINCT n.author_id, n.repository_id
+    FROM #bulk_new_prs n
+    WHERE NOT EXISTS (SELECT 1 FROM user_repository_rollups urr WITH (UPDLOCK, HOLDLOCK)
+                      WHERE urr.user_id = n.author_id AND urr.repository_id = n.repository_id);
+
+    UPDATE urr SET pr_count = urr.pr_count + d.pr_count
+    FROM user_repository_rollups urr
+    JOIN (SELECT author_id, repository_id, COUNT(*) as pr_count
+          FROM #bulk_new_prs GROUP BY author_id, repository_id) d
+      ON urr.user_id = d.author_id AND urr.repository_id = d.repository_id;
+    """ + _rollup_delta_sql('repository_rollups', 'repository_id', """
+        SELECT a.repository_id as k,
+               SUM(a.is_new) as pr_count,
+               ISNULL(MAX(p.new_pairs), 0) as contributor_count,
+               MAX(a.last_activity_at) as last_activity
+        FROM (SELECT repository_id, last_activity_at, 1 as is_new FROM #bulk_new_prs
+              UNION ALL
+              SELECT repository_id, last_activity_at, 0 FROM #bulk_touched_prs) a
+        LEFT JOIN (SELECT repository_id, COUNT(*) as new_pairs
+                   FROM #bulk_new_pairs GROUP BY repository_id) p
+          ON p.repository_id = a.repository_id
+        GROUP BY a.repository_id""", ['pr_count', 'contributor_count']
+    ) + _rollup_delta_sql('user_rollups', 'user_id', """
+        SELECT a.author_id as k, SUM(a.is_new) as pr_count, MAX(a.last_activity_at) as last_activity
+        FROM (SELECT author_id, last_activity_at, 1 as is_new FROM #bulk_new_prs
+              UNION ALL
+              SELECT author_id, last_activity_at, 0 FROM #bulk_touched_prs) a
+        GROUP BY a.author_id""", ['pr_count']
+    ) + """
+    SELECT (SELECT COUNT(*) FROM #bulk_new_prs), (SELECT COUNT(*) FROM #bulk_touched_prs);
+    """
+
+def _merge_children_sql(staging, user_column, time_column, count_column, merge_sql):
+    """
+    Apply staged reviews or comments, mark their PRs active and adjust the rollups
+
+    Args:
+        staging: Staging table (#bulk_reviews or #bulk_comments)
+        user_column: Staging column holding the reviewer/author github_id
+        time_column: Staging column used as the activity time
+        count_column: Rollup counter for the item type
+        merge_sql: Update + insert of the items; the insert OUTPUTs
+            (pull_request_id, user_id) into #bulk_new_items
+    """
+    return INSERT_MISSING_USERS + merge_sql + f"""
+    UPDATE pr
+    SET last_activity_at = CASE WHEN pr.last_activity_at IS NULL OR pr.last_activity_at < a.last_activity
+                                THEN a.last_activity ELSE pr.last_activity_at END,
+        is_stale = 0
+    OUTPUT inserted.repository_id, inserted.author_id, inserted.last_activity_at,
+           ISNULL(CAST(deleted.is_stale AS INT), 0)
+    INTO #bulk_touched_prs
+    FROM pull_requests pr WITH (UPDLOCK, HOLDLOCK)
+    JOIN (SELECT pr_github_id, MAX({time_column}) as last_activity
+          FROM {staging} GROUP BY pr_github_id) a
+      ON a.pr_github_id = pr.github_id;
+    """ + _rollup_delta_sql('repository_rollups', 'repository_id', f"""
+        SELECT a.repository_id as k,
+               SUM(a.is_new) as {count_column},
+               -SUM(a.was_stale) as stale_pr_count,
+               MAX(a.last_activity) as last_activity
+        FROM (SELECT pr.repository_id, 1 as is_new, 0 as was_stale, NULL as last_activity
+              FROM #bulk_new_items n JOIN pull_requests pr ON pr.id = n.pull_request_id
+              UNION ALL
+              SELECT repository_id, 0, was_stale, last_activity_at FROM #bulk_touched_prs) a
+        GROUP BY a.repository_id""", [count_column, 'stale_pr_count']
+    ) + _rollup_delta_sql('user_rollups', 'user_id', f"""
+        SELECT a.user_id as k, SUM(a.is_new) as {count_column}, MAX(a.last_activity) as last_activity
+        FROM (SELECT user_id, 1 as is_new, NULL as last_activity FROM #bulk_new_items
+              UNION ALL
+              SELECT u.id, 0, s.{time_column}
+              FROM {staging} s JOIN users u ON u.github_id = s.{user_column}
+              JOIN pull_requests pr ON pr.github_id = s.pr_github_id) a
+        GROUP BY a.user_id""", [count_column]
+    ) + _rollup_delta_sql('user_rollups', 'user_id', """
+        SELECT author_id as k, -SUM(was_stale) as stale_pr_count
+        FROM #bulk_touched_prs
+        GROUP BY author_id
+        HAVING SUM(was_stale) > 0""", ['stale_pr_count'], activity=False
+    ) + f"""
+    SELECT (SELECT COUNT(*) FROM #bulk_new_items),
+           (SELECT COUNT(*) FROM {staging} s
+            WHERE EXISTS (SELECT 1 FROM pull_requests pr WHERE pr.github_id = s.pr_github_id))
+           - (SELECT COUNT(*) FROM #bulk_new_items);
+    """
+
+MERGE_REVIEWS = _merge_children_sql('#bulk_reviews', 'reviewer_github_id', 'submitted_at', 'review_count', """
+    UPDATE rv SET state = s.state
+    FROM pr_reviews rv WITH (UPDLOCK, HOLDLOCK)
+    JOIN #bulk_reviews s ON s.github_id = rv.github_id;
+
+    INSERT INTO pr_reviews (github_id, pull_request_id, reviewer_id, state, submitted_at)
+    OUTPUT inserted.pull_request_id, inserted.reviewer_id INTO #bulk_new_items
+    SELECT s.github_id, pr.id, u.id, s.state, s.submitted_at
+    FROM #bulk_reviews s
+    JOIN pull_requests pr ON pr.github_id = s.pr_github_id
+    JOIN users u ON u.github_id = s.reviewer_github_id
+    WHERE NOT EXISTS (SELECT 1 FROM pr_reviews rv WITH (UPDLOCK, HOLDLOCK) WHERE rv.github_id = s.github_id);
+""")
+
+MERGE_COMMENTS = _merge_children_sql('#bulk_comments', 'author_github_id', 'updated_at', 'comment_count', """
+    UPDATE c
+    SET body = s.body, updated_at = s.updated_at,
+        contains_command = s.contains_command, command_type = s.command_type
+    FROM review_comments c WITH (UPDLOCK, HOLDLOCK)
+    JOIN #bulk_comments s ON s.github_id = c.github_id;
+
+    INSERT INTO review_comments
+        (github_id, review_id, pull_request_id, author_id, body, created_at, updated_at,
+         contains_command, command_type)
+    OUTPUT inserted.pull_request_id, inserted.author_id INTO #bulk_new_items
+    SELECT s.github_id, rv.id, pr.id, u.id, s.body, s.created_at, s.updated_at,
+           s.contains_command, s.command_type
+    FROM #bulk_comments s
+    JOIN pull_requests pr ON pr.github_id = s.pr_github_id
+    JOIN users u ON u.github_id = s.author_github_id
+    LEFT JOIN pr_reviews rv ON rv.github_id = s.review_github_id
+    WHERE NOT EXISTS (SELECT 1 FROM review_comments c WITH (UPDLOCK, HOLDLOCK) WHERE c.github_id = s.github_id);
+""")
+
+def _timestamp(value):
+    """Parse a GitHub ISO 8601 timestamp into a naive datetime (None stays None)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+def _user_row(user_data):
+    return (
+        user_data.get('id'),
+        str(user_data.get('login', 'unknown')),
+        str(user_data.get('avatar_url', ''))
+    )
+
+class DatabaseBulk(DatabaseConnection):
+    """
+    Set-based upserts for large batches (backfills and event replays)
+
+    Each call stages its rows with fast_executemany and applies them in one
+    transaction. Items are deduplicated by github_id, keeping the last
+    occurrence, so a batch behaves like applying its rows in order.
+    """
+
+    def _stage_rows(self, table, columns, rows):
+        """Insert rows into a staging table in BULK_STAGE_BATCH_SIZE chunks"""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        self.cursor.fast_executemany = True
+        try:
+            for start in range(0, len(rows), BULK_STAGE_BATCH_SIZE):
+                self.cursor.executemany(sql, rows[start:start + BULK_STAGE_BATCH_SIZE])
+        finally:
+            self.cursor.fast_executemany = False
+
+    def _run_bulk(self, operation, staged, merge_sql):
+        """
+        Create the temp tables, stage rows, run merge_sql and drop the tables, in one transaction
+
+        Args:
+            operation: Name used in log messages
+            staged: List of (table, columns, rows) to stage
+            merge_sql: Batch applying the staged rows; ends with a SELECT of
+                (inserted, updated) counts for the last staged table
+
+        Returns:
+            Dict with staged/inserted/updated/skipped counts, or None on failure
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return None
+
+        try:
+            if self.dialect == 'sqlite':
+                self.begin()
+                inserted, updated = apply_bulk(self.cursor, staged)
+                self.conn.commit()
+            else:
+                inserted, updated = self._merge_staged(staged, merge_sql)
+        except Exception as e:
+            logger.error(f"Error in {operation}: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return None
+
+        data_version.bump(self.conn)
+        # Bulk merges move last_activity_at without reporting each PR
+        stale_deadlines.invalidate()
+        staged_count = len(staged[-1][2])
+        counts = {'staged': staged_count, 'inserted': inserted, 'updated': updated,
+                  'skipped': staged_count - inserted - updated}
+        logger.info(f"{operation}: {counts}")
+        return counts
+
+    def _merge_staged(self, staged, merge_sql):
+        """SQL Server path of _run_bulk(); returns (inserted, updated)"""
+        tables = [table for table, _, _ in staged] + [
+            '#bulk_new_prs', '#bulk_touched_prs', '#bulk_new_pairs', '#bulk_new_items'
+        ]
+        self.cursor.execute("".join(
+            f"IF OBJECT_ID('tempdb..{table}') IS NOT NULL DROP TABLE {table};\n"
+            f"CREATE TABLE {table} ({STAGING_COLUMNS[table]});\n"
+            for table in tables
+        ))
+        for table, columns, rows in staged:
+            if rows:
+                self._stage_rows(table, columns, rows)
+
+        self.cursor.execute("SET NOCOUNT ON;\nSET XACT_ABORT ON;\n" + merge_sql)
+        inserted, updated = self.cursor.fetchone()
+
+        self.cursor.execute("".join(f"DROP TABLE {table};\n" for table in tables))
+        self.conn.commit()
+        return inserted, updated
+
+    def bulk_upsert_pull_requests(self, rows):
+        """
+        Upsert pull requests with their repositories and authors
+
+        Args:
+            rows: Iterable of (repo_data, pr_data) GitHub payloads
+
+        Returns:
+            Dict with staged/inserted/updated/skipped counts, or None on failure
+        """
+        repositories, users, pull_requests = {}, {}, {}
+        for repo_data, pr_data in rows:
+            author = pr_data.get('user') or {}
+            if repo_data.get('id') is None or pr_data.get('id') is None or author.get('id') is None:
+                continue
+            repositories[repo_data['id']] = (
+                repo_data['id'],
+                str(repo_data.get('name', 'unknown')),
+                str(repo_data.get('full_name', 'unknown/unknown'))
+            )
+            users[author['id']] = _user_row(author)
+            pull_requests[pr_data['id']] = (
+                pr_data['id'],
+                repo_data['id'],
+                author['id'],
+                str(pr_data.get('title', 'Untitled PR')),
+                int(pr_data.get('number', 0)),
+                str(pr_data.get('state', 'open')),
+                str(pr_data.get('html_url', '')),
+                _timestamp(pr_data.get('created_at')) or datetime.now(),
+                _timestamp(pr_data.get('updated_at')) or datetime.now(),
+                _timestamp(pr_data.get('closed_at')),
+                _timestamp(pr_data.get('merged_at'))
+            )
+
+        return self._run_bulk('bulk_upsert_pull_requests', [
+            ('#bulk_repositories', ['github_id', 'name', 'full_name'], list(repositories.values())),
+            ('#bulk_users', ['github_id', 'username', 'avatar_url'], list(users.values())),
+            ('#bulk_pull_requests', ['github_id', 'repo_github_id', 'author_github_id', 'title', 'number',
+                                     'state', 'html_url', 'created_at', 'updated_at', 'closed_at', 'merged_at'],
+             list(pull_requests.values()))
+        ], MERGE_PULL_REQUESTS)
+
+    def bulk_upsert_reviews(self, rows):
+        """
+        Upsert reviews of already stored pull requests
+
+        Reviews of PRs that are not stored yet are counted as skipped, so
+        load the PRs first.
+
+        Args:
+            rows: Iterable of (pr_github_id, review_data); the reviewer is review_data['user']
+
+        Returns:
+            Dict with staged/inserted/updated/skipped counts, or None on failure
+        """
+        users, reviews = {}, {}
+        for pr_github_id, review_data in rows:
+            reviewer = review_data.get('user') or {}
+            if review_data.get('id') is None or reviewer.get('id') is None:
+                continue
+            users[reviewer['id']] = _user_row(reviewer)
+            reviews[review_data['id']] = (
+                review_data['id'],
+                pr_github_id,
+                reviewer['id'],
+                str(review_data.get('state', 'COMMENTED')),
+                _timestamp(review_data.get('submitted_at')) or datetime.now()
+            )
+
+        return self._run_bulk('bulk_upsert_reviews', [
+            ('#bulk_users', ['github_id', 'username', 'avatar_url'], list(users.values())),
+            ('#bulk_reviews', ['github_id', 'pr_github_id', 'reviewer_github_id', 'state', 'submitted_at'],
+             list(reviews.values()))
+        ], MERGE_REVIEWS)
+
+    def bulk_upsert_comments(self, rows):
+        """
+        Upsert review comments of already stored pull requests
+
+        Args:
+            rows: Iterable of (pr_github_id, comment_data, review_github_id);
+                the author is comment_data['user'] and review_github_id links
+                the comment to a stored review (None for standalone comments)
+
+        Returns:
+            Dict with staged/inserted/updated/skipped counts, or None on failure
+        """
+        users, comments = {}, {}
+        for pr_github_id, comment_data, review_github_id in rows:
+            author = comment_data.get('user') or {}
+            if comment_data.get('id') is None or author.get('id') is None:
+                continue
+            body = str(comment_data.get('body', ''))
+            contains_command, command_type = _detect_command(body)
+            users[author['id']] = _user_row(author)
+            comments[comment_data['id']] = (
+                comment_data['id'],
+                pr_github_id,
+                author['id'],
+                review_github_id,
+                body,
+                _timestamp(comment_data.get('created_at')) or datetime.now(),
+                _timestamp(comment_data.get('updated_at')) or datetime.now(),
+                contains_command,
+                command_type
+            )
+
+        return self._run_bulk('bulk_upsert_comments', [
+            ('#bulk_users', ['github_id', 'username', 'avatar_url'], list(users.values())),
+            ('#bulk_comments', ['github_id', 'pr_github_id', 'author_github_id', 'review_github_id', 'body',
+                                'created_at', 'updated_at', 'contains_command', 'command_type'],
+             list(comments.values()))
+        ], MERGE_COMMENTS)
@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from prequel_db.db_pool import get_pool
+from prequel_db.db_backends import get_backend
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """
+    Thread-safe, bounded LRU cache with per-entry TTL and hit/miss counters
+    """
+
+    def __init__(self, name, max_size=10000, ttl=3600):
+        """
+        Args:
+            name: Label used in stats and logs
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (0 disables expiry)
+        """
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        if key is None or value is None:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry (e.g. after the underlying row was deleted)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations
+            }
+
+class DataVersion:
+    """
+    Version of the data behind the dashboard endpoints, bumped after every
+    committed write that can change what they return; response caches and
+    their ETags are derived from it
+
+    The counter is the single row of the data_version table, so a write in
+    any worker process or node is seen by all of them. A writer learns the
+    new value from its own bump; current() re-reads the row at most every
+    poll_interval seconds, which bounds how long another process keeps
+    serving responses built before the write.
+    """
+
+    def __init__(self, poll_interval=1):
+        """
+        Args:
+            poll_interval: Seconds a value read from the database is reused (0 reads it on every call)
+        """
+        self.poll_interval = poll_interval
+        self._value = 0
+        self._read_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def bump(self, conn):
+        """
+        Increment the shared version after a write was committed on conn
+
+        Returns:
+            The new version, or the last known one if the row could not be updated
+        """
+        cursor = conn.cursor()
+        try:
+            if get_backend().name == 'sqlite':
+                cursor.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+                cursor.execute("SELECT version FROM data_version WHERE id = 1")
+            else:
+                cursor.execute("UPDATE data_version SET version = version + 1 OUTPUT inserted.version WHERE id = 1")
+            value = cursor.fetchone()[0]
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error bumping data version: {str(e)}")
+            conn.rollback()
+            return self.current()
+        finally:
+            cursor.close()
+        return self._observe(value)
+
+    def current(self):
+        """The latest known version, re-read from the database once poll_interval has passed"""
+        with self._lock:
+            fresh = self._read_at is not None and time.monotonic() - self._read_at < self.poll_interval
+            # Only one thread re-reads; the others keep using the value it is replacing
+            if fresh or self._refreshing:
+                return self._value
+            self._refreshing = True
+        value = None
+        try:
+            value = self._read()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                # Retry after poll_interval even if the read failed
+                self._read_at = time.monotonic()
+        if value is None:
+            return self._value
+        return self._observe(value)
+
+    def _observe(self, value):
+        with self._lock:
+            # Never step backwards, or an old version's ETags would match again
+            self._value = max(self._value, value)
+            return self._value
+
+    def _read(self):
+        """Read the shared version on a pooled connection, or None if the database is unavailable"""
+        try:
+            backend = get_backend()
+            backend.check_config()
+            pool = get_pool(backend.connect)
+            conn = pool.acquire()
+        except Exception as e:
+            logger.warning(f"Could not read data version: {str(e)}")
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM data_version WHERE id = 1")
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else None
+        except Exception as e:
+            logger.warning(f"Could not read data version: {str(e)}")
+            return None
+        finally:
+            pool.release(conn)
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+# github_id -> internal row id for the entities seen in nearly every webhook
+repository_id_cache = LRUCache(
+    'repository_ids',
+    max_size=_env_int('IDENTITY_CACHE_SIZE', 10000),
+    ttl=_env_int('IDENTITY_CACHE_TTL', 3600)
+)
+user_id_cache = LRUCache(
+    'user_ids',
+    max_size=_env_int('IDENTITY_CACHE_SIZE', 10000),
+    ttl=_env_int('IDENTITY_CACHE_TTL', 3600)
+)
+
+# Bumped by DatabaseModels, bulk imports, the stale sweep and rollup rebuilds
+data_version = DataVersion(poll_interval=_env_int('DATA_VERSION_POLL_SECONDS', 1))
+
+def invalidate_repository(github_id):
+    """Forget the cached id of a repository; call after deleting its row"""
+    repository_id_cache.invalidate(github_id)
+
+def invalidate_user(github_id):
+    """Forget the cached id of a user; call after deleting its row"""
+    user_id_cache.invalidate(github_id)
+
+def get_identity_cache_stats():
+    return {
+        'repositories': repository_id_cache.stats(),
+        'users': user_id_cache.stats()
+    }
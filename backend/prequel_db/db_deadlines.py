@@ -0,0 +1,164 @@
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class StaleDeadlineIndex:
+    """
+    In-process min-heap of open PRs keyed by the time they become stale
+
+    A PR's deadline is its last_activity_at plus the stale threshold. Writes
+    in DatabaseModels report the activity they store through observe(), so
+    the index follows every webhook without querying, and the stale watcher
+    only has to look at the PRs whose deadline has passed instead of
+    scanning pull_requests. Replaced deadlines stay in the heap and are
+    skipped when they reach the top (the dict holds the current one).
+
+    The index is a hint: the watcher re-checks each due PR in the database
+    before marking it, so a deadline that is out of date (activity written
+    by another process, a bulk load) can fire early but never marks a PR
+    that is not stale. Until configure() is called observe() does nothing.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._threshold = None
+        self._loaded = False
+        # Observations made while a load is reading the table, replayed over it
+        self._pending = None
+        self._changed = threading.Condition()
+        self._observed = 0
+        self._fired = 0
+        self._loads = 0
+
+    def configure(self, days_threshold):
+        """Enable the index for a stale threshold in days; it must be (re)loaded afterwards"""
+        with self._changed:
+            self._threshold = timedelta(days=days_threshold)
+            self._loaded = False
+            self._changed.notify_all()
+
+    @property
+    def enabled(self):
+        return self._threshold is not None
+
+    @property
+    def loaded(self):
+        with self._changed:
+            return self._loaded
+
+    def observe(self, pr_id, last_activity_at, is_open=True):
+        """
+        Record the activity just written for a PR
+
+        Args:
+            pr_id: Internal id of the pull request
+            last_activity_at: Its new last_activity_at (naive datetime)
+            is_open: False removes the PR (closed or merged PRs never go stale)
+        """
+        if self._threshold is None or pr_id is None:
+            return
+        with self._changed:
+            self._observed += 1
+            if self._pending is not None:
+                self._pending.append((pr_id, last_activity_at, is_open))
+            self._set(pr_id, last_activity_at, is_open)
+
+    def _set(self, pr_id, last_activity_at, is_open):
+        if not is_open or last_activity_at is None:
+            self._deadlines.pop(pr_id, None)
+            return
+        deadline = last_activity_at + self._threshold
+        if self._deadlines.get(pr_id) == deadline:
+            return
+        self._deadlines[pr_id] = deadline
+        heapq.heappush(self._heap, (deadline, pr_id))
+        if self._heap[0] == (deadline, pr_id):
+            # New earliest deadline; wake the watcher so it sleeps less
+            self._changed.notify_all()
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._compact()
+
+    def _compact(self):
+        self._heap = [(deadline, pr_id) for pr_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def begin_load(self):
+        """Start recording observations so a load does not lose writes made while it reads"""
+        with self._changed:
+            self._pending = []
+
+    def load(self, rows):
+        """
+        Replace the index with (pr_id, last_activity_at) rows of open, non-stale PRs
+
+        Writes observed since begin_load() are applied on top of the rows,
+        since the rows may predate them.
+        """
+        with self._changed:
+            pending, self._pending = self._pending or [], None
+            self._deadlines = {pr_id: last_activity_at + self._threshold
+                               for pr_id, last_activity_at in rows if last_activity_at is not None}
+            self._compact()
+            for pr_id, last_activity_at, is_open in pending:
+                self._set(pr_id, last_activity_at, is_open)
+            self._loaded = True
+            self._loads += 1
+            self._changed.notify_all()
+            return len(self._deadlines)
+
+    def merge(self, rows):
+        """Apply (pr_id, last_activity_at) rows of open, non-stale PRs read from the database"""
+        with self._changed:
+            for pr_id, last_activity_at in rows:
+                self._set(pr_id, last_activity_at, True)
+
+    def invalidate(self):
+        """Mark the index out of date (e.g. after a bulk load); the watcher reloads it"""
+        with self._changed:
+            if self._loaded:
+                self._loaded = False
+                self._changed.notify_all()
+
+    def pop_due(self, now, limit=None):
+        """Remove and return the ids of PRs whose deadline is at or before now"""
+        due = []
+        with self._changed:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+                deadline, pr_id = heapq.heappop(self._heap)
+                if self._deadlines.get(pr_id) == deadline:
+                    del self._deadlines[pr_id]
+                    due.append(pr_id)
+            self._fired += len(due)
+        return due
+
+    def next_deadline(self):
+        """Earliest current deadline, or None if the index is empty"""
+        with self._changed:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def wait(self, timeout):
+        """Sleep until timeout or until the earliest deadline or the loaded state changes"""
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def stats(self):
+        with self._changed:
+            return {
+                'enabled': self._threshold is not None,
+                'loaded': self._loaded,
+                'tracked_prs': len(self._deadlines),
+                'heap_entries': len(self._heap),
+                'observed': self._observed,
+                'fired': self._fired,
+                'loads': self._loads
+            }
+
+# Fed by DatabaseModels, drained by prequel_app.stale_watcher
+stale_deadlines = StaleDeadlineIndex()
@@ -1,12 +1,75 @@
 import logging
 from prequel_db.db_models import DatabaseModels
 from prequel_db.db_analytics import DatabaseAnalytics
+from prequel_db.db_rollups import DatabaseRollups
+from prequel_db.db_bulk import DatabaseBulk
+from prequel_db.db_scheduler import DatabaseScheduler
+from prequel_db.db_paging import PageRequest, NULL_DATE, fetch_page, page_select_sql, iter_rows
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
+# Sort orders and filters accepted by list_repositories()
+REPOSITORY_SORTS = {
+    'pr_count': [('COALESCE(rr.pr_count, 0)', 'DESC'), ('repo.id', 'ASC')],
+    'stale_pr_count': [('COALESCE(rr.stale_pr_count, 0)', 'DESC'), ('repo.id', 'ASC')],
+    'last_activity': [(f'COALESCE(rr.last_activity_at, {NULL_DATE})', 'DESC'), ('repo.id', 'ASC')],
+    'name': [('repo.name', 'ASC'), ('repo.id', 'ASC')]
+}
+REPOSITORY_FILTERS = {
+    'repository': ('(repo.name = ? OR repo.full_name = ?)', 2),
+    'author': ("""EXISTS (SELECT 1 FROM user_repository_rollups urr
+                          JOIN users au ON au.id = urr.user_id
+                          WHERE urr.repository_id = repo.id AND au.username = ?)""", 1),
+    'since': ('rr.last_activity_at >= ?', 1),
+    'until': ('rr.last_activity_at < ?', 1)
+}
+
+# Sort orders and filters accepted by list_contributors()
+CONTRIBUTOR_SORTS = {
+    'pr_count': [('COALESCE(ur.pr_count, 0)', 'DESC'), ('u.id', 'ASC')],
+    'review_count': [('COALESCE(ur.review_count, 0)', 'DESC'), ('u.id', 'ASC')],
+    'comment_count': [('COALESCE(ur.comment_count, 0)', 'DESC'), ('u.id', 'ASC')],
+    'last_activity': [(f'COALESCE(ur.last_activity_at, {NULL_DATE})', 'DESC'), ('u.id', 'ASC')],
+    'username': [('u.username', 'ASC'), ('u.id', 'ASC')]
+}
+CONTRIBUTOR_FILTERS = {
+    'author': ('u.username = ?', 1),
+    'repository': ("""EXISTS (SELECT 1 FROM user_repository_rollups urr
+                              JOIN repositories fr ON fr.id = urr.repository_id
+                              WHERE urr.user_id = u.id AND (fr.name = ? OR fr.full_name = ?))""", 2),
+    'since': ('ur.last_activity_at >= ?', 1),
+    'until': ('ur.last_activity_at < ?', 1)
+}
+
+CONTRIBUTOR_COLUMNS = """u.id,
+                         u.github_id,
+                         u.username,
+                         u.avatar_url,
+                         u.created_at,
+                         COALESCE(ur.pr_count, 0) as pr_count,
+                         COALESCE(ur.review_count, 0) as review_count,
+                         COALESCE(ur.comment_count, 0) as comment_count"""
+CONTRIBUTOR_FROM = """FROM users u
+                      LEFT JOIN user_rollups ur ON ur.user_id = u.id"""
+
+def _contributor_from_row(row, repositories):
+    """Contributor dict from a row starting with the CONTRIBUTOR_COLUMNS"""
+    user_id, github_id, username, avatar_url, created_at, pr_count, review_count, comment_count = row[:8]
+    return {
+        'id': user_id,
+        'github_id': github_id,
+        'username': username,
+        'avatar_url': avatar_url,
+        'created_at': created_at.isoformat() if created_at else None,
+        'pr_count': pr_count or 0,
+        'review_count': review_count or 0,
+        'comment_count': comment_count or 0,  # All comments, not just commands
+        'repositories': repositories
+    }
+
+class DatabaseHandler(DatabaseModels, DatabaseAnalytics, DatabaseRollups, DatabaseBulk, DatabaseScheduler):
     """
     Main database handler that combines models and analytics functionality
     
@@ -74,9 +137,11 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
                 users u ON pr.author_id = u.id
             ORDER BY 
                 pr.created_at DESC
-            OFFSET 0 ROWS
-            FETCH NEXT ? ROWS ONLY
             """
+            if self.dialect == 'sqlite':
+                query += "LIMIT ?"
+            else:
+                query += "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
             
             self.cursor.execute(query, (limit,))
             results = self.cursor.fetchall()
@@ -106,42 +171,49 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
 
     def get_repositories_with_pr_counts(self):
         """Get repositories with PR counts for frontend"""
+        repositories, _, _ = self.list_repositories(PageRequest())
+        return repositories
+
+    def list_repositories(self, page):
+        """
+        Get one page of repositories with PR counts
+
+        Counts are read from repository_rollups, which the webhook writes
+        keep current, so the cost is proportional to the repositories returned.
+
+        Args:
+            page: PageRequest; sorts are REPOSITORY_SORTS, filters REPOSITORY_FILTERS
+
+        Returns:
+            (repositories, next_after, total) as described in fetch_page()
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
-            return []
+            return [], None, 0
             
         try:
-            self.cursor.execute(
-                """SELECT 
-                repo.id,
-                repo.github_id,
-                repo.name,
-                repo.full_name,
-                repo.created_at,
-                COUNT(pr.id) as pr_count,
-                SUM(CASE WHEN pr.is_stale = 1 THEN 1 ELSE 0 END) as stale_pr_count,
-                (SELECT COUNT(DISTINCT author_id) FROM pull_requests WHERE repository_id = repo.id) as contributor_count,
-                (SELECT MAX(last_activity_at) FROM pull_requests WHERE repository_id = repo.id) as last_activity
-            FROM repositories repo
-            LEFT JOIN pull_requests pr ON repo.id = pr.repository_id
-            GROUP BY repo.id, repo.github_id, repo.name, repo.full_name, repo.created_at
-            ORDER BY pr_count DESC"""
+            rows, next_after, total = fetch_page(
+                self.cursor,
+                """repo.id,
+                   repo.github_id,
+                   repo.name,
+                   repo.full_name,
+                   repo.created_at,
+                   COALESCE(rr.pr_count, 0) as pr_count,
+                   COALESCE(rr.review_count, 0) as review_count,
+                   COALESCE(rr.stale_pr_count, 0) as stale_pr_count,
+                   COALESCE(rr.contributor_count, 0) as contributor_count,
+                   rr.last_activity_at""",
+                """FROM repositories repo
+                   LEFT JOIN repository_rollups rr ON rr.repository_id = repo.id""",
+                "",
+                page, REPOSITORY_SORTS, 'pr_count', REPOSITORY_FILTERS, dialect=self.dialect
             )
             
             repositories = []
-            for row in self.cursor.fetchall():
-                repo_id, github_id, name, full_name, created_at, pr_count, stale_pr_count, contributor_count, last_activity = row
-                
-                # Get review count for this repository
-                self.cursor.execute(
-                    """SELECT COUNT(rv.id)
-                    FROM pr_reviews rv
-                    JOIN pull_requests pr ON rv.pull_request_id = pr.id
-                    WHERE pr.repository_id = ?""",
-                    (repo_id,)
-                )
-                review_count = self.cursor.fetchone()[0] or 0
+            for row in rows:
+                repo_id, github_id, name, full_name, created_at, pr_count, review_count, stale_pr_count, contributor_count, last_activity = row
                 
                 repositories.append({
                     'id': repo_id,
@@ -150,73 +222,118 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
                     'full_name': full_name,
                     'created_at': created_at.isoformat() if created_at else None,
                     'pr_count': pr_count or 0,
-                    'review_count': review_count,
+                    'review_count': review_count or 0,
                     'stale_pr_count': stale_pr_count or 0,
                     'contributor_count': contributor_count or 0,
                     'last_activity': last_activity.isoformat() if last_activity else None
                 })
             
-            return repositories
+            return repositories, next_after, total
             
         except Exception as e:
-            logger.error(f"Error in get_repositories_with_pr_counts: {str(e)}")
-            return []    
+            logger.error(f"Error in list_repositories: {str(e)}")
+            return [], None, 0
 
     def get_contributors_with_counts(self):
         """Get contributors with PR and review counts"""
+        contributors, _, _ = self.list_contributors(PageRequest())
+        return contributors
+
+    def list_contributors(self, page):
+        """
+        Get one page of contributors with PR, review and comment counts
+
+        Counts come from user_rollups and the repositories each user
+        contributed to from user_repository_rollups, so the page costs two
+        statements proportional to the rows returned, not the PR history.
+
+        Args:
+            page: PageRequest; sorts are CONTRIBUTOR_SORTS, filters CONTRIBUTOR_FILTERS
+
+        Returns:
+            (contributors, next_after, total) as described in fetch_page()
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
-            return []
+            return [], None, 0
             
         try:
-            self.cursor.execute(
-                """SELECT 
-                u.id,
-                u.github_id,
-                u.username,
-                u.avatar_url,
-                u.created_at,
-                COUNT(DISTINCT pr.id) as pr_count,
-                (SELECT COUNT(DISTINCT rv.id) FROM pr_reviews rv WHERE rv.reviewer_id = u.id) as review_count,
-                (SELECT COUNT(DISTINCT rc.id) FROM review_comments rc WHERE rc.author_id = u.id) as comment_count
-            FROM users u
-            LEFT JOIN pull_requests pr ON u.id = pr.author_id
-            GROUP BY u.id, u.github_id, u.username, u.avatar_url, u.created_at
-            ORDER BY pr_count DESC"""
+            user_rows, next_after, total = fetch_page(
+                self.cursor, CONTRIBUTOR_COLUMNS, CONTRIBUTOR_FROM, "",
+                page, CONTRIBUTOR_SORTS, 'pr_count', CONTRIBUTOR_FILTERS, dialect=self.dialect
             )
             
-            contributors = []
-            for row in self.cursor.fetchall():
-                user_id, github_id, username, avatar_url, created_at, pr_count, review_count, comment_count = row
+            # Get repositories each listed user contributed to, grouped in Python
+            repositories_by_user = {}
+            if user_rows:
+                # Same-named repositories under different owners are listed once
+                repo_query = """SELECT DISTINCT urr.user_id, repo.name
+                FROM user_repository_rollups urr
+                JOIN repositories repo ON repo.id = urr.repository_id"""
+                repo_params = []
+                if page.limit:
+                    repo_query += f"\nWHERE urr.user_id IN ({', '.join('?' for _ in user_rows)})"
+                    repo_params = [row[0] for row in user_rows]
+                repo_query += "\nORDER BY urr.user_id, repo.name"
                 
-                # Get repositories this user contributed to
-                self.cursor.execute(
-                    """SELECT DISTINCT repo.name
-                    FROM repositories repo
-                    JOIN pull_requests pr ON repo.id = pr.repository_id
-                    WHERE pr.author_id = ?""",
-                    (user_id,)
-                )
-                repositories = [repo[0] for repo in self.cursor.fetchall()]
-                
-                contributors.append({
-                    'id': user_id,
-                    'github_id': github_id,
-                    'username': username,
-                    'avatar_url': avatar_url,
-                    'created_at': created_at.isoformat() if created_at else None,
-                    'pr_count': pr_count or 0,
-                    'review_count': review_count or 0,
-                    'comment_count': comment_count or 0,  # All comments, not just commands
-                    'repositories': repositories
-                })
+                self.cursor.execute(repo_query, repo_params)
+                for author_id, repo_name in self.cursor.fetchall():
+                    repositories_by_user.setdefault(author_id, []).append(repo_name)
             
-            return contributors
+            contributors = [
+                _contributor_from_row(row, repositories_by_user.get(row[0], []))
+                for row in user_rows
+            ]
+            
+            return contributors, next_after, total
             
         except Exception as e:
-            logger.error(f"Error in get_contributors_with_counts: {str(e)}")
-            return []
+            logger.error(f"Error in list_contributors: {str(e)}")
+            return [], None, 0
+
+    def iter_contributors(self, page, batch_size=500):
+        """
+        Yield the contributors selected by a PageRequest without materializing them
+
+        Users and the repositories they contributed to come from one ordered
+        join; consecutive rows of the same user are folded together, so at
+        most batch_size rows are held in memory. The connection must stay
+        open until the generator ends.
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return
+            
+        users_sql, params, order, _, _ = page_select_sql(
+            CONTRIBUTOR_COLUMNS, CONTRIBUTOR_FROM, "",
+            page, CONTRIBUTOR_SORTS, 'pr_count', CONTRIBUTOR_FILTERS, ordered=False,
+            dialect=self.dialect
+        )
+        sort_keys = ", ".join(f"p.sk{i} {direction}" for i, (_, direction) in enumerate(order))
+        sql = f"""SELECT p.*, repo.name
+            FROM ({users_sql}) p
+            LEFT JOIN user_repository_rollups urr ON urr.user_id = p.id
+            LEFT JOIN repositories repo ON repo.id = urr.repository_id
+            ORDER BY {sort_keys}, repo.name"""
+        
+        try:
+            current = None
+            repositories = []
+            for row in iter_rows(self.cursor, sql, params, batch_size):
+                if current is not None and row[0] != current[0]:
+                    yield _contributor_from_row(current, repositories)
+                    repositories = []
+                current = row
+                # Same-named repositories under different owners are adjacent; list them once
+                if row[-1] is not None and (not repositories or repositories[-1] != row[-1]):
+                    repositories.append(row[-1])
+            if current is not None:
+                yield _contributor_from_row(current, repositories)
+        except Exception as e:
+            logger.error(f"Error in iter_contributors: {str(e)}")
+            raise
         
     def get_pr_metrics(self):
         """Get metrics for the frontend dashboard"""
@@ -231,11 +348,12 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
             }
             
         try:
-            # Get PR authors count
+            # Get PR authors count (from the user rollups)
             self.cursor.execute(
-                """SELECT u.username, COUNT(pr.id) as pr_count
-                   FROM users u
-                   JOIN pull_requests pr ON u.id = pr.author_id
+                """SELECT u.username, SUM(ur.pr_count) as pr_count
+                   FROM user_rollups ur
+                   JOIN users u ON u.id = ur.user_id
+                   WHERE ur.pr_count > 0
                    GROUP BY u.username
                    ORDER BY pr_count DESC"""
             )
@@ -244,9 +362,10 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
             
             # Get active reviewers
             self.cursor.execute(
-                """SELECT u.username, COUNT(rv.id) as review_count
-                   FROM users u
-                   JOIN pr_reviews rv ON u.id = rv.reviewer_id
+                """SELECT u.username, SUM(ur.review_count) as review_count
+                   FROM user_rollups ur
+                   JOIN users u ON u.id = ur.user_id
+                   WHERE ur.review_count > 0
                    GROUP BY u.username
                    ORDER BY review_count DESC"""
             )
@@ -255,9 +374,10 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
             
             # Get comment users
             self.cursor.execute(
-                """SELECT u.username, COUNT(rc.id) as comment_count
-                   FROM users u
-                   JOIN review_comments rc ON u.id = rc.author_id
+                """SELECT u.username, SUM(ur.comment_count) as comment_count
+                   FROM user_rollups ur
+                   JOIN users u ON u.id = ur.user_id
+                   WHERE ur.comment_count > 0
                    GROUP BY u.username
                    ORDER BY comment_count DESC"""
             )       
@@ -265,7 +385,7 @@ class DatabaseHandler(DatabaseModels, DatabaseAnalytics):
             comment_users_rows = self.cursor.fetchall()
             comment_users = [[row[0], row[1]] for row in comment_users_rows]
             
-            # Get stale PR count
+            # Get stale PR count (reads only the filtered open/stale index)
             self.cursor.execute(
                 """SELECT COUNT(id) FROM pull_requests WHERE is_stale = 1 AND state = 'open'"""
             )
@@ -0,0 +1,203 @@
+import sys
+import fcntl
+import logging
+import argparse
+import threading
+
+from prequel_db.db_connection import DatabaseConnection
+from prequel_db.db_backends import get_backend
+from prequel_db.migrations import load_migrations
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_RESOURCE = 'prequel_schema_migrations'
+
+# Guards apply_migrations() so the schema check runs once per process
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+class MigrationRunner(DatabaseConnection):
+    """
+    Applies versioned schema migrations and records them in schema_migrations
+    """
+
+    def _ensure_migrations_table(self):
+        """Create the table that records applied migration versions"""
+        if self.dialect == 'sqlite':
+            self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at DATETIME DEFAULT (datetime('now', 'localtime'))
+            )
+            """)
+            return
+        self.cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[schema_migrations]') AND type in (N'U'))
+        BEGIN
+            CREATE TABLE schema_migrations (
+                version INT PRIMARY KEY,
+                description NVARCHAR(255) NOT NULL,
+                applied_at DATETIME DEFAULT GETDATE()
+            )
+        END
+        """)
+        self.conn.commit()
+
+    def _acquire_lock(self):
+        """Serialize migration runs across processes starting at the same time"""
+        if self.dialect == 'sqlite':
+            # A lock file next to the database; released when the file is closed
+            self._lock_file = open(get_backend().path + '.lock', 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            return
+        self.cursor.execute(
+            """SET NOCOUNT ON;
+            DECLARE @result INT;
+            EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                         @LockOwner = 'Session', @LockTimeout = 60000;
+            SELECT @result""",
+            (MIGRATIONS_LOCK_RESOURCE,)
+        )
+        result = self.cursor.fetchone()[0]
+        if result < 0:
+            raise RuntimeError(f"Could not acquire migration lock (sp_getapplock returned {result})")
+
+    def _release_lock(self):
+        if self.dialect == 'sqlite':
+            self._lock_file.close()
+            return
+        try:
+            self.cursor.execute(
+                "EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'",
+                (MIGRATIONS_LOCK_RESOURCE,)
+            )
+        except Exception as e:
+            logger.warning(f"Error releasing migration lock: {str(e)}")
+
+    def get_applied_versions(self):
+        """Return the set of migration versions already applied"""
+        self.cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in self.cursor.fetchall()}
+
+    def status(self):
+        """
+        Get the state of every known migration
+
+        Returns:
+            List of (version, description, applied) tuples
+        """
+        self._ensure_migrations_table()
+        applied = self.get_applied_versions()
+        return [(m.VERSION, m.DESCRIPTION, m.VERSION in applied) for m in load_migrations()]
+
+    def upgrade(self, target=None):
+        """
+        Apply pending migrations in version order, each in its own transaction
+
+        Args:
+            target: Highest version to apply (defaults to the latest)
+
+        Returns:
+            List of versions applied by this call
+        """
+        self._ensure_migrations_table()
+        self._acquire_lock()
+        applied_now = []
+        try:
+            applied = self.get_applied_versions()
+            for migration in load_migrations():
+                if migration.VERSION in applied:
+                    continue
+                if target is not None and migration.VERSION > target:
+                    break
+
+                logger.info(f"Applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+                try:
+                    if self.dialect == 'sqlite':
+                        self.begin()
+                        statements = migration.SQLITE_STATEMENTS
+                    else:
+                        statements = migration.STATEMENTS
+                    for statement in statements:
+                        self.cursor.execute(statement)
+                    self.cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                        (migration.VERSION, migration.DESCRIPTION)
+                    )
+                    self.conn.commit()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+                applied_now.append(migration.VERSION)
+        finally:
+            self._release_lock()
+
+        return applied_now
+
+def apply_migrations():
+    """
+    Bring the schema up to date once per process
+
+    Called at application startup; request handlers never run DDL.
+
+    Returns:
+        True if the schema is current, False if migrations could not be applied
+    """
+    global _schema_ready
+    if _schema_ready:
+        return True
+
+    with _schema_lock:
+        if _schema_ready:
+            return True
+
+        runner = MigrationRunner()
+        if hasattr(runner, 'connection_failed') and runner.connection_failed:
+            logger.error("Database connection failed, skipping schema migrations")
+            return False
+
+        try:
+            applied = runner.upgrade()
+            if applied:
+                logger.info(f"Applied schema migrations: {applied}")
+            else:
+                logger.info("Database schema is up to date")
+            _schema_ready = True
+            return True
+        except Exception as e:
+            logger.error(f"Error applying schema migrations: {str(e)}")
+            return False
+        finally:
+            runner.close()
+
+def main(argv=None):
+    """Command line entry point: python -m prequel_db.db_migrations [status|upgrade]"""
+    parser = argparse.ArgumentParser(description="Manage the PReQual database schema")
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['upgrade', 'status'])
+    parser.add_argument('--target', type=int, default=None, help="Highest migration version to apply")
+    args = parser.parse_args(argv)
+
+    runner = MigrationRunner()
+    if hasattr(runner, 'connection_failed') and runner.connection_failed:
+        print("Could not connect to the database", file=sys.stderr)
+        return 1
+
+    try:
+        if args.command == 'status':
+            for version, description, applied in runner.status():
+                print(f"{version:04d}  {'applied' if applied else 'pending':8}  {description}")
+        else:
+            applied = runner.upgrade(target=args.target)
+            print(f"Applied migrations: {applied}" if applied else "Database schema is up to date")
+        return 0
+    except Exception as e:
+        print(f"Migration failed: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        runner.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,383 +1,711 @@
 import logging
 from datetime import datetime
 from prequel_db.db_connection import DatabaseConnection
+from prequel_db.db_cache import repository_id_cache, user_id_cache, data_version
+from prequel_db.db_deadlines import stale_deadlines
+from prequel_db.db_rollups import rollup_upsert_sql
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Simple command detection - check for common commands in comment bodies
+COMMAND_KEYWORDS = ['LGTM', 'APPROVE', 'REQUEST CHANGES', 'NEED REVIEW']
+
+# Each fragment below is a piece of a T-SQL batch. The SELECT ... WITH
+# (UPDLOCK, HOLDLOCK) takes a key-range lock on github_id, so two concurrent
+# deliveries for the same entity serialize instead of racing to INSERT.
+# Entity fragments also apply their deltas to the rollup tables, so the
+# counters commit (or roll back) together with the rows they summarize.
+
+# Error text thrown by _delivery_fragment; _run_write maps it to DuplicateDeliveryError
+DUPLICATE_DELIVERY_MESSAGE = 'Duplicate webhook delivery'
+
+class DuplicateDeliveryError(Exception):
+    """Raised when a write batch carries a delivery id that is already recorded; nothing was written"""
+
+def _delivery_fragment(delivery_id, event_type):
+    """
+    Record the webhook delivery the batch belongs to, aborting the batch if it was already recorded
+
+    The row commits with the event's writes, so a failed or interrupted
+    write leaves no record and the retry is processed normally.
+    """
+    sql = f"""
+    INSERT INTO webhook_deliveries (delivery_id, event_type)
+    SELECT ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM webhook_deliveries WITH (UPDLOCK, HOLDLOCK) WHERE delivery_id = ?
+    );
+    IF @@ROWCOUNT = 0
+        THROW 50001, '{DUPLICATE_DELIVERY_MESSAGE}', 1;
+    """
+    return sql, (delivery_id, event_type, delivery_id)
+
+def _assign_fragment(var, value):
+    """Set a result variable to a known value (e.g. an id the caller already has)"""
+    return f"SET @{var} = ?;\n", (value,)
+
+def _repository_fragment(repo_data):
+    """Insert-if-missing for a repository; leaves its id in @repo_id"""
+    sql = """
+    DECLARE @repo_github_id BIGINT = ?, @repo_name NVARCHAR(255) = ?, @repo_full_name NVARCHAR(255) = ?;
+    SELECT @repo_id = id FROM repositories WITH (UPDLOCK, HOLDLOCK) WHERE github_id = @repo_github_id;
+    IF @repo_id IS NULL
+    BEGIN
+        INSERT INTO repositories (github_id, name, full_name)
+        VALUES (@repo_github_id, @repo_name, @repo_full_name);
+        SET @repo_id = SCOPE_IDENTITY();
+    END
+    """
+    params = (
+        repo_data.get('id'),
+        str(repo_data.get('name', 'unknown')),
+        str(repo_data.get('full_name', 'unknown/unknown'))
+    )
+    return sql, params
+
+def _user_fragment(var, user_data):
+    """Insert-if-missing for a user; leaves its id in @<var>"""
+    sql = f"""
+    DECLARE @{var}_github_id BIGINT = ?, @{var}_username NVARCHAR(255) = ?, @{var}_avatar_url NVARCHAR(255) = ?;
+    SELECT @{var} = id FROM users WITH (UPDLOCK, HOLDLOCK) WHERE github_id = @{var}_github_id;
+    IF @{var} IS NULL
+    BEGIN
+        INSERT INTO users (github_id, username, avatar_url)
+        VALUES (@{var}_github_id, @{var}_username, @{var}_avatar_url);
+        SET @{var} = SCOPE_IDENTITY();
+    END
+    """
+    params = (
+        user_data.get('id'),
+        str(user_data.get('login', 'unknown')),
+        str(user_data.get('avatar_url', ''))  # Use empty string as default
+    )
+    return sql, params
+
+def _pull_request_fragment(pr_data):
+    """Upsert a pull request for @repo_id/@author_id and its rollups; leaves its id in @pr_id"""
+    created_at = pr_data.get('created_at', datetime.now().isoformat())
+    updated_at = pr_data.get('updated_at', datetime.now().isoformat())
+
+    sql = """
+    DECLARE @pr_github_id BIGINT = ?, @pr_title NVARCHAR(255) = ?, @pr_number INT = ?,
+            @pr_state NVARCHAR(50) = ?, @pr_html_url NVARCHAR(255) = ?,
+            @pr_created_at DATETIME = ?, @pr_updated_at DATETIME = ?,
+            @pr_closed_at DATETIME = ?, @pr_merged_at DATETIME = ?;
+    DECLARE @pr_repo_id INT, @pr_author_id INT, @pr_is_new INT = 0, @pr_new_contributor INT = 0;
+    SELECT @pr_id = id FROM pull_requests WITH (UPDLOCK, HOLDLOCK) WHERE github_id = @pr_github_id;
+    IF @pr_id IS NULL
+    BEGIN
+        INSERT INTO pull_requests
+            (github_id, repository_id, author_id, title, number, state, html_url,
+             created_at, updated_at, closed_at, merged_at, last_activity_at)
+        VALUES
+            (@pr_github_id, @repo_id, @author_id, @pr_title, @pr_number, @pr_state, @pr_html_url,
+             @pr_created_at, @pr_updated_at, @pr_closed_at, @pr_merged_at, @pr_updated_at);
+        SET @pr_id = SCOPE_IDENTITY();
+        SELECT @pr_repo_id = @repo_id, @pr_author_id = @author_id, @pr_is_new = 1;
+    END
+    ELSE
+    BEGIN
+        UPDATE pull_requests
+        SET @pr_repo_id = repository_id,
+            @pr_author_id = author_id,
+            title = @pr_title,
+            state = @pr_state,
+            updated_at = @pr_updated_at,
+            closed_at = @pr_closed_at,
+            merged_at = @pr_merged_at,
+            last_activity_at = @pr_updated_at
+        WHERE id = @pr_id;
+    END
+    IF @pr_is_new = 1
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM user_repository_rollups WITH (UPDLOCK, HOLDLOCK)
+                       WHERE user_id = @pr_author_id AND repository_id = @pr_repo_id)
+            SET @pr_new_contributor = 1;
+        """ + rollup_upsert_sql(
+        'user_repository_rollups',
+        [('user_id', '@pr_author_id'), ('repository_id', '@pr_repo_id')],
+        [('pr_count', '1')]
+    ) + """
+    END
+    """ + rollup_upsert_sql(
+        'repository_rollups',
+        [('repository_id', '@pr_repo_id')],
+        [('pr_count', '@pr_is_new'), ('contributor_count', '@pr_new_contributor')],
+        activity='@pr_updated_at'
+    ) + rollup_upsert_sql(
+        'user_rollups',
+        [('user_id', '@pr_author_id')],
+        [('pr_count', '@pr_is_new')],
+        activity='@pr_updated_at'
+    )
+    params = (
+        pr_data.get('id'),
+        str(pr_data.get('title', 'Untitled PR')),
+        int(pr_data.get('number', 0)),
+        str(pr_data.get('state', 'open')),
+        str(pr_data.get('html_url', '')),
+        created_at,
+        updated_at,
+        pr_data.get('closed_at'),
+        pr_data.get('merged_at')
+    )
+    return sql, params
+
+def _touch_pull_request_sql(prefix, activity):
+    """
+    Mark @pr_id active and not stale, capturing what the rollups need
+
+    Leaves the PR's repository and author in @<prefix>_pr_repo_id and
+    @<prefix>_pr_author_id, and 1 in @<prefix>_was_stale if the PR was stale.
+    """
+    return f"""
+    DECLARE @{prefix}_pr_repo_id INT, @{prefix}_pr_author_id INT, @{prefix}_was_stale INT = 0;
+    UPDATE pull_requests
+    SET @{prefix}_pr_repo_id = repository_id,
+        @{prefix}_pr_author_id = author_id,
+        @{prefix}_was_stale = ISNULL(CAST(is_stale AS INT), 0),
+        last_activity_at = {activity},
+        is_stale = 0
+    WHERE id = @pr_id;
+    """
+
+def _unstale_author_sql(prefix):
+    """Take a PR that just stopped being stale off its author's stale count"""
+    return f"""
+    IF @{prefix}_was_stale = 1
+        UPDATE user_rollups SET stale_pr_count = stale_pr_count - 1 WHERE user_id = @{prefix}_pr_author_id;
+    """
+
+def _review_fragment(review_data):
+    """Upsert a review of @pr_id by @reviewer_id, bump PR activity and rollups; leaves its id in @review_id"""
+    sql = """
+    DECLARE @review_github_id BIGINT = ?, @review_state NVARCHAR(50) = ?, @review_submitted_at DATETIME = ?;
+    DECLARE @review_is_new INT = 0;
+    SELECT @review_id = id FROM pr_reviews WITH (UPDLOCK, HOLDLOCK) WHERE github_id = @review_github_id;
+    IF @review_id IS NULL
+    BEGIN
+        INSERT INTO pr_reviews (github_id, pull_request_id, reviewer_id, state, submitted_at)
+        VALUES (@review_github_id, @pr_id, @reviewer_id, @review_state, @review_submitted_at);
+        SET @review_id = SCOPE_IDENTITY();
+        SET @review_is_new = 1;
+    END
+    ELSE
+    BEGIN
+        UPDATE pr_reviews SET state = @review_state WHERE id = @review_id;
+    END
+    """ + _touch_pull_request_sql('review', '@review_submitted_at') + rollup_upsert_sql(
+        'repository_rollups',
+        [('repository_id', '@review_pr_repo_id')],
+        [('review_count', '@review_is_new'), ('stale_pr_count', '-@review_was_stale')],
+        activity='@review_submitted_at'
+    ) + rollup_upsert_sql(
+        'user_rollups',
+        [('user_id', '@reviewer_id')],
+        [('review_count', '@review_is_new')],
+        activity='@review_submitted_at'
+    ) + _unstale_author_sql('review')
+    params = (
+        review_data.get('id'),
+        str(review_data.get('state', 'COMMENTED')),
+        review_data.get('submitted_at', datetime.now().isoformat())
+    )
+    return sql, params
+
+def _detect_command(body):
+    """Return (contains_command, command_type) for a comment body"""
+    for cmd in COMMAND_KEYWORDS:
+        if cmd in body.upper():
+            return 1, cmd
+    return 0, None
+
+def _comment_fragment(comment_data, author_var, link_review):
+    """
+    Upsert a comment on @pr_id by @<author_var>, bump PR activity and rollups; leaves its id in @comment_id
+
+    Args:
+        link_review: Link the comment to @review_id (review bodies stored as comments)
+    """
+    body = str(comment_data.get('body', ''))
+    created_at = comment_data.get('created_at', datetime.now().isoformat())
+    updated_at = comment_data.get('updated_at', datetime.now().isoformat())
+    contains_command, command_type = _detect_command(body)
+    review_ref = "@review_id" if link_review else "NULL"
+
+    sql = f"""
+    DECLARE @comment_github_id BIGINT = ?, @comment_body NVARCHAR(MAX) = ?,
+            @comment_created_at DATETIME = ?, @comment_updated_at DATETIME = ?,
+            @comment_contains_command BIT = ?, @comment_command_type NVARCHAR(50) = ?;
+    DECLARE @comment_is_new INT = 0;
+    SELECT @comment_id = id FROM review_comments WITH (UPDLOCK, HOLDLOCK) WHERE github_id = @comment_github_id;
+    IF @comment_id IS NULL
+    BEGIN
+        INSERT INTO review_comments
+            (github_id, review_id, pull_request_id, author_id, body, created_at, updated_at,
+             contains_command, command_type)
+        VALUES
+            (@comment_github_id, {review_ref}, @pr_id, @{author_var}, @comment_body, @comment_created_at,
+             @comment_updated_at, @comment_contains_command, @comment_command_type);
+        SET @comment_id = SCOPE_IDENTITY();
+        SET @comment_is_new = 1;
+    END
+    ELSE
+    BEGIN
+        UPDATE review_comments
+        SET body = @comment_body, updated_at = @comment_updated_at,
+            contains_command = @comment_contains_command, command_type = @comment_command_type
+        WHERE id = @comment_id;
+    END
+    """ + _touch_pull_request_sql('comment', '@comment_updated_at') + rollup_upsert_sql(
+        'repository_rollups',
+        [('repository_id', '@comment_pr_repo_id')],
+        [('comment_count', '@comment_is_new'), ('stale_pr_count', '-@comment_was_stale')],
+        activity='@comment_updated_at'
+    ) + rollup_upsert_sql(
+        'user_rollups',
+        [('user_id', f'@{author_var}')],
+        [('comment_count', '@comment_is_new')],
+        activity='@comment_updated_at'
+    ) + _unstale_author_sql('comment')
+    params = (
+        comment_data.get('id'),
+        body,
+        created_at,
+        updated_at,
+        contains_command,
+        command_type
+    )
+    return sql, params
+
+# Builders rendering each write batch operation as a T-SQL fragment
+FRAGMENT_BUILDERS = {
+    'delivery': _delivery_fragment,
+    'assign': _assign_fragment,
+    'repository': _repository_fragment,
+    'user': _user_fragment,
+    'pull_request': _pull_request_fragment,
+    'review': _review_fragment,
+    'comment': _comment_fragment
+}
+
+class _WriteBatch:
+    """
+    Collects upsert operations and the result variables they populate
+
+    Operations are (kind, args) pairs; on SQL Server each one is rendered by
+    FRAGMENT_BUILDERS[kind](*args), on SQLite db_sqlite executes it directly.
+    Repository and user lookups are answered from the identity caches when
+    possible, in which case the operation just assigns the cached id.
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.result_vars = []
+        # (cache, github_id, var, served_from_cache)
+        self.identities = []
+
+    def add(self, var, kind, *args):
+        """Append an operation that populates @<var>"""
+        if var not in self.result_vars:
+            self.result_vars.append(var)
+        self.operations.append((kind, args))
+        return self
+
+    def delivery(self, delivery):
+        """
+        Record a (delivery_id, event_type) webhook delivery with the batch
+
+        Does nothing for None; must be the first operation so a duplicate
+        aborts the batch before anything else runs.
+        """
+        if delivery and delivery[0]:
+            self.operations.append(('delivery', tuple(delivery)))
+        return self
+
+    def assign(self, var, value):
+        return self.add(var, 'assign', var, value)
+
+    def _identity(self, cache, var, data, kind, *args):
+        github_id = data.get('id')
+        cached_id = cache.get(github_id)
+        if cached_id is not None:
+            self.assign(var, cached_id)
+        else:
+            self.add(var, kind, *args)
+        self.identities.append((cache, github_id, var, cached_id is not None))
+        return self
+
+    def repository(self, repo_data):
+        return self._identity(repository_id_cache, 'repo_id', repo_data, 'repository', repo_data)
+
+    def user(self, var, user_data):
+        return self._identity(user_id_cache, var, user_data, 'user', var, user_data)
+
+    def pr_activity(self):
+        """
+        (last_activity_at, is_open) the batch leaves on its pull request, or
+        None if it writes no PR, review or comment; mirrors the fragments
+        """
+        # Imported here because db_sqlite builds on this module
+        from prequel_db.db_sqlite import to_datetime
+
+        activity = None
+        for kind, args in self.operations:
+            if kind == 'pull_request':
+                pr_data = args[0]
+                is_open = (pr_data.get('state', 'open') == 'open'
+                           and not pr_data.get('closed_at') and not pr_data.get('merged_at'))
+                activity = (to_datetime(pr_data.get('updated_at')) or datetime.now(), is_open)
+            elif kind in ('review', 'comment'):
+                timestamp = args[0].get('submitted_at' if kind == 'review' else 'updated_at')
+                # Reviews and comments do not change the state; a PR only
+                # written through them is assumed open and re-checked when due
+                is_open = activity[1] if activity else True
+                activity = (to_datetime(timestamp) or datetime.now(), is_open)
+        return activity
+
 class DatabaseModels(DatabaseConnection):
     """
     Handles database operations for GitHub entities (repositories, users, pull requests, reviews, comments)
+
+    Writes are composed from T-SQL upsert fragments and sent as a single
+    batch, so one webhook event costs one round trip plus one commit and
+    either fully applies or not at all.
     """
-    
-    def get_or_create_repository(self, repo_data):
-        """Get or create a repository record"""
+
+    def _execute_write_batch(self, batch):
+        """
+        Run a write batch inside a single transaction
+
+        Returns:
+            Dict mapping each result variable to its final value
+        """
+        if self.dialect == 'sqlite':
+            # Imported here because db_sqlite builds on this module
+            from prequel_db.db_sqlite import execute_sqlite_write_batch
+            self.begin()
+            results = execute_sqlite_write_batch(self.cursor, batch)
+            self.conn.commit()
+            data_version.bump(self.conn)
+            return results
+
+        declare = ", ".join(f"@{var} INT" for var in batch.result_vars)
+        select = ", ".join(f"@{var}" for var in batch.result_vars)
+
+        sql_parts = ["SET NOCOUNT ON;\nSET XACT_ABORT ON;\n", f"DECLARE {declare};\n"]
+        params = []
+        for kind, args in batch.operations:
+            fragment_sql, fragment_params = FRAGMENT_BUILDERS[kind](*args)
+            sql_parts.append(fragment_sql)
+            params.extend(fragment_params)
+        sql_parts.append(f"SELECT {select};")
+
+        self.cursor.execute("".join(sql_parts), params)
+        row = self.cursor.fetchone()
+        self.conn.commit()
+        data_version.bump(self.conn)
+
+        return dict(zip(batch.result_vars, row))
+
+    def _run_write(self, operation, data, build_batch, result_key):
+        """
+        Execute a write batch with the shared connection check and error handling
+
+        Args:
+            operation: Name used in log messages
+            data: Payload logged if the write fails
+            build_batch: Callable returning a fresh _WriteBatch
+            result_key: Result variable to return
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
             return None
-            
-        try:
-            # Handle the case when repo_data is None
-            if repo_data is None:
-                logger.error("Repository data is None")
-                return None
-                
-            github_id = repo_data.get('id')
-            if github_id is None:
-                logger.error("Repository github_id is missing")
+
+        for attempt in range(2):
+            batch = build_batch()
+            try:
+                results = self._execute_write_batch(batch)
+            except Exception as e:
+                if hasattr(self, 'conn') and self.conn:
+                    self.conn.rollback()
+
+                if isinstance(e, DuplicateDeliveryError) or DUPLICATE_DELIVERY_MESSAGE in str(e):
+                    raise DuplicateDeliveryError(f"{operation}: delivery already processed") from None
+
+                # A cached id whose row was deleted fails the FK checks; drop the
+                # cached entries and retry once with real lookups
+                cached = [(cache, github_id) for cache, github_id, _, from_cache in batch.identities if from_cache]
+                if attempt == 0 and cached:
+                    logger.warning(f"{operation} failed using cached ids, retrying with lookups: {str(e)}")
+                    for cache, github_id in cached:
+                        cache.invalidate(github_id)
+                    continue
+
+                logger.error(f"Error in {operation}: {str(e)}")
+                logger.error(f"Data that caused error: {data}")
                 return None
-                
-            # Check if repository exists
-            self.cursor.execute(
-                "SELECT id FROM repositories WHERE github_id = ?", 
-                (github_id,)
-            )
-            result = self.cursor.fetchone()
-            
-            if result:
-                return result[0]
-            
-            # Repository doesn't exist, create it
-            name = str(repo_data.get('name', 'unknown'))
-            full_name = str(repo_data.get('full_name', 'unknown/unknown'))
-            
-            # Log the data for debugging
-            logger.debug(f"Creating repository: github_id={github_id}, name={name}, full_name={full_name}")
-            
-            # SQL Server approach to get the last inserted ID
-            self.cursor.execute(
-                """
-                INSERT INTO repositories (github_id, name, full_name) 
-                OUTPUT INSERTED.id
-                VALUES (?, ?, ?)
-                """, 
-                (github_id, name, full_name)
-            )
-            
-            # Get the ID directly from the OUTPUT clause
-            new_id = self.cursor.fetchone()[0]
-            self.conn.commit()
-            
-            return new_id
-            
-        except Exception as e:
-            logger.error(f"Error in get_or_create_repository: {str(e)}")
-            logger.error(f"Repository data that caused error: {repo_data}")
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.rollback()
+
+            for cache, github_id, var, _ in batch.identities:
+                cache.set(github_id, results[var])
+            if stale_deadlines.enabled and results.get('pr_id') is not None:
+                activity = batch.pr_activity()
+                if activity:
+                    stale_deadlines.observe(results['pr_id'], *activity)
+            return results[result_key]
+
+    def get_or_create_repository(self, repo_data):
+        """Get or create a repository record"""
+        # Handle the case when repo_data is None
+        if repo_data is None:
+            logger.error("Repository data is None")
+            return None
+
+        if repo_data.get('id') is None:
+            logger.error("Repository github_id is missing")
             return None
-    
+
+        return self._run_write(
+            'get_or_create_repository', repo_data,
+            lambda: _WriteBatch().repository(repo_data),
+            'repo_id'
+        )
+
     def get_or_create_user(self, user_data):
         """Get or create a user record"""
-        # Check if we have a valid connection
-        if not hasattr(self, 'conn') or not self.conn:
-            logger.warning("Database operation skipped due to missing connection")
+        # Handle the case when user_data is None
+        if user_data is None:
+            logger.error("User data is None")
             return None
-            
-        try:
-            # Handle the case when user_data is None
-            if user_data is None:
-                logger.error("User data is None")
-                return None
-                
-            github_id = user_data.get('id')
-            if github_id is None:
-                logger.error("User github_id is missing")
-                return None
-                
-            # Check if user exists
-            self.cursor.execute(
-                "SELECT id FROM users WHERE github_id = ?", 
-                (github_id,)
-            )
-            result = self.cursor.fetchone()
-            
-            if result:
-                return result[0]
-            
-            # User doesn't exist, create it
-            username = str(user_data.get('login', 'unknown'))
-            avatar_url = str(user_data.get('avatar_url', ''))  # Use empty string as default
-            
-            # Log the data for debugging
-            logger.debug(f"Creating user: github_id={github_id}, username={username}")
-            
-            # SQL Server approach to get the last inserted ID
-            self.cursor.execute(
-                """
-                INSERT INTO users (github_id, username, avatar_url) 
-                OUTPUT INSERTED.id
-                VALUES (?, ?, ?)
-                """, 
-                (github_id, username, avatar_url)
-            )
-            
-            # Get the ID directly from the OUTPUT clause
-            new_id = self.cursor.fetchone()[0]
-            self.conn.commit()
-            
-            return new_id
-            
-        except Exception as e:
-            logger.error(f"Error in get_or_create_user: {str(e)}")
-            logger.error(f"User data that caused error: {user_data}")
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.rollback()
+
+        if user_data.get('id') is None:
+            logger.error("User github_id is missing")
             return None
-    
+
+        return self._run_write(
+            'get_or_create_user', user_data,
+            lambda: _WriteBatch().user('user_id', user_data),
+            'user_id'
+        )
+
     def get_or_create_pull_request(self, pr_data, repository_id, author_id):
-        """Get or create a pull request record"""
-        # Check if we have a valid connection
-        if not hasattr(self, 'conn') or not self.conn:
-            logger.warning("Database operation skipped due to missing connection")
+        """Get or create a pull request record, updating it if it already exists"""
+        # Handle the case when pr_data is None or IDs are None
+        if pr_data is None:
+            logger.error("PR data is None")
             return None
-            
-        try:
-            # Handle the case when pr_data is None or IDs are None
-            if pr_data is None:
-                logger.error("PR data is None")
-                return None
-                
-            if repository_id is None or author_id is None:
-                logger.error(f"Missing required IDs: repo_id={repository_id}, author_id={author_id}")
-                return None
-                
-            github_id = pr_data.get('id')
-            if github_id is None:
-                logger.error("PR github_id is missing")
-                return None
-                
-            # Check if PR exists
-            self.cursor.execute(
-                "SELECT id FROM pull_requests WHERE github_id = ?", 
-                (github_id,)
-            )
-            result = self.cursor.fetchone()
-            
-            # Convert timestamps to ISO format for SQLite
-            created_at = pr_data.get('created_at', datetime.now().isoformat())
-            updated_at = pr_data.get('updated_at', datetime.now().isoformat())
-            closed_at = pr_data.get('closed_at')
-            merged_at = pr_data.get('merged_at')
-            
-            # Extract other data with defaults
-            title = str(pr_data.get('title', 'Untitled PR'))
-            number = int(pr_data.get('number', 0))
-            state = str(pr_data.get('state', 'open'))
-            html_url = str(pr_data.get('html_url', ''))
-            
-            if result:
-                # PR exists, update it
-                pr_id = result[0]
-                self.cursor.execute(
-                    """UPDATE pull_requests 
-                       SET title = ?, 
-                           state = ?, 
-                           updated_at = ?, 
-                           closed_at = ?, 
-                           merged_at = ?,
-                           last_activity_at = ?
-                       WHERE id = ?""", 
-                    (title, state, updated_at, closed_at, merged_at, updated_at, pr_id)
-                )
-                self.conn.commit()
-                return pr_id
-            
-            # PR doesn't exist, create it
-            logger.debug(f"Creating PR: github_id={github_id}, title={title}, repo_id={repository_id}, author_id={author_id}")
-            
-            self.cursor.execute(
-                """INSERT INTO pull_requests 
-                   (github_id, repository_id, author_id, title, number, state, html_url, 
-                    created_at, updated_at, closed_at, merged_at, last_activity_at) 
-                   OUTPUT INSERTED.id
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                (github_id, repository_id, author_id, title, number, state, html_url, 
-                 created_at, updated_at, closed_at, merged_at, updated_at)
-            )
-            
-            # Get the ID directly from the OUTPUT clause
-            new_id = self.cursor.fetchone()[0]
-            self.conn.commit()
-            
-            return new_id
-            
-        except Exception as e:
-            logger.error(f"Error in get_or_create_pull_request: {str(e)}")
-            logger.error(f"PR data that caused error: {pr_data}")
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.rollback()
+
+        if repository_id is None or author_id is None:
+            logger.error(f"Missing required IDs: repo_id={repository_id}, author_id={author_id}")
             return None
-    
+
+        if pr_data.get('id') is None:
+            logger.error("PR github_id is missing")
+            return None
+
+        return self._run_write(
+            'get_or_create_pull_request', pr_data,
+            lambda: _WriteBatch()
+                .assign('repo_id', repository_id)
+                .assign('author_id', author_id)
+                .add('pr_id', 'pull_request', pr_data),
+            'pr_id'
+        )
+
     def add_pr_review(self, review_data, pull_request_id, reviewer_id):
-        """Add a new PR review"""
-        # Check if we have a valid connection
-        if not hasattr(self, 'conn') or not self.conn:
-            logger.warning("Database operation skipped due to missing connection")
+        """Add or update a PR review and mark the PR as active"""
+        # Handle missing data
+        if review_data is None or pull_request_id is None or reviewer_id is None:
+            logger.error("Missing required data for PR review")
             return None
-            
-        try:
-            # Handle missing data
-            if review_data is None or pull_request_id is None or reviewer_id is None:
-                logger.error("Missing required data for PR review")
-                return None
-                
-            github_id = review_data.get('id')
-            if github_id is None:
-                logger.error("Review github_id is missing")
-                return None
-                
-            # Get state and submitted_at with defaults
-            state = str(review_data.get('state', 'COMMENTED'))
-            submitted_at = review_data.get('submitted_at', datetime.now().isoformat())
-            
-            # Check if review exists
-            self.cursor.execute(
-                "SELECT id FROM pr_reviews WHERE github_id = ?", 
-                (github_id,)
-            )
-            result = self.cursor.fetchone()
-            
-            if result:
-                # Review exists, update it
-                review_id = result[0]
-                self.cursor.execute(
-                    "UPDATE pr_reviews SET state = ? WHERE id = ?", 
-                    (state, review_id)
-                )
-                self.conn.commit()
-                
-                # Update last activity on PR
-                self.cursor.execute(
-                    "UPDATE pull_requests SET last_activity_at = ?, is_stale = 0 WHERE id = ?", 
-                    (submitted_at, pull_request_id)
-                )
-                self.conn.commit()
-                return review_id
-            
-            # Review doesn't exist, create it
-            logger.debug(f"Creating review: github_id={github_id}, pr_id={pull_request_id}, reviewer_id={reviewer_id}")
-            
-            # SQL Server approach to get the last inserted ID
-            self.cursor.execute(
-                """INSERT INTO pr_reviews 
-                   (github_id, pull_request_id, reviewer_id, state, submitted_at) 
-                   OUTPUT INSERTED.id
-                   VALUES (?, ?, ?, ?, ?)""", 
-                (github_id, pull_request_id, reviewer_id, state, submitted_at)
-            )
-            
-            # Get the ID directly from the OUTPUT clause
-            review_id = self.cursor.fetchone()[0]
-            self.conn.commit()
-            
-            # Update last activity on PR
-            self.cursor.execute(
-                "UPDATE pull_requests SET last_activity_at = ?, is_stale = 0 WHERE id = ?", 
-                (submitted_at, pull_request_id)
-            )
-            self.conn.commit()
-            
-            return review_id
-            
-        except Exception as e:
-            logger.error(f"Error in add_pr_review: {str(e)}")
-            logger.error(f"Review data that caused error: {review_data}")
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.rollback()
-            return None    
-    
+
+        if review_data.get('id') is None:
+            logger.error("Review github_id is missing")
+            return None
+
+        return self._run_write(
+            'add_pr_review', review_data,
+            lambda: _WriteBatch()
+                .assign('pr_id', pull_request_id)
+                .assign('reviewer_id', reviewer_id)
+                .add('review_id', 'review', review_data),
+            'review_id'
+        )
+
     def add_review_comment(self, comment_data, pull_request_id, author_id, review_id=None):
-        """Add a review comment"""
+        """Add or update a review comment and mark the PR as active"""
+        # Handle missing data
+        if comment_data is None or pull_request_id is None or author_id is None:
+            logger.error("Missing required data for review comment")
+            return None
+
+        if comment_data.get('id') is None:
+            logger.error("Comment github_id is missing")
+            return None
+
+        return self._run_write(
+            'add_review_comment', comment_data,
+            lambda: _WriteBatch()
+                .assign('pr_id', pull_request_id)
+                .assign('commenter_id', author_id)
+                .assign('review_id', review_id)
+                .add('comment_id', 'comment', comment_data, 'commenter_id', review_id is not None),
+            'comment_id'
+        )
+
+    def record_pull_request_event(self, repo_data, pr_data, delivery=None):
+        """
+        Store a pull_request webhook event in one transaction
+
+        Args:
+            repo_data: The event's repository payload
+            pr_data: The event's pull_request payload
+            delivery: Optional (delivery_id, event_type) recorded in the same
+                transaction
+
+        Returns:
+            Internal id of the pull request, or None on failure
+
+        Raises:
+            DuplicateDeliveryError: If the delivery was already recorded
+        """
+        if not repo_data or not pr_data or not pr_data.get('user'):
+            logger.error("Missing repository, PR or PR author data")
+            return None
+
+        if repo_data.get('id') is None or pr_data.get('id') is None or pr_data['user'].get('id') is None:
+            logger.error("Repository, PR or PR author github_id is missing")
+            return None
+
+        return self._run_write(
+            'record_pull_request_event', pr_data,
+            lambda: _WriteBatch()
+                .delivery(delivery)
+                .repository(repo_data)
+                .user('author_id', pr_data['user'])
+                .add('pr_id', 'pull_request', pr_data),
+            'pr_id'
+        )
+
+    def record_review_event(self, repo_data, pr_data, review_data, review_comment_data=None, delivery=None):
+        """
+        Store a pull_request_review webhook event in one transaction
+
+        Args:
+            repo_data: The event's repository payload
+            pr_data: The event's pull_request payload
+            review_data: The event's review payload
+            review_comment_data: Optional comment built from the review body,
+                stored linked to the review
+            delivery: Optional (delivery_id, event_type) recorded in the same
+                transaction
+
+        Returns:
+            Internal id of the review, or None on failure
+
+        Raises:
+            DuplicateDeliveryError: If the delivery was already recorded
+        """
+        if not repo_data or not pr_data or not review_data:
+            logger.error("Missing repository, review, or PR data")
+            return None
+
+        reviewer_data = review_data.get('user')
+        pr_author_data = pr_data.get('user')
+        if not reviewer_data or not pr_author_data:
+            logger.error("Missing reviewer or PR author data")
+            return None
+
+        github_ids = [repo_data.get('id'), pr_data.get('id'), review_data.get('id'),
+                      reviewer_data.get('id'), pr_author_data.get('id')]
+        if any(github_id is None for github_id in github_ids):
+            logger.error("Repository, PR, review or user github_id is missing")
+            return None
+
+        def build_batch():
+            batch = (_WriteBatch()
+                     .delivery(delivery)
+                     .repository(repo_data)
+                     .user('reviewer_id', reviewer_data)
+                     .user('author_id', pr_author_data)
+                     .add('pr_id', 'pull_request', pr_data)
+                     .add('review_id', 'review', review_data))
+            if review_comment_data and review_comment_data.get('id') is not None:
+                batch.add('comment_id', 'comment', review_comment_data, 'reviewer_id', True)
+            return batch
+
+        return self._run_write('record_review_event', review_data, build_batch, 'review_id')
+
+    def record_review_comment_event(self, repo_data, pr_data, comment_data, delivery=None):
+        """
+        Store a pull_request_review_comment webhook event in one transaction
+
+        Args:
+            repo_data: The event's repository payload
+            pr_data: The event's pull_request payload
+            comment_data: The event's comment payload
+            delivery: Optional (delivery_id, event_type) recorded in the same
+                transaction
+
+        Returns:
+            Internal id of the comment, or None on failure
+
+        Raises:
+            DuplicateDeliveryError: If the delivery was already recorded
+        """
+        if not repo_data or not pr_data or not comment_data:
+            logger.error("Missing repository, comment, or PR data")
+            return None
+
+        commenter_data = comment_data.get('user')
+        pr_author_data = pr_data.get('user')
+        if not commenter_data or not pr_author_data:
+            logger.error("Missing commenter or PR author data")
+            return None
+
+        github_ids = [repo_data.get('id'), pr_data.get('id'), comment_data.get('id'),
+                      commenter_data.get('id'), pr_author_data.get('id')]
+        if any(github_id is None for github_id in github_ids):
+            logger.error("Repository, PR, comment or user github_id is missing")
+            return None
+
+        return self._run_write(
+            'record_review_comment_event', comment_data,
+            lambda: _WriteBatch()
+                .delivery(delivery)
+                .repository(repo_data)
+                .user('commenter_id', commenter_data)
+                .user('author_id', pr_author_data)
+                .add('pr_id', 'pull_request', pr_data)
+                .add('comment_id', 'comment', comment_data, 'commenter_id', False),
+            'comment_id'
+        )
+
+    def purge_deliveries(self, older_than):
+        """
+        Delete delivery ids recorded before a cutoff
+
+        Args:
+            older_than: datetime cutoff
+
+        Returns:
+            Number of rows removed
+        """
         # Check if we have a valid connection
         if not hasattr(self, 'conn') or not self.conn:
             logger.warning("Database operation skipped due to missing connection")
-            return None
-            
+            return 0
+
         try:
-            # Handle missing data
-            if comment_data is None or pull_request_id is None or author_id is None:
-                logger.error("Missing required data for review comment")
-                return None
-                
-            github_id = comment_data.get('id')
-            if github_id is None:
-                logger.error("Comment github_id is missing")
-                return None
-                
-            # Get data with defaults
-            body = str(comment_data.get('body', ''))
-            created_at = comment_data.get('created_at', datetime.now().isoformat())
-            updated_at = comment_data.get('updated_at', datetime.now().isoformat())
-            
-            # Check for commands in comment (simplified)
-            contains_command = 0
-            command_type = None
-            
-            # Simple command detection - check for common commands
-            command_keywords = ['LGTM', 'APPROVE', 'REQUEST CHANGES', 'NEED REVIEW']
-            for cmd in command_keywords:
-                if cmd in body.upper():
-                    contains_command = 1
-                    command_type = cmd
-                    break
-            
-            # Check if comment exists
-            self.cursor.execute(
-                "SELECT id FROM review_comments WHERE github_id = ?", 
-                (github_id,)
-            )
-            result = self.cursor.fetchone()
-            
-            if result:
-                # Comment exists, update it
-                comment_id = result[0]
-                self.cursor.execute(
-                    """UPDATE review_comments 
-                       SET body = ?, updated_at = ?, contains_command = ?, command_type = ? 
-                       WHERE id = ?""", 
-                    (body, updated_at, contains_command, command_type, comment_id)
-                )
-                self.conn.commit()
-                
-                # Update last activity on PR
-                self.cursor.execute(
-                    "UPDATE pull_requests SET last_activity_at = ?, is_stale = 0 WHERE id = ?", 
-                    (updated_at, pull_request_id)
-                )
-                self.conn.commit()
-                return comment_id
-            
-            # Comment doesn't exist, create it
-            logger.debug(f"Creating comment: github_id={github_id}, pr_id={pull_request_id}, author_id={author_id}")
-            
-            # SQL Server approach to get the last inserted ID
-            self.cursor.execute(
-                """INSERT INTO review_comments 
-                   (github_id, review_id, pull_request_id, author_id, body, created_at, updated_at, contains_command, command_type) 
-                   OUTPUT INSERTED.id
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                (github_id, review_id, pull_request_id, author_id, body, created_at, updated_at, contains_command, command_type)
-            )
-            
-            # Get the ID directly from the OUTPUT clause
-            comment_id = self.cursor.fetchone()[0]
-            self.conn.commit()
-            
-            # Update last activity on PR
-            self.cursor.execute(
-                "UPDATE pull_requests SET last_activity_at = ?, is_stale = 0 WHERE id = ?", 
-                (updated_at, pull_request_id)
-            )
+            self.cursor.execute("DELETE FROM webhook_deliveries WHERE received_at < ?", (older_than,))
+            removed = self.cursor.rowcount
             self.conn.commit()
-            
-            return comment_id
-            
+            return removed
         except Exception as e:
-            logger.error(f"Error in add_review_comment: {str(e)}")
-            logger.error(f"Comment data that caused error: {comment_data}")
+            logger.error(f"Error in purge_deliveries: {str(e)}")
             if hasattr(self, 'conn') and self.conn:
                 self.conn.rollback()
-            return None
\ No newline at end of file
+            return 0
@@ -0,0 +1,188 @@
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Sort orders are lists of (T-SQL expression, direction) ending in a unique
+# column, so every row has a distinct position and a page can resume right
+# after the last row it returned (keyset pagination) instead of using OFFSET.
+
+# Stand-in for NULL dates so they take part in keyset comparisons
+# (a plain literal, so it works in both SQL dialects)
+NULL_DATE = "'1900-01-01 00:00:00'"
+
+class PageRequest:
+    """
+    Sort, filters and position for one page of a list query
+
+    Attributes:
+        sort: Name of one of the query's sort orders (None for its default)
+        filters: Dict of filter name -> value; unknown names are ignored
+        limit: Maximum rows to return (None returns every remaining row)
+        after: Sort key values of the last row of the previous page
+    """
+
+    def __init__(self, sort=None, filters=None, limit=None, after=None):
+        self.sort = sort
+        self.filters = filters or {}
+        self.limit = limit
+        self.after = after
+
+def order_by_sql(order):
+    return ", ".join(f"{expr} {direction}" for expr, direction in order)
+
+def sort_key_columns_sql(order):
+    """Select the sort key of each row as trailing columns sk0..skN"""
+    return ", ".join(f"{expr} AS sk{i}" for i, (expr, _) in enumerate(order))
+
+def keyset_predicate(order, after):
+    """
+    Build the WHERE predicate selecting rows positioned after a sort key
+
+    For ORDER BY a DESC, b ASC this is (a < ?) OR (a = ? AND b > ?).
+
+    Returns:
+        (sql, params)
+    """
+    if len(after) != len(order):
+        raise ValueError("Cursor does not match the sort order")
+
+    alternatives = []
+    params = []
+    for i, (expr, direction) in enumerate(order):
+        terms = [f"{order[j][0]} = ?" for j in range(i)]
+        terms.append(f"{expr} {'<' if direction == 'DESC' else '>'} ?")
+        alternatives.append("(" + " AND ".join(terms) + ")")
+        params.extend(after[:i])
+        params.append(after[i])
+    return "(" + " OR ".join(alternatives) + ")", params
+
+def page_clauses(page, sorts, default_sort, filters):
+    """
+    Translate a PageRequest into SQL pieces for a list query
+
+    Args:
+        page: PageRequest
+        sorts: Dict of sort name -> order list
+        default_sort: Sort used when page.sort is None
+        filters: Dict of filter name -> (T-SQL predicate with ? placeholders, param count)
+
+    Returns:
+        (order, where_sql, where_params) where where_sql excludes the keyset
+        predicate, so it can also be used to count the filtered rows
+
+    Raises:
+        ValueError: If the sort name is unknown
+    """
+    sort = page.sort or default_sort
+    if sort not in sorts:
+        raise ValueError(f"Unknown sort '{sort}'")
+    order = sorts[sort]
+
+    predicates = []
+    params = []
+    for name, value in page.filters.items():
+        if value is None or name not in filters:
+            continue
+        predicate, count = filters[name]
+        predicates.append(predicate)
+        params.extend([value] * count)
+
+    where_sql = " AND ".join(predicates)
+    return order, where_sql, params
+
+def combine_where(*predicates):
+    """Join the non-empty predicates into a WHERE clause ('' if none)"""
+    predicates = [p for p in predicates if p]
+    return "WHERE " + " AND ".join(predicates) if predicates else ""
+
+def page_select_sql(select_sql, from_sql, base_predicate, page, sorts, default_sort, filters,
+                    extra_row=False, ordered=True, dialect='sqlserver'):
+    """
+    Build the SELECT for one page of a list query
+
+    The sort key of each row is selected as trailing columns sk0..skN.
+
+    Args:
+        select_sql: Column list (without SELECT)
+        from_sql: FROM/JOIN clause
+        base_predicate: Predicate always applied ('' for none)
+        page: PageRequest
+        sorts, default_sort, filters: As for page_clauses()
+        extra_row: Fetch limit + 1 rows to detect a following page
+        ordered: Include ORDER BY even without a limit (False for derived tables,
+            which the caller orders by the sk columns)
+        dialect: 'sqlserver' limits with TOP, 'sqlite' with LIMIT
+
+    Returns:
+        (sql, params, order, count_sql, count_params)
+    """
+    order, filter_sql, params = page_clauses(page, sorts, default_sort, filters)
+    if page.after is not None:
+        keyset_sql, keyset_params = keyset_predicate(order, page.after)
+    else:
+        keyset_sql, keyset_params = "", []
+
+    limit_params = [page.limit + (1 if extra_row else 0)] if page.limit else []
+    top_sql = "TOP (?) " if page.limit and dialect == 'sqlserver' else ""
+    limit_sql = "LIMIT ?" if page.limit and dialect == 'sqlite' else ""
+
+    order_sql = f"ORDER BY {order_by_sql(order)}" if ordered or page.limit else ""
+
+    sql = f"""SELECT {top_sql}{select_sql}, {sort_key_columns_sql(order)}
+            {from_sql}
+            {combine_where(base_predicate, filter_sql, keyset_sql)}
+            {order_sql}
+            {limit_sql}"""
+    count_sql = f"SELECT COUNT(*) {from_sql} {combine_where(base_predicate, filter_sql)}"
+    if limit_sql:
+        return sql, params + keyset_params + limit_params, order, count_sql, params
+    return sql, limit_params + params + keyset_params, order, count_sql, params
+
+def fetch_page(cursor, select_sql, from_sql, base_predicate, page, sorts, default_sort, filters,
+               dialect='sqlserver'):
+    """
+    Run a keyset-paginated list query
+
+    Arguments are as for page_select_sql(), plus the database cursor.
+
+    Returns:
+        (rows, next_after, total): rows without the sort key columns, the
+        sort key to resume after (None on the last page) and the number of
+        rows matching the filters
+    """
+    # One extra row tells us whether another page follows
+    sql, params, order, count_sql, count_params = page_select_sql(
+        select_sql, from_sql, base_predicate, page, sorts, default_sort, filters, extra_row=True,
+        dialect=dialect
+    )
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+
+    next_after = None
+    if page.limit and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_after = list(rows[-1][-len(order):])
+
+    if page.limit is None and page.after is None:
+        total = len(rows)
+    else:
+        cursor.execute(count_sql, count_params)
+        total = cursor.fetchone()[0]
+
+    return [tuple(row[:-len(order)]) for row in rows], next_after, total
+
+def iter_rows(cursor, sql, params, batch_size=500):
+    """
+    Execute a query and yield its rows, holding at most batch_size in memory
+
+    The cursor must not be used for anything else until the generator is exhausted.
+    """
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield row
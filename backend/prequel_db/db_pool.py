@@ -0,0 +1,332 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class _PoolEntry:
+    """Bookkeeping for a single physical connection owned by the pool"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    """
+    Process-wide, thread-safe pool of database connections
+
+    DatabaseConnection borrows a connection on construction and hands it back
+    on close(), so webhook and API requests no longer pay for a full connect
+    and TLS handshake each time.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300,
+                 max_lifetime=1800, checkout_timeout=30, health_check_interval=30):
+        """
+        Args:
+            connect: Zero-argument callable returning a new DB-API connection
+            min_size: Connections kept open even when idle
+            max_size: Upper bound on open connections (idle + in use)
+            idle_timeout: Seconds an idle connection above min_size is kept
+            max_lifetime: Seconds after which a connection is replaced
+            checkout_timeout: Seconds acquire() waits for a free connection
+            health_check_interval: Idle seconds after which a connection is
+                pinged on checkout (0 pings on every checkout)
+        """
+        self._connect = connect
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+
+        # Counters reported by stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_expired(self, entry, now):
+        return bool(self.max_lifetime) and now - entry.created_at > self.max_lifetime
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {str(e)}")
+
+    def _ping(self, conn):
+        """Run a trivial query to make sure the connection is still usable"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {str(e)}")
+            return False
+
+    def _open(self):
+        conn = self._connect()
+        if conn is None:
+            raise ConnectionError("Database driver returned no connection")
+        return conn
+
+    def _reap_idle(self, now):
+        """Remove idle connections past their idle timeout or lifetime. Caller holds the lock."""
+        stale = []
+        kept = deque()
+        for entry in self._idle:
+            idle_for = now - entry.last_used_at
+            over_min = len(kept) + len(self._in_use) >= self.min_size
+            if self._is_expired(entry, now) or (self.idle_timeout and idle_for > self.idle_timeout and over_min):
+                stale.append(entry)
+            else:
+                kept.append(entry)
+        self._idle = kept
+        self._discarded += len(stale)
+        return stale
+
+    def prewarm(self):
+        """Open connections until min_size are available"""
+        while True:
+            with self._cond:
+                if self._total() >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                entry = _PoolEntry(self._open())
+            except Exception as e:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+                logger.warning(f"Could not prewarm connection pool: {str(e)}")
+                return
+            with self._cond:
+                self._opening -= 1
+                self._created += 1
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def acquire(self):
+        """
+        Borrow a connection from the pool
+
+        Returns:
+            A live DB-API connection that must be handed back with release()
+
+        Raises:
+            PoolTimeoutError: If max_size connections are busy for longer than checkout_timeout
+        """
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+
+        while True:
+            entry = None
+            stale = []
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    stale.extend(self._reap_idle(now))
+                    if self._idle:
+                        # LIFO keeps a small hot set busy and lets the rest idle out
+                        entry = self._idle.pop()
+                        self._in_use[id(entry.conn)] = entry
+                        break
+                    if self._total() < self.max_size:
+                        self._opening += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"({len(self._in_use)} in use, max {self.max_size})"
+                        )
+                    if not waited:
+                        self._waits += 1
+                        waited = True
+                    self._cond.wait(remaining)
+
+            for old in stale:
+                self._close_quietly(old.conn)
+
+            if entry is None:
+                # Room for a new physical connection
+                try:
+                    entry = _PoolEntry(self._open())
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._created += 1
+                    self._in_use[id(entry.conn)] = entry
+            elif self.health_check_interval is not None and \
+                    time.monotonic() - entry.last_used_at >= self.health_check_interval:
+                if not self._ping(entry.conn):
+                    with self._cond:
+                        self._in_use.pop(id(entry.conn), None)
+                        self._health_check_failures += 1
+                        self._discarded += 1
+                        self._cond.notify()
+                    self._close_quietly(entry.conn)
+                    continue
+
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._checkout_time_total += elapsed
+                self._checkout_time_max = max(self._checkout_time_max, elapsed)
+            return entry.conn
+
+    def release(self, conn, discard=False):
+        """
+        Return a borrowed connection to the pool
+
+        Args:
+            conn: Connection previously returned by acquire()
+            discard: Close the connection instead of keeping it for reuse
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            logger.warning("Attempted to release a connection that is not checked out")
+            return
+
+        if not discard:
+            try:
+                # Never hand an open transaction to the next borrower
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection after failed rollback: {str(e)}")
+                discard = True
+
+        now = time.monotonic()
+        if not discard and self._is_expired(entry, now):
+            discard = True
+
+        with self._cond:
+            if self._closed:
+                discard = True
+            if discard:
+                self._discarded += 1
+            else:
+                entry.last_used_at = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(conn)
+
+    def close_all(self):
+        """Close every idle connection; busy ones are closed when released"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._discarded += len(idle)
+            self._closed = True
+        for entry in idle:
+            self._close_quietly(entry.conn)
+
+    def stats(self):
+        """Snapshot of pool utilisation and checkout latency"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'initialized': True,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._total(),
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'health_check_failures': self._health_check_failures,
+                'avg_checkout_ms': round(self._checkout_time_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                'max_checkout_ms': round(self._checkout_time_max * 1000, 3)
+            }
+
+
+# Process-wide pool shared by every DatabaseConnection
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _env_number(name, default, cast=int):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Invalid value for {name}: {value!r}, using {default}")
+        return default
+
+
+def get_pool(connect):
+    """
+    Get the process-wide connection pool, creating it on first use
+
+    Args:
+        connect: Factory used to open new physical connections
+
+    Returns:
+        The shared ConnectionPool instance
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    connect,
+                    min_size=_env_number('DB_POOL_MIN_SIZE', 1),
+                    max_size=_env_number('DB_POOL_MAX_SIZE', 10),
+                    idle_timeout=_env_number('DB_POOL_IDLE_TIMEOUT', 300, float),
+                    max_lifetime=_env_number('DB_POOL_MAX_LIFETIME', 1800, float),
+                    checkout_timeout=_env_number('DB_POOL_CHECKOUT_TIMEOUT', 30, float),
+                    health_check_interval=_env_number('DB_POOL_HEALTH_CHECK_INTERVAL', 30, float)
+                )
+                pool.prewarm()
+                logger.info(f"Database connection pool created (min={pool.min_size}, max={pool.max_size})")
+                _pool = pool
+    return _pool
+
+
+def get_pool_stats():
+    """Return stats for the shared pool, or a placeholder if it has not been created yet"""
+    if _pool is None:
+        return {'initialized': False}
+    return _pool.stats()
@@ -0,0 +1,280 @@
+import sys
+import logging
+import argparse
+
+from prequel_db.db_connection import DatabaseConnection
+from prequel_db.db_cache import data_version
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Rollup tables hold per-user and per-repository counters so the dashboard
+# reads O(rows returned) instead of aggregating the full PR history. They are
+# maintained incrementally by the write batches in db_models and the stale
+# sweep in db_analytics; rebuild_rollups() recomputes them from scratch.
+
+def rollup_upsert_sql(table, keys, increments, activity=None):
+    """
+    Build an UPDATE-else-INSERT snippet that adds deltas to one rollup row
+
+    Args:
+        table: Rollup table name
+        keys: List of (column, T-SQL expression) identifying the row
+        increments: List of (column, T-SQL expression) deltas to add
+        activity: Optional T-SQL datetime expression; last_activity_at keeps the latest value
+
+    Returns:
+        T-SQL snippet (no parameters)
+    """
+    set_clauses = [f"{column} = {column} + ({expr})" for column, expr in increments]
+    insert_columns = [column for column, _ in keys] + [column for column, _ in increments]
+    insert_values = [expr for _, expr in keys] + [f"({expr})" for _, expr in increments]
+
+    if activity:
+        set_clauses.append(
+            f"last_activity_at = CASE WHEN last_activity_at IS NULL OR last_activity_at < {activity} "
+            f"THEN {activity} ELSE last_activity_at END"
+        )
+        insert_columns.append('last_activity_at')
+        insert_values.append(activity)
+
+    where = " AND ".join(f"{column} = {expr}" for column, expr in keys)
+    # Rows with a NULL key (e.g. legacy PRs without a repository) have no rollup
+    guard = " AND ".join(f"{expr} IS NOT NULL" for _, expr in keys)
+    return f"""
+    IF {guard}
+    BEGIN
+        UPDATE {table} WITH (UPDLOCK, HOLDLOCK) SET {', '.join(set_clauses)} WHERE {where};
+        IF @@ROWCOUNT = 0
+            INSERT INTO {table} ({', '.join(insert_columns)}) VALUES ({', '.join(insert_values)});
+    END
+    """
+
+# Recompute every rollup from the base tables. Used by migration 0004 to
+# backfill and by the rebuild command after bulk loads. The values must match
+# what the incremental writes produce: a user's last activity is the latest
+# updated_at of the PRs they authored (not the PRs' last_activity_at, which
+# other people's reviews and comments move), reviews they submitted and
+# comments they wrote.
+REBUILD_STATEMENTS = [
+    "DELETE FROM user_repository_rollups",
+    "DELETE FROM repository_rollups",
+    "DELETE FROM user_rollups",
+    """
+    INSERT INTO user_repository_rollups (user_id, repository_id, pr_count)
+    SELECT author_id, repository_id, COUNT(id)
+    FROM pull_requests
+    WHERE author_id IS NOT NULL AND repository_id IS NOT NULL
+    GROUP BY author_id, repository_id
+    """,
+    """
+    WITH pr_stats AS (
+        SELECT repository_id,
+               COUNT(id) as pr_count,
+               SUM(CASE WHEN is_stale = 1 THEN 1 ELSE 0 END) as stale_pr_count,
+               COUNT(DISTINCT author_id) as contributor_count,
+               MAX(last_activity_at) as last_activity
+        FROM pull_requests
+        GROUP BY repository_id
+    ),
+    review_stats AS (
+        SELECT pr.repository_id, COUNT(rv.id) as review_count
+        FROM pr_reviews rv
+        JOIN pull_requests pr ON rv.pull_request_id = pr.id
+        GROUP BY pr.repository_id
+    ),
+    comment_stats AS (
+        SELECT pr.repository_id, COUNT(rc.id) as comment_count
+        FROM review_comments rc
+        JOIN pull_requests pr ON rc.pull_request_id = pr.id
+        GROUP BY pr.repository_id
+    )
+    INSERT INTO repository_rollups
+        (repository_id, pr_count, review_count, comment_count, stale_pr_count, contributor_count, last_activity_at)
+    SELECT repo.id,
+           COALESCE(ps.pr_count, 0),
+           COALESCE(rs.review_count, 0),
+           COALESCE(cs.comment_count, 0),
+           COALESCE(ps.stale_pr_count, 0),
+           COALESCE(ps.contributor_count, 0),
+           ps.last_activity
+    FROM repositories repo
+    LEFT JOIN pr_stats ps ON ps.repository_id = repo.id
+    LEFT JOIN review_stats rs ON rs.repository_id = repo.id
+    LEFT JOIN comment_stats cs ON cs.repository_id = repo.id
+    """,
+    """
+    WITH pr_stats AS (
+        SELECT author_id,
+               COUNT(id) as pr_count,
+               SUM(CASE WHEN is_stale = 1 THEN 1 ELSE 0 END) as stale_pr_count,
+               MAX(updated_at) as last_activity
+        FROM pull_requests
+        GROUP BY author_id
+    ),
+    review_stats AS (
+        SELECT reviewer_id, COUNT(id) as review_count, MAX(submitted_at) as last_activity
+        FROM pr_reviews
+        GROUP BY reviewer_id
+    ),
+    comment_stats AS (
+        SELECT author_id, COUNT(id) as comment_count, MAX(updated_at) as last_activity
+        FROM review_comments
+        GROUP BY author_id
+    )
+    INSERT INTO user_rollups
+        (user_id, pr_count, review_count, comment_count, stale_pr_count, last_activity_at)
+    SELECT u.id,
+           COALESCE(ps.pr_count, 0),
+           COALESCE(rs.review_count, 0),
+           COALESCE(cs.comment_count, 0),
+           COALESCE(ps.stale_pr_count, 0),
+           (SELECT MAX(activity) FROM (VALUES (ps.last_activity), (rs.last_activity), (cs.last_activity)) AS a(activity))
+    FROM users u
+    LEFT JOIN pr_stats ps ON ps.author_id = u.id
+    LEFT JOIN review_stats rs ON rs.reviewer_id = u.id
+    LEFT JOIN comment_stats cs ON cs.author_id = u.id
+    """
+]
+
+# SQLite has no VALUES table constructor with column aliases; its scalar MAX()
+# is NULL if any argument is, so each argument falls back to the others
+SQLITE_REBUILD_STATEMENTS = REBUILD_STATEMENTS[:-1] + [
+    REBUILD_STATEMENTS[-1].replace(
+        "(SELECT MAX(activity) FROM (VALUES (ps.last_activity), (rs.last_activity), (cs.last_activity)) AS a(activity))",
+        "MAX(COALESCE(ps.last_activity, rs.last_activity, cs.last_activity),\n"
+        "               COALESCE(rs.last_activity, ps.last_activity, cs.last_activity),\n"
+        "               COALESCE(cs.last_activity, ps.last_activity, rs.last_activity))"
+    )
+]
+
+# (table, number of key columns, columns) compared by verify_rollups()
+ROLLUP_COLUMNS = [
+    ('user_repository_rollups', 2, ['user_id', 'repository_id', 'pr_count']),
+    ('repository_rollups', 1, ['repository_id', 'pr_count', 'review_count', 'comment_count',
+                               'stale_pr_count', 'contributor_count', 'last_activity_at']),
+    ('user_rollups', 1, ['user_id', 'pr_count', 'review_count', 'comment_count',
+                         'stale_pr_count', 'last_activity_at'])
+]
+
+class DatabaseRollups(DatabaseConnection):
+    """
+    Maintenance operations for the contributor/repository rollup tables
+    """
+
+    def rebuild_rollups(self):
+        """
+        Recompute all rollup tables from the base tables in one transaction
+
+        Returns:
+            True on success, False otherwise
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return False
+
+        try:
+            if self.dialect == 'sqlite':
+                self.begin()
+                statements = SQLITE_REBUILD_STATEMENTS
+            else:
+                statements = REBUILD_STATEMENTS
+            for statement in statements:
+                self.cursor.execute(statement)
+            self.conn.commit()
+            data_version.bump(self.conn)
+            logger.info("Rollup tables rebuilt")
+            return True
+        except Exception as e:
+            logger.error(f"Error in rebuild_rollups: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return False
+
+    def _rollup_snapshot(self):
+        """Read every rollup row, keyed by table and key columns; rows with nothing counted are left out"""
+        snapshot = {}
+        for table, key_count, columns in ROLLUP_COLUMNS:
+            self.cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+            for row in self.cursor.fetchall():
+                row = tuple(row)
+                key, values = row[:key_count], row[key_count:]
+                if any(values):
+                    snapshot[(table, key)] = values
+        return snapshot
+
+    def verify_rollups(self):
+        """
+        Compare the incrementally maintained rollups with a fresh rebuild
+
+        The rebuild runs inside a transaction that is rolled back, so the
+        tables are left as they were.
+
+        Returns:
+            List of (table, key, incremental values, rebuilt values) for the
+            rows that differ, empty if they all match; None on error
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return None
+
+        try:
+            if self.dialect == 'sqlite':
+                self.begin()
+                statements = SQLITE_REBUILD_STATEMENTS
+            else:
+                statements = REBUILD_STATEMENTS
+            current = self._rollup_snapshot()
+            for statement in statements:
+                self.cursor.execute(statement)
+            rebuilt = self._rollup_snapshot()
+            self.conn.rollback()
+
+            mismatches = []
+            for table, key in sorted(set(current) | set(rebuilt), key=str):
+                if current.get((table, key)) != rebuilt.get((table, key)):
+                    mismatches.append((table, key, current.get((table, key)), rebuilt.get((table, key))))
+            if mismatches:
+                logger.warning(f"{len(mismatches)} rollup rows differ from a rebuild")
+            return mismatches
+        except Exception as e:
+            logger.error(f"Error in verify_rollups: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return None
+
+def main(argv=None):
+    """Command line entry point: python -m prequel_db.db_rollups rebuild|verify"""
+    parser = argparse.ArgumentParser(description="Maintain PReQual rollup tables")
+    parser.add_argument('command', choices=['rebuild', 'verify'])
+    args = parser.parse_args(argv)
+
+    db = DatabaseRollups()
+    if hasattr(db, 'connection_failed') and db.connection_failed:
+        print("Could not connect to the database", file=sys.stderr)
+        return 1
+
+    try:
+        if args.command == 'verify':
+            mismatches = db.verify_rollups()
+            if mismatches is None:
+                print("Rollup verification failed, see logs", file=sys.stderr)
+                return 1
+            for table, key, current, rebuilt in mismatches:
+                print(f"{table} {key}: incremental {current} != rebuilt {rebuilt}")
+            print(f"{len(mismatches)} rollup rows differ from a rebuild")
+            return 1 if mismatches else 0
+
+        if not db.rebuild_rollups():
+            print("Rollup rebuild failed, see logs", file=sys.stderr)
+            return 1
+        print("Rollup tables rebuilt")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import logging
+from prequel_db.db_connection import DatabaseConnection
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = ['name', 'schedule', 'next_run_at', 'last_run_at', 'last_finished_at', 'last_status',
+               'last_error', 'last_duration_ms', 'run_count', 'lease_owner', 'lease_expires_at']
+
+# Times are naive UTC datetimes supplied by the caller. A lease is taken with
+# a single conditional UPDATE, which the database serializes, so at most one
+# process holds a job's lease at a time; the statements are plain SQL shared
+# by both storage backends.
+
+class DatabaseScheduler(DatabaseConnection):
+    """
+    Persistent state and leases for scheduled jobs (scheduled_jobs table)
+    """
+
+    def get_scheduled_job(self, name):
+        """
+        Get a job's state
+
+        Returns:
+            Dict of JOB_COLUMNS, or None if the job is unknown or on error
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return None
+
+        try:
+            self.cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM scheduled_jobs WHERE name = ?", (name,))
+            row = self.cursor.fetchone()
+            return dict(zip(JOB_COLUMNS, row)) if row else None
+        except Exception as e:
+            logger.error(f"Error in get_scheduled_job: {str(e)}")
+            return None
+
+    def list_scheduled_jobs(self):
+        """Get the state of every job"""
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return []
+
+        try:
+            self.cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM scheduled_jobs ORDER BY name")
+            return [dict(zip(JOB_COLUMNS, row)) for row in self.cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error in list_scheduled_jobs: {str(e)}")
+            return []
+
+    def ensure_scheduled_job(self, name, schedule, next_run_at):
+        """
+        Register a job, or reschedule it if its schedule changed
+
+        An existing job keeps its next_run_at (so missed runs are caught up)
+        unless the schedule expression is different.
+
+        Returns:
+            The job's state dict, or None on error
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return None
+
+        try:
+            self.cursor.execute(
+                """INSERT INTO scheduled_jobs (name, schedule, next_run_at)
+                   SELECT ?, ?, ?
+                   WHERE NOT EXISTS (SELECT 1 FROM scheduled_jobs WHERE name = ?)""",
+                (name, schedule, next_run_at, name)
+            )
+            self.cursor.execute(
+                "UPDATE scheduled_jobs SET schedule = ?, next_run_at = ? WHERE name = ? AND schedule <> ?",
+                (schedule, next_run_at, name, schedule)
+            )
+            if self.cursor.rowcount == 1:
+                logger.info(f"Schedule of job {name} changed to '{schedule}', next run at {next_run_at}")
+            self.conn.commit()
+        except Exception as e:
+            # Another process may have registered the job at the same moment
+            logger.warning(f"Error in ensure_scheduled_job: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+
+        return self.get_scheduled_job(name)
+
+    def acquire_job_lease(self, name, owner, now, lease_until):
+        """
+        Take the lease of a job that is due
+
+        Succeeds only if next_run_at has passed and no other owner holds an
+        unexpired lease.
+
+        Returns:
+            True if this owner now holds the lease
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return False
+
+        try:
+            self.cursor.execute(
+                """UPDATE scheduled_jobs
+                   SET lease_owner = ?, lease_expires_at = ?
+                   WHERE name = ?
+                   AND next_run_at <= ?
+                   AND (lease_owner IS NULL OR lease_expires_at < ?)""",
+                (owner, lease_until, name, now, now)
+            )
+            acquired = self.cursor.rowcount == 1
+            self.conn.commit()
+            return acquired
+        except Exception as e:
+            logger.error(f"Error in acquire_job_lease: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return False
+
+    def renew_job_lease(self, name, owner, lease_until):
+        """
+        Extend a lease held by owner while its job is still running
+
+        Returns:
+            True if the lease was still held and has been extended
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return False
+
+        try:
+            self.cursor.execute(
+                "UPDATE scheduled_jobs SET lease_expires_at = ? WHERE name = ? AND lease_owner = ?",
+                (lease_until, name, owner)
+            )
+            renewed = self.cursor.rowcount == 1
+            self.conn.commit()
+            return renewed
+        except Exception as e:
+            logger.error(f"Error in renew_job_lease: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return False
+
+    def finish_scheduled_job(self, name, owner, started_at, finished_at, next_run_at, status, error=None):
+        """
+        Record a run, schedule the next one and release the lease
+
+        Returns:
+            True if owner still held the lease
+        """
+        # Check if we have a valid connection
+        if not hasattr(self, 'conn') or not self.conn:
+            logger.warning("Database operation skipped due to missing connection")
+            return False
+
+        try:
+            self.cursor.execute(
+                """UPDATE scheduled_jobs
+                   SET next_run_at = ?, last_run_at = ?, last_finished_at = ?, last_status = ?,
+                       last_error = ?, last_duration_ms = ?, run_count = run_count + 1,
+                       lease_owner = NULL, lease_expires_at = NULL
+                   WHERE name = ? AND lease_owner = ?""",
+                (next_run_at, started_at, finished_at, status, error,
+                 int((finished_at - started_at).total_seconds() * 1000), name, owner)
+            )
+            finished = self.cursor.rowcount == 1
+            self.conn.commit()
+            return finished
+        except Exception as e:
+            logger.error(f"Error in finish_scheduled_job: {str(e)}")
+            if hasattr(self, 'conn') and self.conn:
+                self.conn.rollback()
+            return False
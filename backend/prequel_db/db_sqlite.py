@@ -0,0 +1,357 @@
+import logging
+from datetime import datetime
+from prequel_db.db_models import _detect_command, DuplicateDeliveryError
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# SQLite versions of the statements that are T-SQL specific in db_models,
+# db_analytics and db_bulk. Writes run inside the BEGIN IMMEDIATE opened by
+# DatabaseConnection.begin(), which serializes writers, so the lookups below
+# need no lock hints. Each function mirrors the T-SQL it replaces, including
+# the rollup deltas, so both backends produce the same rows and counters.
+
+def to_datetime(value):
+    """Parse GitHub ISO 8601 timestamps so they are stored in the DATETIME text format"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+def _get_or_insert(cursor, table, github_id, columns, values):
+    """Return the id of the row with github_id, inserting it if missing"""
+    cursor.execute(f"SELECT id FROM {table} WHERE github_id = ?", (github_id,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute(
+        f"INSERT INTO {table} (github_id, {', '.join(columns)}) VALUES (?, {', '.join('?' for _ in columns)})",
+        (github_id,) + tuple(values)
+    )
+    return cursor.lastrowid
+
+def rollup_add(cursor, table, keys, increments, activity=None):
+    """
+    Add deltas to one rollup row, creating it if missing (rollup_upsert_sql for SQLite)
+
+    Args:
+        keys: Dict of key column -> value; nothing happens if any is None
+        increments: Dict of column -> delta
+        activity: Optional datetime; last_activity_at keeps the latest value
+    """
+    if any(value is None for value in keys.values()):
+        return
+    columns = list(keys) + list(increments)
+    values = list(keys.values()) + list(increments.values())
+    set_clauses = [f"{column} = {column} + excluded.{column}" for column in increments]
+    if activity is not None:
+        columns.append('last_activity_at')
+        values.append(activity)
+        set_clauses.append(
+            "last_activity_at = CASE WHEN last_activity_at IS NULL OR last_activity_at < excluded.last_activity_at "
+            "THEN excluded.last_activity_at ELSE last_activity_at END"
+        )
+    cursor.execute(
+        f"""INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(set_clauses)}""",
+        values
+    )
+
+def _delivery(cursor, results, delivery_id, event_type):
+    """Record the batch's webhook delivery or abort the batch (_delivery_fragment)"""
+    if not claim_delivery(cursor, delivery_id, event_type):
+        raise DuplicateDeliveryError(f"Delivery {delivery_id} already recorded")
+
+def _assign(cursor, results, var, value):
+    results[var] = value
+
+def _repository(cursor, results, repo_data):
+    results['repo_id'] = _get_or_insert(
+        cursor, 'repositories', repo_data.get('id'), ['name', 'full_name'],
+        [str(repo_data.get('name', 'unknown')), str(repo_data.get('full_name', 'unknown/unknown'))]
+    )
+
+def _user(cursor, results, var, user_data):
+    results[var] = _get_or_insert(
+        cursor, 'users', user_data.get('id'), ['username', 'avatar_url'],
+        [str(user_data.get('login', 'unknown')), str(user_data.get('avatar_url', ''))]
+    )
+
+def _pull_request(cursor, results, pr_data):
+    """Upsert a pull request for repo_id/author_id and its rollups (_pull_request_fragment)"""
+    created_at = to_datetime(pr_data.get('created_at')) or datetime.now()
+    updated_at = to_datetime(pr_data.get('updated_at')) or datetime.now()
+    values = (
+        str(pr_data.get('title', 'Untitled PR')),
+        str(pr_data.get('state', 'open')),
+        updated_at,
+        to_datetime(pr_data.get('closed_at')),
+        to_datetime(pr_data.get('merged_at'))
+    )
+
+    cursor.execute("SELECT id, repository_id, author_id FROM pull_requests WHERE github_id = ?", (pr_data.get('id'),))
+    row = cursor.fetchone()
+    if row is None:
+        repo_id, author_id = results.get('repo_id'), results.get('author_id')
+        cursor.execute(
+            """INSERT INTO pull_requests
+                   (github_id, repository_id, author_id, title, number, state, html_url,
+                    created_at, updated_at, closed_at, merged_at, last_activity_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (pr_data.get('id'), repo_id, author_id, values[0], int(pr_data.get('number', 0)), values[1],
+             str(pr_data.get('html_url', '')), created_at, updated_at, values[3], values[4], updated_at)
+        )
+        pr_id, is_new = cursor.lastrowid, 1
+    else:
+        pr_id, repo_id, author_id = row
+        cursor.execute(
+            """UPDATE pull_requests
+               SET title = ?, state = ?, updated_at = ?, closed_at = ?, merged_at = ?, last_activity_at = ?
+               WHERE id = ?""",
+            values + (updated_at, pr_id)
+        )
+        is_new = 0
+    results['pr_id'] = pr_id
+
+    new_contributor = 0
+    if is_new and repo_id is not None and author_id is not None:
+        cursor.execute(
+            "SELECT 1 FROM user_repository_rollups WHERE user_id = ? AND repository_id = ?",
+            (author_id, repo_id)
+        )
+        new_contributor = 0 if cursor.fetchone() else 1
+        rollup_add(cursor, 'user_repository_rollups', {'user_id': author_id, 'repository_id': repo_id},
+                   {'pr_count': 1})
+    rollup_add(cursor, 'repository_rollups', {'repository_id': repo_id},
+               {'pr_count': is_new, 'contributor_count': new_contributor}, activity=updated_at)
+    rollup_add(cursor, 'user_rollups', {'user_id': author_id}, {'pr_count': is_new}, activity=updated_at)
+    return is_new
+
+def _touch_pull_request(cursor, pr_id, activity, forward_only=False):
+    """
+    Mark a PR active and not stale (_touch_pull_request_sql)
+
+    Args:
+        forward_only: Only move last_activity_at forward (bulk loads)
+
+    Returns:
+        (repository_id, author_id, was_stale)
+    """
+    cursor.execute("SELECT repository_id, author_id, is_stale, last_activity_at FROM pull_requests WHERE id = ?", (pr_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None, 0
+    repo_id, author_id, is_stale, last_activity_at = row
+    if forward_only and last_activity_at is not None and last_activity_at >= activity:
+        activity = last_activity_at
+    cursor.execute("UPDATE pull_requests SET last_activity_at = ?, is_stale = 0 WHERE id = ?", (activity, pr_id))
+    return repo_id, author_id, 1 if is_stale else 0
+
+def _unstale_author(cursor, author_id, was_stale):
+    if was_stale and author_id is not None:
+        cursor.execute("UPDATE user_rollups SET stale_pr_count = stale_pr_count - 1 WHERE user_id = ?", (author_id,))
+
+def _review(cursor, results, review_data, forward_only=False):
+    """Upsert a review of pr_id by reviewer_id, bump PR activity and rollups (_review_fragment)"""
+    submitted_at = to_datetime(review_data.get('submitted_at')) or datetime.now()
+    state = str(review_data.get('state', 'COMMENTED'))
+
+    cursor.execute("SELECT id FROM pr_reviews WHERE github_id = ?", (review_data.get('id'),))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(
+            "INSERT INTO pr_reviews (github_id, pull_request_id, reviewer_id, state, submitted_at) VALUES (?, ?, ?, ?, ?)",
+            (review_data.get('id'), results.get('pr_id'), results.get('reviewer_id'), state, submitted_at)
+        )
+        results['review_id'], is_new = cursor.lastrowid, 1
+    else:
+        results['review_id'], is_new = row[0], 0
+        cursor.execute("UPDATE pr_reviews SET state = ? WHERE id = ?", (state, row[0]))
+
+    repo_id, author_id, was_stale = _touch_pull_request(cursor, results.get('pr_id'), submitted_at, forward_only)
+    rollup_add(cursor, 'repository_rollups', {'repository_id': repo_id},
+               {'review_count': is_new, 'stale_pr_count': -was_stale}, activity=submitted_at)
+    rollup_add(cursor, 'user_rollups', {'user_id': results.get('reviewer_id')},
+               {'review_count': is_new}, activity=submitted_at)
+    _unstale_author(cursor, author_id, was_stale)
+    return is_new
+
+def _comment(cursor, results, comment_data, author_var, link_review, forward_only=False):
+    """Upsert a comment on pr_id by <author_var>, bump PR activity and rollups (_comment_fragment)"""
+    body = str(comment_data.get('body', ''))
+    created_at = to_datetime(comment_data.get('created_at')) or datetime.now()
+    updated_at = to_datetime(comment_data.get('updated_at')) or datetime.now()
+    contains_command, command_type = _detect_command(body)
+    author_id = results.get(author_var)
+
+    cursor.execute("SELECT id FROM review_comments WHERE github_id = ?", (comment_data.get('id'),))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(
+            """INSERT INTO review_comments
+                   (github_id, review_id, pull_request_id, author_id, body, created_at, updated_at,
+                    contains_command, command_type)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (comment_data.get('id'), results.get('review_id') if link_review else None, results.get('pr_id'),
+             author_id, body, created_at, updated_at, contains_command, command_type)
+        )
+        results['comment_id'], is_new = cursor.lastrowid, 1
+    else:
+        results['comment_id'], is_new = row[0], 0
+        cursor.execute(
+            """UPDATE review_comments
+               SET body = ?, updated_at = ?, contains_command = ?, command_type = ?
+               WHERE id = ?""",
+            (body, updated_at, contains_command, command_type, row[0])
+        )
+
+    repo_id, pr_author_id, was_stale = _touch_pull_request(cursor, results.get('pr_id'), updated_at, forward_only)
+    rollup_add(cursor, 'repository_rollups', {'repository_id': repo_id},
+               {'comment_count': is_new, 'stale_pr_count': -was_stale}, activity=updated_at)
+    rollup_add(cursor, 'user_rollups', {'user_id': author_id}, {'comment_count': is_new}, activity=updated_at)
+    _unstale_author(cursor, pr_author_id, was_stale)
+    return is_new
+
+OPERATIONS = {
+    'delivery': _delivery,
+    'assign': _assign,
+    'repository': _repository,
+    'user': _user,
+    'pull_request': _pull_request,
+    'review': _review,
+    'comment': _comment
+}
+
+def execute_sqlite_write_batch(cursor, batch):
+    """
+    Run the operations of a db_models _WriteBatch in the open transaction
+
+    Returns:
+        Dict mapping each result variable to its final value
+    """
+    results = {}
+    for kind, args in batch.operations:
+        OPERATIONS[kind](cursor, results, *args)
+    return {var: results.get(var) for var in batch.result_vars}
+
+def claim_delivery(cursor, delivery_id, event_type):
+    """Insert a delivery id unless present; True if it was inserted"""
+    cursor.execute(
+        "INSERT OR IGNORE INTO webhook_deliveries (delivery_id, event_type) VALUES (?, ?)",
+        (delivery_id, event_type)
+    )
+    return cursor.rowcount == 1
+
+def mark_stale_chunk(cursor, chunk_size, stale_date, pr_ids=None):
+    """
+    Mark up to chunk_size inactive open PRs stale with their history rows and rollup counts
+
+    Args:
+        pr_ids: Only consider these PRs (the stale watcher's due list)
+
+    Returns:
+        Ids of the PRs marked stale
+    """
+    id_filter = f"AND id IN ({', '.join('?' * len(pr_ids))})" if pr_ids else ""
+    cursor.execute(
+        f"""SELECT id FROM pull_requests
+            WHERE state = 'open'
+            AND is_stale = 0
+            AND last_activity_at < ?
+            AND (closed_at IS NULL AND merged_at IS NULL)
+            {id_filter}
+            LIMIT ?""",
+        (stale_date, *(pr_ids or ()), chunk_size)
+    )
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return ids
+
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS stale_marked (id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM stale_marked")
+    cursor.executemany("INSERT INTO stale_marked (id) VALUES (?)", [(pr_id,) for pr_id in ids])
+    cursor.execute("UPDATE pull_requests SET is_stale = 1 WHERE id IN (SELECT id FROM stale_marked)")
+    cursor.execute("INSERT INTO stale_pr_history (pull_request_id) SELECT id FROM stale_marked")
+    cursor.execute(
+        """UPDATE repository_rollups
+           SET stale_pr_count = stale_pr_count + m.stale_count
+           FROM (SELECT pr.repository_id, COUNT(*) as stale_count
+                 FROM stale_marked mk JOIN pull_requests pr ON pr.id = mk.id
+                 GROUP BY pr.repository_id) m
+           WHERE m.repository_id = repository_rollups.repository_id"""
+    )
+    cursor.execute(
+        """UPDATE user_rollups
+           SET stale_pr_count = stale_pr_count + m.stale_count
+           FROM (SELECT pr.author_id, COUNT(*) as stale_count
+                 FROM stale_marked mk JOIN pull_requests pr ON pr.id = mk.id
+                 GROUP BY pr.author_id) m
+           WHERE m.author_id = user_rollups.user_id"""
+    )
+    return ids
+
+def _lookup_id(cursor, table, github_id):
+    if github_id is None:
+        return None
+    cursor.execute(f"SELECT id FROM {table} WHERE github_id = ?", (github_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def apply_bulk(cursor, staged):
+    """
+    Apply the rows staged by a db_bulk call item by item in the open transaction
+
+    SQLite has no network round trips to save, so the per-item operations
+    are as fast as a set-based merge; reviews and comments only move
+    last_activity_at forward, as in the SQL Server bulk path.
+
+    Args:
+        staged: List of (staging table, columns, rows) built by DatabaseBulk
+
+    Returns:
+        (inserted, updated) counts for the last staged table
+    """
+    tables = {table: [dict(zip(columns, row)) for row in rows] for table, columns, rows in staged}
+    repositories = {row['github_id']: row for row in tables.get('#bulk_repositories', [])}
+    users = {row['github_id']: row for row in tables.get('#bulk_users', [])}
+
+    def user_data(github_id):
+        user = users[github_id]
+        return {'id': github_id, 'login': user['username'], 'avatar_url': user['avatar_url']}
+
+    inserted = updated = 0
+    for pr in tables.get('#bulk_pull_requests', []):
+        repo = repositories[pr['repo_github_id']]
+        results = {}
+        _repository(cursor, results, {'id': repo['github_id'], 'name': repo['name'], 'full_name': repo['full_name']})
+        _user(cursor, results, 'author_id', user_data(pr['author_github_id']))
+        is_new = _pull_request(cursor, results, {
+            'id': pr['github_id'], 'title': pr['title'], 'number': pr['number'], 'state': pr['state'],
+            'html_url': pr['html_url'], 'created_at': pr['created_at'], 'updated_at': pr['updated_at'],
+            'closed_at': pr['closed_at'], 'merged_at': pr['merged_at']
+        })
+        inserted, updated = inserted + is_new, updated + (1 - is_new)
+
+    for review in tables.get('#bulk_reviews', []):
+        results = {'pr_id': _lookup_id(cursor, 'pull_requests', review['pr_github_id'])}
+        if results['pr_id'] is None:
+            continue
+        _user(cursor, results, 'reviewer_id', user_data(review['reviewer_github_id']))
+        is_new = _review(cursor, results, {
+            'id': review['github_id'], 'state': review['state'], 'submitted_at': review['submitted_at']
+        }, forward_only=True)
+        inserted, updated = inserted + is_new, updated + (1 - is_new)
+
+    for comment in tables.get('#bulk_comments', []):
+        results = {'pr_id': _lookup_id(cursor, 'pull_requests', comment['pr_github_id'])}
+        if results['pr_id'] is None:
+            continue
+        results['review_id'] = _lookup_id(cursor, 'pr_reviews', comment['review_github_id'])
+        _user(cursor, results, 'commenter_id', user_data(comment['author_github_id']))
+        is_new = _comment(cursor, results, {
+            'id': comment['github_id'], 'body': comment['body'],
+            'created_at': comment['created_at'], 'updated_at': comment['updated_at']
+        }, 'commenter_id', results['review_id'] is not None, forward_only=True)
+        inserted, updated = inserted + is_new, updated + (1 - is_new)
+
+    return inserted, updated
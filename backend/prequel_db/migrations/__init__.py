@@ -0,0 +1,24 @@
+import re
+import pkgutil
+import importlib
+
+# Migration modules are named mNNNN_description.py and define
+# VERSION, DESCRIPTION, STATEMENTS (T-SQL) and SQLITE_STATEMENTS
+_MODULE_PATTERN = re.compile(r'^m\d{4}_\w+$')
+
+def load_migrations():
+    """Load every migration module in this package, ordered by version"""
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        if not _MODULE_PATTERN.match(module_info.name):
+            continue
+        module = importlib.import_module(f"{__name__}.{module_info.name}")
+        migrations.append(module)
+    
+    migrations.sort(key=lambda m: m.VERSION)
+    
+    versions = [m.VERSION for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions found: {versions}")
+    
+    return migrations
@@ -0,0 +1,180 @@
+"""
+Initial schema: repositories, users, pull requests, reviews, comments and stale PR history
+
+Each table is guarded with IF NOT EXISTS so databases created by the old
+per-connection bootstrap can be adopted without changes.
+SQLITE_STATEMENTS is the same schema for the SQLite backend.
+"""
+
+VERSION = 1
+DESCRIPTION = "Initial schema"
+
+STATEMENTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[repositories]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE repositories (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            github_id BIGINT UNIQUE,
+            name NVARCHAR(255) NOT NULL,
+            full_name NVARCHAR(255) NOT NULL,
+            created_at DATETIME DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[users]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE users (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            github_id BIGINT UNIQUE,
+            username NVARCHAR(255) NOT NULL,
+            avatar_url NVARCHAR(255),
+            created_at DATETIME DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[pull_requests]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE pull_requests (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            github_id BIGINT UNIQUE,
+            repository_id INT,
+            author_id INT,
+            title NVARCHAR(255) NOT NULL,
+            number INT NOT NULL,
+            state NVARCHAR(50) NOT NULL,
+            html_url NVARCHAR(255) NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL,
+            closed_at DATETIME NULL,
+            merged_at DATETIME NULL,
+            is_stale BIT DEFAULT 0,
+            last_activity_at DATETIME NOT NULL,
+            FOREIGN KEY (repository_id) REFERENCES repositories(id),
+            FOREIGN KEY (author_id) REFERENCES users(id)
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[pr_reviews]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE pr_reviews (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            github_id BIGINT UNIQUE,
+            pull_request_id INT,
+            reviewer_id INT,
+            state NVARCHAR(50) NOT NULL,
+            submitted_at DATETIME NOT NULL,
+            FOREIGN KEY (pull_request_id) REFERENCES pull_requests(id),
+            FOREIGN KEY (reviewer_id) REFERENCES users(id)
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[review_comments]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE review_comments (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            github_id BIGINT UNIQUE,
+            review_id INT NULL,
+            pull_request_id INT,
+            author_id INT,
+            body NVARCHAR(MAX) NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL,
+            contains_command BIT DEFAULT 0,
+            command_type NVARCHAR(50) NULL,
+            FOREIGN KEY (review_id) REFERENCES pr_reviews(id),
+            FOREIGN KEY (pull_request_id) REFERENCES pull_requests(id),
+            FOREIGN KEY (author_id) REFERENCES users(id)
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[stale_pr_history]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE stale_pr_history (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            pull_request_id INT,
+            marked_stale_at DATETIME DEFAULT GETDATE(),
+            marked_active_at DATETIME NULL,
+            notification_sent BIT DEFAULT 0,
+            FOREIGN KEY (pull_request_id) REFERENCES pull_requests(id)
+        )
+    END
+    """
+]
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS repositories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        github_id BIGINT UNIQUE,
+        name TEXT NOT NULL,
+        full_name TEXT NOT NULL,
+        created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        github_id BIGINT UNIQUE,
+        username TEXT NOT NULL,
+        avatar_url TEXT,
+        created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pull_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        github_id BIGINT UNIQUE,
+        repository_id INTEGER REFERENCES repositories(id),
+        author_id INTEGER REFERENCES users(id),
+        title TEXT NOT NULL,
+        number INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        html_url TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        closed_at DATETIME NULL,
+        merged_at DATETIME NULL,
+        is_stale INTEGER DEFAULT 0,
+        last_activity_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pr_reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        github_id BIGINT UNIQUE,
+        pull_request_id INTEGER REFERENCES pull_requests(id),
+        reviewer_id INTEGER REFERENCES users(id),
+        state TEXT NOT NULL,
+        submitted_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS review_comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        github_id BIGINT UNIQUE,
+        review_id INTEGER NULL REFERENCES pr_reviews(id),
+        pull_request_id INTEGER REFERENCES pull_requests(id),
+        author_id INTEGER REFERENCES users(id),
+        body TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        contains_command INTEGER DEFAULT 0,
+        command_type TEXT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stale_pr_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pull_request_id INTEGER REFERENCES pull_requests(id),
+        marked_stale_at DATETIME DEFAULT (datetime('now', 'localtime')),
+        marked_active_at DATETIME NULL,
+        notification_sent INTEGER DEFAULT 0
+    )
+    """
+]
@@ -0,0 +1,97 @@
+"""
+Indexes for the webhook lookups and dashboard queries
+
+- Stale sweep: filtered index over open, non-stale PRs keyed by last_activity_at
+- Stale PR list: filtered index over open stale PRs, covering the listed columns
+- Repository/contributor rollups: PRs by repository and by author
+- Review and comment counts: child rows by pull request and by user
+"""
+
+import re
+
+VERSION = 2
+DESCRIPTION = "Indexes for hot query filters and joins"
+
+# (index name, table, CREATE statement)
+INDEXES = [
+    (
+        'IX_pull_requests_open_active_last_activity', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_open_active_last_activity
+           ON pull_requests (last_activity_at)
+           INCLUDE (repository_id, author_id)
+           WHERE state = 'open' AND is_stale = 0 AND closed_at IS NULL AND merged_at IS NULL"""
+    ),
+    (
+        'IX_pull_requests_open_stale_last_activity', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_open_stale_last_activity
+           ON pull_requests (last_activity_at)
+           INCLUDE (repository_id, author_id, title, number, html_url, created_at)
+           WHERE is_stale = 1 AND state = 'open'"""
+    ),
+    (
+        'IX_pull_requests_state_stale_last_activity', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_state_stale_last_activity
+           ON pull_requests (state, is_stale, last_activity_at)"""
+    ),
+    (
+        'IX_pull_requests_repository', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_repository
+           ON pull_requests (repository_id)
+           INCLUDE (author_id, is_stale, state, last_activity_at)"""
+    ),
+    (
+        'IX_pull_requests_author', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_author
+           ON pull_requests (author_id)
+           INCLUDE (repository_id)"""
+    ),
+    (
+        'IX_pull_requests_created_at', 'pull_requests',
+        """CREATE NONCLUSTERED INDEX IX_pull_requests_created_at
+           ON pull_requests (created_at DESC)"""
+    ),
+    (
+        'IX_pr_reviews_pull_request', 'pr_reviews',
+        """CREATE NONCLUSTERED INDEX IX_pr_reviews_pull_request
+           ON pr_reviews (pull_request_id)"""
+    ),
+    (
+        'IX_pr_reviews_reviewer', 'pr_reviews',
+        """CREATE NONCLUSTERED INDEX IX_pr_reviews_reviewer
+           ON pr_reviews (reviewer_id)"""
+    ),
+    (
+        'IX_review_comments_author', 'review_comments',
+        """CREATE NONCLUSTERED INDEX IX_review_comments_author
+           ON review_comments (author_id)
+           INCLUDE (contains_command)"""
+    ),
+    (
+        'IX_review_comments_pull_request', 'review_comments',
+        """CREATE NONCLUSTERED INDEX IX_review_comments_pull_request
+           ON review_comments (pull_request_id)"""
+    ),
+    (
+        'IX_stale_pr_history_pull_request', 'stale_pr_history',
+        """CREATE NONCLUSTERED INDEX IX_stale_pr_history_pull_request
+           ON stale_pr_history (pull_request_id)"""
+    ),
+]
+
+STATEMENTS = [
+    f"""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = N'{name}' AND object_id = OBJECT_ID(N'[dbo].[{table}]'))
+    BEGIN
+        {create_sql}
+    END
+    """
+    for name, table, create_sql in INDEXES
+]
+
+# SQLite supports the same filtered indexes but has no INCLUDE columns
+SQLITE_STATEMENTS = [
+    re.sub(r'\s*INCLUDE \([^)]*\)', '', create_sql).replace(
+        'CREATE NONCLUSTERED INDEX', 'CREATE INDEX IF NOT EXISTS'
+    )
+    for _, _, create_sql in INDEXES
+]
@@ -0,0 +1,36 @@
+"""
+Record processed GitHub deliveries (X-GitHub-Delivery) so redeliveries are skipped
+"""
+
+VERSION = 3
+DESCRIPTION = "Webhook delivery deduplication table"
+
+STATEMENTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[webhook_deliveries]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE webhook_deliveries (
+            delivery_id NVARCHAR(64) PRIMARY KEY,
+            event_type NVARCHAR(100) NULL,
+            received_at DATETIME NOT NULL DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = N'IX_webhook_deliveries_received_at' AND object_id = OBJECT_ID(N'[dbo].[webhook_deliveries]'))
+    BEGIN
+        CREATE NONCLUSTERED INDEX IX_webhook_deliveries_received_at ON webhook_deliveries (received_at)
+    END
+    """
+]
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS webhook_deliveries (
+        delivery_id TEXT PRIMARY KEY,
+        event_type TEXT NULL,
+        received_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS IX_webhook_deliveries_received_at ON webhook_deliveries (received_at)"
+]
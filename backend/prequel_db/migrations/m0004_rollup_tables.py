@@ -0,0 +1,84 @@
+"""
+Per-user and per-repository rollup tables for the dashboard reads
+
+The tables are kept current by the webhook write batches and the stale
+sweep. The final statements backfill them from the existing history.
+"""
+
+from prequel_db.db_rollups import REBUILD_STATEMENTS, SQLITE_REBUILD_STATEMENTS
+
+VERSION = 4
+DESCRIPTION = "Contributor and repository rollup tables"
+
+STATEMENTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[user_rollups]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE user_rollups (
+            user_id INT PRIMARY KEY FOREIGN KEY REFERENCES users(id),
+            pr_count INT NOT NULL DEFAULT 0,
+            review_count INT NOT NULL DEFAULT 0,
+            comment_count INT NOT NULL DEFAULT 0,
+            stale_pr_count INT NOT NULL DEFAULT 0,
+            last_activity_at DATETIME NULL
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[repository_rollups]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE repository_rollups (
+            repository_id INT PRIMARY KEY FOREIGN KEY REFERENCES repositories(id),
+            pr_count INT NOT NULL DEFAULT 0,
+            review_count INT NOT NULL DEFAULT 0,
+            comment_count INT NOT NULL DEFAULT 0,
+            stale_pr_count INT NOT NULL DEFAULT 0,
+            contributor_count INT NOT NULL DEFAULT 0,
+            last_activity_at DATETIME NULL
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[user_repository_rollups]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE user_repository_rollups (
+            user_id INT NOT NULL FOREIGN KEY REFERENCES users(id),
+            repository_id INT NOT NULL FOREIGN KEY REFERENCES repositories(id),
+            pr_count INT NOT NULL DEFAULT 0,
+            CONSTRAINT PK_user_repository_rollups PRIMARY KEY (user_id, repository_id)
+        )
+    END
+    """
+] + REBUILD_STATEMENTS
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS user_rollups (
+        user_id INTEGER PRIMARY KEY REFERENCES users(id),
+        pr_count INTEGER NOT NULL DEFAULT 0,
+        review_count INTEGER NOT NULL DEFAULT 0,
+        comment_count INTEGER NOT NULL DEFAULT 0,
+        stale_pr_count INTEGER NOT NULL DEFAULT 0,
+        last_activity_at DATETIME NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS repository_rollups (
+        repository_id INTEGER PRIMARY KEY REFERENCES repositories(id),
+        pr_count INTEGER NOT NULL DEFAULT 0,
+        review_count INTEGER NOT NULL DEFAULT 0,
+        comment_count INTEGER NOT NULL DEFAULT 0,
+        stale_pr_count INTEGER NOT NULL DEFAULT 0,
+        contributor_count INTEGER NOT NULL DEFAULT 0,
+        last_activity_at DATETIME NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_repository_rollups (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        repository_id INTEGER NOT NULL REFERENCES repositories(id),
+        pr_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, repository_id)
+    )
+    """
+] + SQLITE_REBUILD_STATEMENTS
@@ -0,0 +1,48 @@
+"""
+State of the background jobs run by prequel_app.scheduler
+
+One row per job: its schedule, when it last ran and runs next, and the
+lease that makes a single process across all workers and nodes run it.
+"""
+
+VERSION = 5
+DESCRIPTION = "Scheduled job state and leases"
+
+STATEMENTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[scheduled_jobs]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE scheduled_jobs (
+            name NVARCHAR(100) PRIMARY KEY,
+            schedule NVARCHAR(100) NOT NULL,
+            next_run_at DATETIME NOT NULL,
+            last_run_at DATETIME NULL,
+            last_finished_at DATETIME NULL,
+            last_status NVARCHAR(20) NULL,
+            last_error NVARCHAR(MAX) NULL,
+            last_duration_ms INT NULL,
+            run_count INT NOT NULL DEFAULT 0,
+            lease_owner NVARCHAR(255) NULL,
+            lease_expires_at DATETIME NULL
+        )
+    END
+    """
+]
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS scheduled_jobs (
+        name TEXT PRIMARY KEY,
+        schedule TEXT NOT NULL,
+        next_run_at DATETIME NOT NULL,
+        last_run_at DATETIME NULL,
+        last_finished_at DATETIME NULL,
+        last_status TEXT NULL,
+        last_error TEXT NULL,
+        last_duration_ms INTEGER NULL,
+        run_count INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT NULL,
+        lease_expires_at DATETIME NULL
+    )
+    """
+]
@@ -0,0 +1,39 @@
+"""
+Shared version of the data behind the dashboard endpoints
+
+A single row bumped after every committed write, so the response caches of
+all worker processes and nodes notice writes made by any of them.
+"""
+
+VERSION = 6
+DESCRIPTION = "Shared data version for response caches"
+
+STATEMENTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'[dbo].[data_version]') AND type in (N'U'))
+    BEGIN
+        CREATE TABLE data_version (
+            id INT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM data_version WHERE id = 1)
+    BEGIN
+        INSERT INTO data_version (id, version) VALUES (1, 0)
+    END
+    """
+]
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)
+    """
+]
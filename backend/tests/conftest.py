@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+# The storage backend and connection pool are process-wide, so every test
+# shares one throwaway SQLite database; this runs before any prequel module
+# reads the environment
+_workdir = tempfile.mkdtemp(prefix='prequel-tests-')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(_workdir, 'prequel.db')
+os.environ['SLACK_WEBHOOK_URL'] = ''
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from benchmarks.load_benchmark import StatementCounter
+from prequel_db.db_backends import get_backend
+from prequel_db.db_migrations import apply_migrations
+from prequel_db.db_handler import DatabaseHandler
+from prequel_db.db_cache import repository_id_cache, user_id_cache
+
+# Counts every statement run through the pooled connections; installed
+# before the first connection opens the pool
+statement_counter = StatementCounter()
+statement_counter.install(get_backend())
+
+# Child tables first
+TABLES = [
+    'webhook_deliveries', 'stale_pr_history', 'user_repository_rollups', 'repository_rollups',
+    'user_rollups', 'review_comments', 'pr_reviews', 'pull_requests', 'users', 'repositories'
+]
+
+@pytest.fixture(scope='session', autouse=True)
+def schema():
+    assert apply_migrations()
+    yield
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+@pytest.fixture
+def db():
+    """A DatabaseHandler on an empty database"""
+    handler = DatabaseHandler()
+    for table in TABLES:
+        handler.cursor.execute(f"DELETE FROM {table}")
+    repository_id_cache.clear()
+    user_id_cache.clear()
+    yield handler
+    handler.close()
+
+@pytest.fixture
+def statements():
+    """The StatementCounter wrapping every pooled connection's cursors"""
+    return statement_counter
@@ -0,0 +1,156 @@
+import pytest
+
+from benchmarks.fake_github import start_fake_github
+from prequel_app.backfill import BackfillError, BackfillImporter, Checkpoint
+from prequel_app.github_client import GitHubClient, ResponseStore
+from prequel_db.db_cache import repository_id_cache, user_id_cache
+
+# Two repositories with four PRs each
+ORGANIZATION = {'org': 'fake-org', 'repos': 2, 'prs': 4, 'users': 5, 'reviews': 1, 'comments': 1}
+
+@pytest.fixture
+def github():
+    servers = []
+
+    def start(**kwargs):
+        server = start_fake_github(**ORGANIZATION, **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+# Every stored row, with github_ids in place of internal ids
+SNAPSHOT_QUERIES = {
+    'repositories': "SELECT github_id, name, full_name FROM repositories ORDER BY github_id",
+    'users': "SELECT github_id, username, avatar_url FROM users ORDER BY github_id",
+    'pull_requests': """SELECT pr.github_id, r.github_id, u.github_id, pr.title, pr.number, pr.state, pr.html_url,
+        pr.created_at, pr.updated_at, pr.closed_at, pr.merged_at, pr.is_stale, pr.last_activity_at
+        FROM pull_requests pr
+        JOIN repositories r ON r.id = pr.repository_id
+        JOIN users u ON u.id = pr.author_id
+        ORDER BY pr.github_id""",
+    'pr_reviews': """SELECT rv.github_id, pr.github_id, u.github_id, rv.state, rv.submitted_at
+        FROM pr_reviews rv
+        JOIN pull_requests pr ON pr.id = rv.pull_request_id
+        JOIN users u ON u.id = rv.reviewer_id
+        ORDER BY rv.github_id""",
+    'review_comments': """SELECT c.github_id, rv.github_id, pr.github_id, u.github_id, c.body,
+        c.created_at, c.updated_at, c.contains_command, c.command_type
+        FROM review_comments c
+        LEFT JOIN pr_reviews rv ON rv.id = c.review_id
+        JOIN pull_requests pr ON pr.id = c.pull_request_id
+        JOIN users u ON u.id = c.author_id
+        ORDER BY c.github_id""",
+    'user_rollups': """SELECT u.github_id, ur.pr_count, ur.review_count, ur.comment_count,
+        ur.stale_pr_count, ur.last_activity_at
+        FROM user_rollups ur JOIN users u ON u.id = ur.user_id
+        ORDER BY u.github_id""",
+    'repository_rollups': """SELECT r.github_id, rr.pr_count, rr.review_count, rr.comment_count,
+        rr.stale_pr_count, rr.contributor_count, rr.last_activity_at
+        FROM repository_rollups rr JOIN repositories r ON r.id = rr.repository_id
+        ORDER BY r.github_id""",
+    'user_repository_rollups': """SELECT u.github_id, r.github_id, urr.pr_count
+        FROM user_repository_rollups urr
+        JOIN users u ON u.id = urr.user_id
+        JOIN repositories r ON r.id = urr.repository_id
+        ORDER BY u.github_id, r.github_id"""
+}
+
+def count_rows(db, table):
+    db.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return db.cursor.fetchone()[0]
+
+def snapshot(db):
+    tables = {}
+    for table, sql in SNAPSHOT_QUERIES.items():
+        db.cursor.execute(sql)
+        tables[table] = [tuple(row) for row in db.cursor.fetchall()]
+    return tables
+
+def clear(db):
+    for table in ['stale_pr_history', 'user_repository_rollups', 'repository_rollups', 'user_rollups',
+                  'review_comments', 'pr_reviews', 'pull_requests', 'users', 'repositories']:
+        db.cursor.execute(f"DELETE FROM {table}")
+    repository_id_cache.clear()
+    user_id_cache.clear()
+
+def test_interrupted_import_resumes_from_checkpoint(db, github, tmp_path, monkeypatch):
+    server = github()
+    path = str(tmp_path / 'checkpoint.json')
+    import_pull_request = BackfillImporter.import_pull_request
+
+    def interrupted(self, repo, pr):
+        if repo['name'] == 'repo0' and pr['number'] == 3:
+            raise BackfillError("interrupted")
+        return import_pull_request(self, repo, pr)
+
+    monkeypatch.setattr(BackfillImporter, 'import_pull_request', interrupted)
+    counts = BackfillImporter(GitHubClient(api_url=server.url), Checkpoint(path), workers=2).run(org='fake-org')
+    assert counts['failed_repositories'] == 1
+    assert counts['pull_requests'] == 6
+
+    monkeypatch.setattr(BackfillImporter, 'import_pull_request', import_pull_request)
+    checkpoint = Checkpoint(path)
+    assert checkpoint.last_pr_number('fake-org/repo0') == 2
+    counts = BackfillImporter(GitHubClient(api_url=server.url), checkpoint, workers=2).run(org='fake-org')
+
+    # Only PRs 3 and 4 of repo0 are imported again; repo1 is complete
+    assert counts['pull_requests'] == 2
+    assert counts['skipped_repositories'] == 1
+    assert counts['failed_repositories'] == 0
+    assert count_rows(db, 'pull_requests') == 8
+    assert count_rows(db, 'pr_reviews') == 8
+    assert db.verify_rollups() == []
+
+def test_rerun_reuses_cached_responses(db, github, tmp_path):
+    server = github()
+    store = ResponseStore(str(tmp_path / 'cache'))
+    BackfillImporter(GitHubClient(api_url=server.url, store=store),
+                     Checkpoint(str(tmp_path / 'first.json')), workers=2).run(org='fake-org')
+    used = server.used
+
+    client = GitHubClient(api_url=server.url, store=store)
+    counts = BackfillImporter(client, Checkpoint(str(tmp_path / 'second.json')), workers=2).run(org='fake-org')
+
+    # Every page is answered 304 from the stored ETags, which costs no rate limit
+    assert counts['pull_requests'] == 8
+    assert client.requests > 0
+    assert client.not_modified == client.requests
+    assert server.used == used
+    assert count_rows(db, 'pull_requests') == 8
+
+def test_secondary_rate_limit_without_retry_after_is_retried(db, github, tmp_path):
+    server = github(throttle_every=5, throttle_retry_after=None)
+    client = GitHubClient(api_url=server.url, secondary_backoff=0.01)
+    counts = BackfillImporter(client, Checkpoint(str(tmp_path / 'checkpoint.json')), workers=1).run(org='fake-org')
+
+    assert server.throttled > 0
+    assert client.rate_limit_waits == server.throttled
+    assert counts['failed_repositories'] == 0
+    assert counts['pull_requests'] == 8
+
+def test_bulk_import_stores_the_same_rows_as_the_per_event_path(db, github, tmp_path):
+    server = github()
+    counts = BackfillImporter(GitHubClient(api_url=server.url), Checkpoint(str(tmp_path / 'events.json')),
+                              workers=2).run(org='fake-org')
+    assert counts['failed_repositories'] == 0
+    per_event = snapshot(db)
+    assert len(per_event['pull_requests']) == 8
+    assert len(per_event['review_comments']) > 8
+
+    clear(db)
+    checkpoint = Checkpoint(str(tmp_path / 'bulk.json'))
+    # Chunks of 3 split each repository's PRs across several bulk writes
+    counts = BackfillImporter(GitHubClient(api_url=server.url), checkpoint, workers=2, bulk_chunk=3).run(org='fake-org')
+    assert counts['failed_repositories'] == 0
+    assert snapshot(db) == per_event
+    assert db.verify_rollups() == []
+
+    # Applying the same items again updates them in place and leaves the rollups alone
+    BackfillImporter(GitHubClient(api_url=server.url), checkpoint, workers=2, bulk_chunk=3,
+                     refresh=True).run(org='fake-org')
+    assert snapshot(db) == per_event
+    assert db.verify_rollups() == []
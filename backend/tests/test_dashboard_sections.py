@@ -0,0 +1,33 @@
+import pytest
+
+from prequel_app.dashboard_sections import SectionFetcher
+from prequel_app.stats_handler import DASHBOARD_SECTIONS
+
+@pytest.fixture
+def missing_user_rollups(db):
+    db.cursor.execute("ALTER TABLE user_rollups RENAME TO user_rollups_hidden")
+    yield
+    db.cursor.execute("ALTER TABLE user_rollups_hidden RENAME TO user_rollups")
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_sections_complete_on_an_empty_database(db, parallel):
+    results, meta = SectionFetcher(parallel=parallel).fetch(DASHBOARD_SECTIONS)
+    assert meta['partial'] is False
+    assert results['repositories'] == []
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_failed_query_flags_the_section(missing_user_rollups, parallel):
+    results, meta = SectionFetcher(parallel=parallel).fetch(DASHBOARD_SECTIONS)
+    assert meta['partial'] is True
+    assert meta['sections']['pr_metrics']['status'] == 'error'
+    assert 'user_rollups' in meta['sections']['pr_metrics']['error']
+    assert meta['sections']['repositories']['status'] == 'ok'
+
+def test_partial_stats_response_is_not_cached(missing_user_rollups):
+    from prequel_app.app import app
+    response = app.test_client().get('/api/stats')
+    assert response.status_code == 200
+    assert response.headers['X-Partial-Response'] == 'true'
+    assert 'no-store' in response.headers['Cache-Control']
+    assert 'ETag' not in response.headers
+    assert response.get_json()['meta']['partial'] is True
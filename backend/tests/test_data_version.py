@@ -0,0 +1,31 @@
+from prequel_db.db_cache import DataVersion, data_version
+
+def read_version(db):
+    db.cursor.execute("SELECT version FROM data_version WHERE id = 1")
+    return db.cursor.fetchone()[0]
+
+def test_writes_bump_the_shared_version(db):
+    before = read_version(db)
+    repo = {'id': 1000, 'name': 'api', 'full_name': 'acme/api', 'html_url': 'https://github.com/acme/api'}
+    pr = {'id': 3000, 'number': 1, 'title': 'Add feature', 'state': 'open',
+          'html_url': 'https://github.com/acme/api/pull/1', 'user': {'id': 2001, 'login': 'alice'},
+          'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-01-01T00:00:00'}
+    assert db.record_pull_request_event(repo, pr)
+    after = read_version(db)
+    assert after > before
+    assert data_version.current() == after
+
+def test_other_process_sees_a_bump_after_its_poll_interval(db):
+    # Two instances stand in for the counters of two worker processes
+    writer = DataVersion(poll_interval=0)
+    reader = DataVersion(poll_interval=60)
+    seen = reader.current()
+
+    bumped = writer.bump(db.conn)
+    assert bumped > seen
+    # Within the poll interval the reader keeps its value...
+    assert reader.current() == seen
+
+    # ...and picks up the bump once it re-reads the row
+    reader.poll_interval = 0
+    assert reader.current() == bumped
@@ -0,0 +1,20 @@
+from prequel_db.db_paging import PageRequest
+
+def test_same_named_repositories_are_listed_once(db):
+    # alice has PRs in acme/api and globex/api
+    for i, owner in enumerate(['acme', 'globex']):
+        repo = {'id': 1000 + i, 'name': 'api', 'full_name': f"{owner}/api",
+                'html_url': f"https://github.com/{owner}/api"}
+        pr = {'id': 3000 + i, 'number': 1, 'title': 'Add feature', 'state': 'open',
+              'html_url': f"https://github.com/{owner}/api/pull/1", 'user': {'id': 2001, 'login': 'alice'},
+              'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-01-01T00:00:00'}
+        assert db.record_pull_request_event(repo, pr)
+
+    for page in (PageRequest(), PageRequest(limit=100)):
+        contributors, _, _ = db.list_contributors(page)
+        assert len(contributors) == 1
+        assert contributors[0]['repositories'] == ['api']
+        assert contributors[0]['pr_count'] == 2
+
+    streamed = list(db.iter_contributors(PageRequest(), batch_size=1))
+    assert [c['repositories'] for c in streamed] == [['api']]
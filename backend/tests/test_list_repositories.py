@@ -0,0 +1,28 @@
+import pytest
+
+from prequel_db.db_paging import PageRequest
+
+def add_repositories(db, count):
+    for i in range(count):
+        repo = {'id': 1000 + i, 'name': f"repo-{i}", 'full_name': f"acme/repo-{i}",
+                'html_url': f"https://github.com/acme/repo-{i}"}
+        pr = {'id': 3000 + i, 'number': 1, 'title': 'Add feature', 'state': 'open',
+              'html_url': f"https://github.com/acme/repo-{i}/pull/1", 'user': {'id': 2001, 'login': 'alice'},
+              'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-01-01T00:00:00'}
+        assert db.record_pull_request_event(repo, pr)
+
+def count_list_statements(db, statements, page):
+    before = statements.count
+    repositories, _, total = db.list_repositories(page)
+    return statements.count - before, len(repositories), total
+
+@pytest.mark.parametrize('limit', [None, 100])
+def test_list_repositories_statement_count_does_not_grow_with_repositories(db, statements, limit):
+    add_repositories(db, 1)
+    one = count_list_statements(db, statements, PageRequest(limit=limit))
+    add_repositories(db, 50)
+    fifty = count_list_statements(db, statements, PageRequest(limit=limit))
+
+    assert one[1:] == (1, 1)
+    assert fifty[1:] == (50, 50)
+    assert fifty[0] == one[0]
@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask, jsonify
+
+from prequel_app.response_cache import ResponseCache
+from prequel_db.db_cache import data_version
+
+@pytest.fixture(params=[0, 30], ids=['disabled', 'enabled'])
+def client(request, monkeypatch):
+    """A test client for one endpoint served through a ResponseCache, counting handler runs"""
+    # Re-read the shared version on every request
+    monkeypatch.setattr(data_version, 'poll_interval', 0)
+    cache = ResponseCache(max_age=request.param)
+    app = Flask(__name__)
+    app.cache = cache
+    app.runs = 0
+
+    @app.route('/api/stats')
+    def stats():
+        def view():
+            app.runs += 1
+            return jsonify({'total_prs': 1}), 200
+        return cache.serve('/api/stats?', view)
+
+    return app.test_client()
+
+def test_conditional_get_is_answered_without_running_the_handler(client):
+    first = client.get('/api/stats')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    # Even once the cached body is gone, e.g. past max_age
+    client.application.cache.clear()
+    second = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert client.application.runs == 1
+
+def test_a_write_changes_the_etag(client, db):
+    etag = client.get('/api/stats').headers['ETag']
+
+    # As if another worker process committed a write
+    data_version.bump(db.conn)
+    response = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert client.application.runs == 2
@@ -0,0 +1,63 @@
+from prequel_db.db_rollups import main
+
+REPO = {'id': 1001, 'name': 'api', 'full_name': 'acme/api', 'html_url': 'https://github.com/acme/api'}
+ALICE = {'id': 2001, 'login': 'alice'}
+BOB = {'id': 2002, 'login': 'bob'}
+CAROL = {'id': 2003, 'login': 'carol'}
+
+def pull_request(github_id, number, author, created_at, updated_at=None):
+    return {
+        'id': github_id, 'number': number, 'title': f"PR {number}", 'state': 'open',
+        'html_url': f"https://github.com/acme/api/pull/{number}", 'user': author,
+        'created_at': created_at, 'updated_at': updated_at or created_at
+    }
+
+def user_activity(db, login):
+    db.cursor.execute(
+        "SELECT ur.last_activity_at FROM user_rollups ur JOIN users u ON u.id = ur.user_id WHERE u.username = ?",
+        (login,)
+    )
+    return db.cursor.fetchone()[0]
+
+def test_review_does_not_move_pr_author_activity(db):
+    pr = pull_request(3001, 1, ALICE, '2024-01-01T00:00:00')
+    assert db.record_pull_request_event(REPO, pr)
+    review = {'id': 4001, 'state': 'APPROVED', 'user': BOB, 'submitted_at': '2024-01-05T00:00:00'}
+    assert db.record_review_event(REPO, pr, review)
+
+    assert user_activity(db, 'alice').isoformat().startswith('2024-01-01')
+    assert user_activity(db, 'bob').isoformat().startswith('2024-01-05')
+    assert db.verify_rollups() == []
+
+    assert db.rebuild_rollups()
+    assert user_activity(db, 'alice').isoformat().startswith('2024-01-01')
+
+def test_incremental_rollups_match_rebuild(db):
+    pr1 = pull_request(3001, 1, ALICE, '2024-01-01T00:00:00')
+    pr2 = pull_request(3002, 2, BOB, '2024-01-02T00:00:00')
+    assert db.record_pull_request_event(REPO, pr1)
+    assert db.record_pull_request_event(REPO, pr2)
+    assert db.record_review_event(REPO, pr1, {'id': 4001, 'state': 'COMMENTED', 'user': BOB,
+                                              'submitted_at': '2024-01-03T00:00:00'})
+    assert db.record_review_comment_event(REPO, pr2, {'id': 5001, 'body': 'Looks good', 'user': CAROL,
+                                                      'created_at': '2024-01-04T00:00:00',
+                                                      'updated_at': '2024-01-04T00:00:00'})
+    # An update to an existing PR, and the stale sweep
+    pr1['updated_at'] = '2024-01-06T00:00:00'
+    assert db.record_pull_request_event(REPO, pr1)
+    db.check_for_stale_prs(7)
+
+    assert db.verify_rollups() == []
+
+def test_verify_reports_drift(db, capsys):
+    assert db.record_pull_request_event(REPO, pull_request(3001, 1, ALICE, '2024-01-01T00:00:00'))
+    db.cursor.execute("UPDATE user_rollups SET pr_count = pr_count + 1")
+
+    mismatches = db.verify_rollups()
+    assert [(table, current[0], rebuilt[0]) for table, key, current, rebuilt in mismatches] == [('user_rollups', 2, 1)]
+    # The rebuild was rolled back
+    db.cursor.execute("SELECT pr_count FROM user_rollups")
+    assert db.cursor.fetchone()[0] == 2
+
+    assert main(['verify']) == 1
+    assert '1 rollup rows differ' in capsys.readouterr().out
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from benchmarks.fake_slack import start_fake_slack
+from prequel_app.slack_client import SlackClient
+
+MESSAGE = {'text': 'PR opened'}
+
+@pytest.fixture
+def slack():
+    servers = []
+
+    def start(**kwargs):
+        server = start_fake_slack(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_rate_limited_messages_wait_for_retry_after(slack):
+    server = slack(rate=5, burst=1, retry_after=0.3)
+    # Paced far faster than the server allows, so it answers 429
+    client = SlackClient(workers=0, max_retries=3, rate=100, burst=10)
+    url = f"{server.url}/hooks/a"
+
+    started = time.monotonic()
+    assert all(client.deliver(url, MESSAGE) for _ in range(3))
+    elapsed = time.monotonic() - started
+
+    # Retrying before Retry-After would be limited again until the attempts ran out
+    stats = client.stats()
+    assert stats['rate_limited'] == server.rate_limited > 0
+    assert stats['failed'] == 0
+    assert server.accepted == 3
+    assert elapsed >= 0.3 * stats['rate_limited']
+
+def test_token_bucket_paces_workers_below_the_rate_limit(slack):
+    # Sent all at once, the ten messages would mostly be answered 429
+    server = slack(rate=20, burst=2)
+    client = SlackClient(workers=2, rate=20, burst=1)
+    url = f"{server.url}/hooks/a"
+
+    started = time.monotonic()
+    for _ in range(10):
+        assert client.send(url, MESSAGE)
+    assert client.flush(timeout=10)
+    elapsed = time.monotonic() - started
+
+    # Nine gaps of 1/20 s between the ten messages, and never a 429
+    assert server.accepted == 10
+    assert server.rate_limited == 0
+    assert client.stats()['rate_limited'] == 0
+    assert elapsed >= 0.4
+
+def test_slow_responses_time_out_and_are_retried(slack):
+    server = slack(rate=100, burst=10, latency=0.5)
+    client = SlackClient(workers=0, read_timeout=0.1, max_retries=2, backoff_base=0.01, rate=100, burst=10)
+
+    started = time.monotonic()
+    assert not client.deliver(f"{server.url}/hooks/a", MESSAGE)
+    elapsed = time.monotonic() - started
+
+    # Both attempts gave up after the read timeout instead of waiting for the response
+    stats = client.stats()
+    assert stats['retries'] == 1
+    assert stats['failed'] == 1
+    assert elapsed < 0.5
@@ -0,0 +1,32 @@
+import time
+
+from prequel_app.webhook_queue import WebhookQueue
+
+def expire_leases(queue):
+    queue._conn.execute("UPDATE webhook_queue SET leased_until = ?", (time.time() - 1,))
+
+def test_complete_after_lease_lost_keeps_the_new_claim(tmp_path):
+    queue = WebhookQueue(path=str(tmp_path / 'queue.db'), lease_seconds=60)
+    queue.enqueue('d-1', 'pull_request', {}, b'{}')
+
+    stale = queue.claim()
+    expire_leases(queue)
+    current = queue.claim()
+    assert current['id'] == stale['id'] and current['lease_token'] != stale['lease_token']
+
+    assert queue.complete(stale) is False
+    assert queue.fail(stale, 'timed out') is False
+    stats = queue.stats()
+    assert (stats['in_flight'], stats['processed'], stats['failed_attempts'], stats['leases_lost']) == (1, 0, 0, 2)
+
+    assert queue.complete(current) is True
+    assert queue.stats()['in_flight'] == 0
+
+def test_fail_retries_and_dead_letters_with_the_lease(tmp_path):
+    queue = WebhookQueue(path=str(tmp_path / 'queue.db'), max_attempts=2, retry_delay=0)
+    queue.enqueue('d-1', 'pull_request', {}, b'{}')
+
+    assert queue.fail(queue.claim(), 'boom') is True
+    assert queue.fail(queue.claim(), 'boom') is True
+    stats = queue.stats()
+    assert (stats['dead'], stats['failed_attempts'], stats['leases_lost']) == (1, 2, 0)
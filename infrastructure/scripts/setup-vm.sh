@@ -159,7 +159,8 @@ WorkingDirectory=${APP_DIR}/backend
 Environment="PATH=${APP_DIR}/backend/venv/bin"
 Environment="PYTHONPATH=${APP_DIR}/backend"
 EnvironmentFile=${APP_DIR}/backend/.env
-ExecStart=${APP_DIR}/backend/venv/bin/gunicorn --workers 2 --bind 0.0.0.0:5001 prequel_app.app:app
+ExecStartPre=-${APP_DIR}/backend/venv/bin/python -m prequel_db.db_migrations upgrade
+ExecStart=${APP_DIR}/backend/venv/bin/gunicorn -c gunicorn.conf.py prequel_app.app:app
 Restart=always
 
 [Install]